@@ -1,7 +1,20 @@
 from .base import PT
 from .base import Emulator
+from .matrix import MatrixPT
 from .manager import MAPE
 from .manager import FeedbackLoop
 from .manager import AdaptiveNetBuilder
 from .functions import *
 from .primitives import LibEntry
+from .statespace import PTExplorer
+from .statespace import NetExplorer
+from .statespace import reachability_graph
+from .statespace import ParallelExplorer
+from .statespace import parallel_reachability_graph
+from .coverability import coverability_graph
+from .simulation import simulate
+from .timed import TimedSimulator
+from .timed import Exponential
+from .timed import Deterministic
+from .trace import TraceReader
+from .cache import NetCache
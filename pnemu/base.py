@@ -1,21 +1,380 @@
 from snakes.nets import *
 from graphviz import Digraph
-from xml.dom import minidom
+from array import array
+import ast
+import builtins
+import pickle
 import xml.etree.ElementTree as ET
+from .data import VersionedMultiSet, Relation, PackedRelation, InternTable
+from .functions import _values, _keys, repeat, changedCounts, withCounts, changedPlaces, internChanges
+from snakes.typing import tAll
+from .matrix import MatrixPT
+from .trace import TraceWriter
+from .pnml import read_pnml
+
+class ReificationPlace(Place):
+    """A place whose tokens are stored into a `VersionedMultiSet`, so that changes to its content can be detected"""
+
+    container = VersionedMultiSet
+
+    def __init__(self, name, tokens=[], check=None):
+        Place.__init__(self, name, [], check)
+        self.tokens = self.container()
+        self.add(tokens)
+
+    def empty(self):
+        self.tokens = self.container()
+
+    def reset(self, tokens):
+        self.check(iterate(tokens))
+        self.tokens = self.container(tokens)
+
+    def add(self, tokens):
+        if not isinstance(tokens, MultiSet):
+            Place.add(self, tokens)
+            return
+        # count-based: the cost depends on the distinct tokens, not on their multiplicity
+        self.check(dict.keys(tokens))
+        for token, n in dict.items(tokens):
+            self.tokens._add(token, n)
+
+    def remove(self, tokens):
+        if not isinstance(tokens, MultiSet):
+            Place.remove(self, tokens)
+            return
+        for token, n in dict.items(tokens):
+            self.tokens._remove(token, n)
+
+    def check(self, tokens):
+        if self._check is not tAll:
+            Place.check(self, tokens)
+
+    def load(self, counts):
+        """Add the tokens of the {token : count} dict `counts` at once"""
+        self.check(counts.keys())
+        self.tokens.load(counts)
+
+    def update(self, delta):
+        """Update the tokens in place with the (sign, MultiSet) terms of `delta` (see `Update`),
+        in order, and return the undo record of the changes. If a term cannot be removed, the
+        changes already made are undone and ValueError is raised"""
+        record = []
+        try:
+            for sign, tokens in delta:
+                if sign > 0:
+                    self.add(tokens)
+                else:
+                    self.remove(tokens)
+                record.append((sign, tokens))
+        except ValueError:
+            self.undo(record)
+            raise
+        return record
+
+    def undo(self, record):
+        """Revert the changes of an undo record returned by `update`"""
+        for sign, tokens in reversed(record):
+            if sign > 0:
+                self.remove(tokens)
+            else:
+                self.add(tokens)
+
+class RelationPlace(ReificationPlace):
+    """A place whose tokens are (key, value) pairs stored into an indexed `Relation`"""
+
+    container = Relation
+
+class PackedRelationPlace(RelationPlace):
+    """A place whose tokens are (key id, value id) pairs packed into a `PackedRelation`"""
+
+    container = PackedRelation
+
+class CopyFlush(Flush):
+    """A flush arc binding a copy of the place content that preserves its type
+    (e.g., the indexes of a `Relation`) instead of rebuilding a plain MultiSet"""
+
+    def modes(self, values):
+        if isinstance(values, MultiSet):
+            return [Substitution({self._annotation.name : values.copy()})]
+        return Flush.modes(self, values)
+
+    def flow(self, binding):
+        value = self._annotation.bind(binding).value
+        if isinstance(value, MultiSet):
+            return value.copy()
+        return Flush.flow(self, binding)
+
+    def bind(self, binding):
+        # only used to type-check the tokens: each distinct token is returned once (lazily)
+        value = self._annotation.bind(binding).value
+        if isinstance(value, MultiSet):
+            return (Token(v) for v in dict.keys(value))
+        return Flush.bind(self, binding)
+
+    def check(self, binding, tokens):
+        value = self._annotation.bind(binding).value
+        if isinstance(value, VersionedMultiSet) and isinstance(tokens, VersionedMultiSet) and value.version == tokens.version:
+            # same content
+            return True
+        return Flush.check(self, binding, tokens)
+
+# result of a `CompiledExpression` function when a variable is not bound
+UNBOUND = object()
+
+class CompiledExpression(Expression):
+    """An expression evaluated through a Python function compiled once (per namespace):
+    the variables are read from the binding into fast locals and the names of the net
+    namespace (e.g., the `pnemu.functions`) are its globals, instead of evaluating the code
+    with the binding as the local namespace at each call"""
+
+    def __init__(self, expr):
+        Expression.__init__(self, expr)
+        self._function = None
+        self._env = None
+
+    def compile(self):
+        env = self.globals._env
+        names = [name for name in getvars(self._str) if name not in env and not hasattr(builtins, name)]
+        source = 'def compiled(__binding__, __unbound__=__unbound__):\n'
+        if len(names) > 0:
+            source += '    try:\n'
+            for name in names:
+                source += '        ' + name + ' = __binding__[' + repr(name) + ']\n'
+            source += '    except KeyError:\n        return __unbound__\n'
+        source += '    return (' + self._str + ')\n'
+        # the function is defined in a separate namespace: the net globals are left untouched
+        scope = {'__unbound__' : UNBOUND}
+        exec(compile(source, '<string>', 'exec'), env, scope)
+        self._function = scope['compiled']
+        self._env = env
+
+    def __call__(self, binding):
+        if self._true:
+            return True
+        if self._env is not self.globals._env:
+            self.compile()
+        result = self._function(binding._dict)
+        if result is UNBOUND:
+            # unbound variable (or a name local to the expression): let SNAKES report it
+            return Expression.bind(self, binding).value
+        return result
+
+    def bind(self, binding):
+        return Token(self(binding))
+
+    def substitute(self, binding):
+        Expression.substitute(self, binding)
+        self._env = None
+
+class CompiledFlush(CopyFlush):
+    """A (copy) flush arc whose expression is a `CompiledExpression`"""
+
+    def __init__(self, expr):
+        CopyFlush.__init__(self, expr)
+        if isinstance(self._annotation, Expression):
+            self._annotation = CompiledExpression(self._expr)
+            self.globals = self._annotation.globals
+
+class Update(CopyFlush):
+    """An output flush arc updating the content of a flushed place, written `x + a - b ...` where
+    `x` is the variable flushing the place on an input arc (e.g., `m - value(i, t) + value(o, t)`).
+    Its flow is the value of the expression, but an `UpdateTransition` applies the terms to the
+    place in place (see `ReificationPlace.update`): the cost of a firing depends on the size of
+    the terms, not on the content of the place"""
+
+    def __init__(self, expr, compiled=False):
+        CopyFlush.__init__(self, expr)
+        self.compiled = compiled
+        expression = CompiledExpression if compiled else Expression
+        terms = []
+        tree = ast.parse(self._expr, mode='eval').body
+        while isinstance(tree, ast.BinOp) and isinstance(tree.op, (ast.Add, ast.Sub)):
+            terms.append((1 if isinstance(tree.op, ast.Add) else -1, expression(ast.get_source_segment(self._expr, tree.right))))
+            tree = tree.left
+        if not isinstance(tree, ast.Name) or len(terms) == 0:
+            raise ValueError('Not an update of a flushed variable: ' + self._expr)
+        self.variable = tree.id
+        self.terms = list(reversed(terms))
+        for sign, term in self.terms:
+            term.globals.attach(self.globals)
+
+    def copy(self):
+        return self.__class__(self._expr, self.compiled)
+
+    def delta(self, binding):
+        """Return the (sign, MultiSet) terms evaluated through `binding` (all of them are
+        evaluated before the place is changed)"""
+        result = []
+        for sign, term in self.terms:
+            tokens = term(binding)
+            result.append((sign, tokens if isinstance(tokens, MultiSet) else MultiSet(tokens)))
+        return result
+
+    def bind(self, binding):
+        # only the added tokens need to be type-checked; like the expression, an impossible
+        # removal raises ValueError (i.e., the binding does not enable the transition)
+        delta = self.delta(binding)
+        content = binding(self.variable)
+        counts = {}
+        for sign, tokens in delta:
+            for v, n in dict.items(tokens):
+                count = counts.get(v, content(v)) + sign * n
+                if count < 0:
+                    raise ValueError('not enough occurrences')
+                counts[v] = count
+        return (Token(v) for sign, tokens in delta if sign > 0 for v in dict.keys(tokens))
+
+class UpdateTransition(Transition):
+    """A transition firing in place the flush arcs that read a place (the same flush on the input
+    and the output arc) or update it (an `Update` output arc): their variables are bound to the
+    live content of the place, without copies, and the place is not emptied and refilled
+    (on `ReificationPlace`s only; other arcs fire as in `Transition`)"""
+
+    def shared(self):
+        """Return the {place : output label} of the flushed places read or updated in place"""
+        outputs = dict(self.output())
+        result = {}
+        for place, label in self.input():
+            if not isinstance(place, ReificationPlace) or not isinstance(label, Flush) or not isinstance(label._annotation, Variable):
+                continue
+            out = outputs.get(place)
+            if out is None:
+                continue
+            if (type(out) is type(label) and str(out) == str(label)) or (isinstance(out, Update) and out.variable == label._annotation.name):
+                result[place] = out
+        return result
+
+    def bind_shared(self, binding, shared):
+        """Return `binding` with the variables flushing the shared places bound to their content"""
+        names = binding.dict()
+        for place, label in self.input():
+            if place in shared:
+                names[label._annotation.name] = place.tokens
+        return Substitution(names)
+
+    def scratch(self):
+        """Return the `InternScratch` of the names given by the write primitives of an interned
+        encoding (see `Emulator`), or None"""
+        return self.net.globals['SCRATCH'] if 'SCRATCH' in self.net.globals else None
+
+    def modes(self):
+        shared = self.shared()
+        scratch = self.scratch()
+        parts = []
+        try:
+            for place, label in self.input():
+                if place in shared:
+                    parts.append([Substitution({label._annotation.name : place.tokens})])
+                else:
+                    parts.append(label.modes(place.tokens))
+        except ModeError:
+            return []
+        result = []
+        for x in cross(parts):
+            try:
+                sub = Substitution() if len(x) == 0 else reduce(Substitution.__add__, x)
+                if self._check(sub, False, False):
+                    result.append(sub)
+            except DomainError:
+                pass
+        if scratch is not None:
+            # the names given while checking the modes are not interned (see `fire`)
+            scratch.clear()
+        return result
+
+    def fire(self, binding):
+        shared = self.shared()
+        scratch = self.scratch()
+        if scratch is not None:
+            scratch.clear()
+        binding = self.bind_shared(binding, shared)
+        if not self.enabled(binding):
+            raise ValueError('transition not enabled for %s' % binding)
+        # all the updates are evaluated before the places change
+        deltas = {place : out.delta(binding) for place, out in shared.items() if isinstance(out, Update)}
+        for place, label in self.input():
+            if place not in shared:
+                place.remove(label.flow(binding))
+        for place, label in self.output():
+            if place in deltas:
+                place.update(deltas[place])
+            elif place not in shared:
+                place.add(label.flow(binding))
+        if scratch is not None:
+            # the new names given by the write primitives are interned once the transition has fired
+            scratch.commit()
+
+def compile_net(net):
+    """Replace the guards and the output expressions of the transitions of `net` with their
+    compiled version (`CompiledExpression`, `CompiledFlush` and compiled `Update`), and return `net`"""
+    for t in net.transition():
+        if type(t.guard) is Expression and not t.guard._true:
+            t.guard.globals.detach(net.globals)
+            t.guard = CompiledExpression(str(t.guard))
+            t.guard.globals.attach(net.globals)
+        for (place, label) in list(t.output()):
+            if type(label) is Expression:
+                compiled = CompiledExpression(str(label))
+            elif type(label) is Update and not label.compiled:
+                compiled = Update(label._expr, True)
+            elif type(label) in (Flush, CopyFlush) and isinstance(label._annotation, Expression):
+                compiled = CompiledFlush(label._expr)
+            else:
+                continue
+            net.remove_output(place.name, t.name)
+            net.add_output(place.name, t.name, compiled)
+    return net
+
+def load_tokens(place, counts):
+    """Add the tokens of the {token : count} dict `counts` to `place` at once
+    (token by token for the plain places of the neco-compiler encoding)"""
+    if isinstance(place, ReificationPlace):
+        place.load(counts)
+        return
+    for token, n in counts.items():
+        place.add(repeat(token, n))
+
+# enabling of a P/T transition `t` and marking update of the `move` transitions: read and updated
+# in place, or through copies in the plain encoding of the neco-compiler
+MOVE_GUARD = 'included(value(i, t), m) and (len(value(h, t))==0 or not inhibits(value(h, t), m))'
+MOVE_MARKING = 'm - value(i, t) + value(o, t)'
+PLAIN_MOVE_GUARD = 'value(i, t) <= MultiSet(m) and (len(value(h, t))==0 or not inhibits(value(h, t), m))'
+PLAIN_MOVE_MARKING = 'MultiSet(m) - value(i, t) + value(o, t)'
 
 class Emulator:
 
-    def __init__(self, pt_net=None, concur=True, neco_analysis=False):
+    ENGINES = ('snakes', 'native')
+
+    def __init__(self, pt_net=None, concur=True, neco_analysis=False, engine='snakes', interned=False):
+        """Encode `pt_net` (if any). With `interned`, the P/T elements are encoded as small
+        integer ids and the arcs as packed (transition id, place id) ints (see `PackedRelation`):
+        `names` is the name/id table, used by `draw_pt`/`dump_pt`, by the lib primitives and by
+        the methods taking a P/T element (which accept either a name or an id)"""
+        if engine not in self.ENGINES:
+            raise ValueError('Unknown engine: ' + str(engine) + '. Expected one of: ' + ', '.join(self.ENGINES))
+        if interned and neco_analysis:
+            raise ValueError('The interned encoding is not supported by neco-compiler')
+        self.engine = engine
         self.net = PetriNet('emulator')
+        self.names = InternTable() if interned else None
 
         # basic components
-        self.m = Place('M')
-        self.o = Place('O')
-        self.i = Place('I')
-        self.h = Place('H')
-        self.t = Place('T')
-        self.p = Place('P')
-        self.e = Place('observable')
+        # I/O/H hold indexed relations, contents are flushed by copy (count-based) and
+        # `move` reads/updates them in place (not supported by neco-compiler)
+        reification_place, relation_place, copy_flush, update, transition = ReificationPlace, RelationPlace, CopyFlush, Update, UpdateTransition
+        guard, marking = MOVE_GUARD, MOVE_MARKING
+        if neco_analysis:
+            reification_place, relation_place, copy_flush, update, transition = Place, Place, Flush, Flush, Transition
+            guard, marking = PLAIN_MOVE_GUARD, PLAIN_MOVE_MARKING
+        if interned:
+            relation_place = PackedRelationPlace
+        self.m = reification_place('M')
+        self.o = relation_place('O')
+        self.i = relation_place('I')
+        self.h = relation_place('H')
+        self.t = reification_place('T')
+        self.p = reification_place('P')
+        self.e = reification_place('observable')
         self.net.add_place(self.m)
         self.net.add_place(self.o)
         self.net.add_place(self.i)
@@ -25,7 +384,7 @@ class Emulator:
         self.net.add_place(self.e)
 
         # `move` transition for P/T emulation
-        self.net.add_transition(Transition('move', Expression('value(i, t) <= MultiSet(m) and (len(value(h, t))==0 or not inhibits(value(h, t), m)) and e(t)==0')))
+        self.net.add_transition(transition('move', Expression(guard + ' and e(t)==0')))
 
         # arcs connecting basic components and the `move` transition
         # Test annotatation not supported by neco-compiler
@@ -33,47 +392,93 @@ class Emulator:
         #self.net.add_input('I', 'move', Test(Flush('i')))
         #self.net.add_input('H', 'move', Test(Flush('h')))
         #self.net.add_input('T', 'move', Test(Variable('t')))
-        self.net.add_input('O', 'move', Flush('o'))
-        self.net.add_output('O', 'move', Flush('o'))
-        self.net.add_input('I', 'move', Flush('i'))
-        self.net.add_output('I', 'move', Flush('i'))
-        self.net.add_input('H', 'move', Flush('h'))
-        self.net.add_output('H', 'move', Flush('h'))
+        self.net.add_input('O', 'move', copy_flush('o'))
+        self.net.add_output('O', 'move', copy_flush('o'))
+        self.net.add_input('I', 'move', copy_flush('i'))
+        self.net.add_output('I', 'move', copy_flush('i'))
+        self.net.add_input('H', 'move', copy_flush('h'))
+        self.net.add_output('H', 'move', copy_flush('h'))
         self.net.add_input('T', 'move', Variable('t'))
         self.net.add_output('T', 'move', Variable('t'))
-        self.net.add_input('M', 'move', Flush('m'))
-        self.net.add_output('M', 'move', Flush('MultiSet(m) - value(i, t) + value(o, t)'))
-        self.net.add_input('observable', 'move', Flush('e'))
-        self.net.add_output('observable', 'move', Flush('e'))
+        self.net.add_input('M', 'move', copy_flush('m'))
+        self.net.add_output('M', 'move', update(marking))
+        self.net.add_input('observable', 'move', copy_flush('e'))
+        self.net.add_output('observable', 'move', copy_flush('e'))
 
+        self.firable = None
         if not concur:
-            self.net.add_place(Place('firable', True))
+            self.firable = reification_place('firable', True)
+            self.net.add_place(self.firable)
             self.net.add_input('firable', 'move', Variable('b'))
 
         # import functions attached to arcs/transitions
         #self.net.globals.declare('import math')
         if(not neco_analysis):
             self.net.globals.declare('from pnemu.functions import *')
+            # the net expressions only read the lookups: they get the memoized results
+            self.net.globals.declare('from pnemu.functions import _keys as keys, _values as values, _values as value')
+        if interned:
+            # reserved names, read by the unfolded lib primitives
+            self.net.globals['NAMES'] = self.names
+            self.net.globals['SCRATCH'] = self.names.scratch()
 
         self.zones = { }
+        # incremental set of enabled P/T transitions, valid for the recorded content versions
+        self.enabled_set = None
+        self.enabled_versions = None
+        # delays of the timed P/T transitions (see `PT.set_delay`)
+        self.delays = {}
+        # `TraceWriter` recording the firings (see `start_trace`)
+        self.trace = None
 
         if pt_net is not None:
+            for t, delay in pt_net.delays.items():
+                self.delays[self.intern(t)] = delay
             # P/T net encoding
-            for p in pt_net.get_places():
-                self.p.add(MultiSet([p]))
-            for t in pt_net.get_transitions():
-                self.t.add(MultiSet([t]))
-            for p in pt_net.get_marking():
-                self.m.add(MultiSet([p] * pt_net.get_marking().get(p)))
-            for t in pt_net.get_input_arcs():
-                for arc in pt_net.get_input_arcs().get(t):
-                    self.i.add(MultiSet([(arc.dst, arc.src)] * arc.weight))
-            for t in pt_net.get_output_arcs():
-                for arc in pt_net.get_output_arcs().get(t):
-                    self.o.add(MultiSet([(arc.src, arc.dst)] * arc.weight))
-            for t in pt_net.get_inhibitor_arcs():
-                for arc in pt_net.get_inhibitor_arcs().get(t):
-                    self.h.add(MultiSet([(arc.dst, arc.src)] * arc.weight))
+            # only the names are encoded (the place/transition objects are not built)
+            self.encode(pt_net.places, pt_net.transitions, pt_net.get_marking(),
+                ((arc.src, arc.dst, arc.weight) for arcs in pt_net.get_input_arcs().values() for arc in arcs),
+                ((arc.src, arc.dst, arc.weight) for arcs in pt_net.get_output_arcs().values() for arc in arcs),
+                ((arc.src, arc.dst, arc.weight) for arcs in pt_net.get_inhibitor_arcs().values() for arc in arcs))
+
+    @classmethod
+    def from_net(cls, net, engine='snakes'):
+        """Return an Emulator operating on the reification places of an existing `net`
+        (e.g., the adaptive net returned by `AdaptiveNetBuilder.build`), without copying it"""
+        emulator = cls(engine=engine)
+        emulator.net = net
+        emulator.m = net.place('M')
+        emulator.o = net.place('O')
+        emulator.i = net.place('I')
+        emulator.h = net.place('H')
+        emulator.t = net.place('T')
+        emulator.p = net.place('P')
+        emulator.e = net.place('observable')
+        if net.has_place('firable'):
+            emulator.firable = net.place('firable')
+        if 'NAMES' in net.globals:
+            emulator.names = net.globals['NAMES']
+        return emulator
+
+    def intern(self, element):
+        """Return the id of the P/T element named `element` in the interned encoding
+        (added if new), `element` itself otherwise"""
+        if self.names is None:
+            return element
+        return self.names.intern(element)
+
+    def find(self, element):
+        """Return the id of the P/T element named `element` in the interned encoding
+        (`element` itself if unknown, or if the encoding is not interned)"""
+        if self.names is None:
+            return element
+        return self.names.find(element)
+
+    def name_of(self, element):
+        """Return the name of the P/T `element` (an id in the interned encoding)"""
+        if self.names is None:
+            return element
+        return self.names.name_of(element)
 
     def add_transition(self, transition, guard=None):
         self.net.add_transition(Transition(transition, guard))
@@ -99,52 +504,295 @@ class Emulator:
     def get_net(self):
         return self.net
 
+    def compile(self):
+        """Compile the guards and the output expressions of the emulator net (see `compile_net`)"""
+        compile_net(self.net)
+        return self
+
     def modes(self, tr='move'):
+        if tr == 'move' and self.engine == 'native':
+            return self.native_modes()
         return self.net.transition(tr).modes()
 
     def fire(self, mode, tr='move'):
-        self.net.transition(tr).fire(mode)
+        if tr != 'move':
+            # the changed tokens are found before the firing (the updates read the places)
+            touched = self.touched(tr, mode) if self.trace is not None else None
+            self.net.transition(tr).fire(mode)
+            if touched is not None:
+                self.record(tr, mode, *touched)
+            return
+        valid = self.enabled_set_valid()
+        firable = None
+        if self.trace is not None and self.firable is not None:
+            firable = set(dict.keys(self.firable.tokens))
+        if self.engine == 'native':
+            self.native_fire(mode('t'), mode.dict().get('b'))
+        else:
+            self.net.transition(tr).fire(mode)
+        if valid:
+            self.update_enabled_set(mode('t'))
+        if self.trace is not None:
+            # only the preset and the postset of the P/T transition change in M
+            t = self.find(mode('t'))
+            touched = {self.m : set(dict.keys(_values(self.i.tokens, t))) | set(dict.keys(_values(self.o.tokens, t)))}
+            if firable is not None:
+                touched[self.firable] = firable
+            self.record(tr, mode, touched)
+
+    def apply_changes(self, changes):
+        """Apply a list of structural and marking `changes` of the emulated P/T net at once
+        (see `applyChanges`, e.g., [('addPlace', 'p3'), ('addInputArc', 'p3', 't0', 1)]).
+        The changed counts of each reification place concerned are computed first, then the
+        place is refilled once (a single version change); a failing change (e.g., removing a
+        missing arc) leaves the net, and the interned names, unchanged"""
+        changes = list(changes)
+        scratch = None
+        if self.names is not None:
+            scratch = self.names.scratch()
+            changes = internChanges(scratch, changes)
+        names = set()
+        for change in changes:
+            names.update(changedPlaces(change))
+        counts = {}
+        for name in names:
+            place = self.net.place(name)
+            counts[place] = changedCounts(place.tokens, name, changes)
+        if scratch is not None:
+            scratch.commit()
+        for place, changed in counts.items():
+            if len(changed) > 0:
+                place.tokens = withCounts(place.tokens, changed)
+        if self.trace is not None:
+            self.trace.record('applyChanges', (('changes', tuple(changes)),),
+                ((p.name, token, n) for p, changed in counts.items() for token, n in changed.items()))
+
+    def start_trace(self, file, every=1000):
+        """Record the next firings into `file` (see `TraceWriter`), starting from the current marking"""
+        self.stop_trace()
+        marking = {p.name : p.tokens for p in self.net.place() if not p.is_empty()}
+        self.trace = TraceWriter(file, marking, every)
+
+    def stop_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def touched(self, tr, mode):
+        """Return the {place : tokens} possibly changed by the firing of `tr` with `mode`
+        (computed before the firing): the terms of the updates and the flows of the token arcs,
+        or None for the places flushed by copy (the whole content of which may change)"""
+        transition = self.net.transition(tr)
+        shared = transition.shared() if isinstance(transition, UpdateTransition) else {}
+        binding = transition.bind_shared(mode, shared) if len(shared) > 0 else mode
+        touched = {}
+        for place, label in list(transition.input()) + list(transition.output()):
+            if place in shared:
+                tokens = touched.setdefault(place, set())
+                if isinstance(shared[place], Update):
+                    for sign, delta in shared[place].delta(binding):
+                        tokens.update(dict.keys(delta))
+            elif isinstance(label, Flush):
+                touched[place] = None
+            elif touched.get(place, ()) is not None:
+                touched.setdefault(place, set()).update(label.flow(binding))
+        # the old tokens of the copied places are removed
+        return {place : set(dict.keys(place.tokens)) if tokens is None else tokens
+                for place, tokens in touched.items()}, [place for place, tokens in touched.items() if tokens is None]
+
+    def record(self, tr, mode, touched, copied=()):
+        """Record the firing of `tr` with `mode` into the trace: the changes are read from the
+        {place : tokens} `touched` by the firing, and from the whole content of the `copied`
+        places; the binding is made of the variables bound on the input arcs (the flushed
+        contents are not stored)"""
+        transition = self.net.transition(tr)
+        binding = tuple((a.name, mode(a.name)) for (p, a) in transition.input() if type(a) is Variable)
+        for place in copied:
+            touched[place].update(dict.keys(place.tokens))
+        self.trace.record(tr, binding, ((place.name, token, dict.get(place.tokens, token, 0))
+                                        for place, tokens in touched.items() for token in tokens))
+
+    def set_delay(self, transition, delay):
+        """Set the `delay` (e.g., `Exponential(rate)` or `Deterministic(time)`) of the P/T `transition`
+        (None makes it immediate)"""
+        transition = self.intern(transition)
+        if delay is None:
+            self.delays.pop(transition, None)
+        else:
+            self.delays[transition] = delay
 
-    def enabled_pt_transitions(self):
+    def get_delay(self, transition):
+        """Return the delay of the P/T `transition` (None if immediate)"""
+        return self.delays.get(self.find(transition))
+
+    def native_enabled(self, transition):
+        """Return True if the P/T `transition` is enabled, reading the P/T/M/I/H places directly
+        (same semantics as the `move` guard)"""
+        if self.firable is not None and self.firable.is_empty():
+            return False
+        return self.pt_enabled(transition)
+
+    def pt_enabled(self, transition):
+        """Return True if the P/T `transition` is enabled in the emulated net (the `firable` place is not considered)"""
+        transition = self.find(transition)
+        if self.t.tokens(transition) == 0 or self.e.tokens(transition) > 0:
+            return False
+        m = self.m.tokens
+        for p, n in dict.items(_values(self.i.tokens, transition)):
+            if m(p) < n:
+                return False
+        for p, n in dict.items(_values(self.h.tokens, transition)):
+            if m(p) >= n:
+                return False
+        return True
+
+    def native_modes(self):
+        """Return the modes of `move` (binding only `t`, and `b` when not concurrent)
+        without going through the SNAKES mode enumeration"""
         result = []
-        for mode in self.modes():
-            result.append(mode.dict().get('t'))
+        for t in self.t.tokens:
+            if self.native_enabled(t):
+                mode = Substitution(t=t)
+                if self.firable is not None:
+                    mode = Substitution(t=t, b=next(iter(self.firable.tokens)))
+                result.append(mode)
         return result
 
+    def native_fire(self, transition, b=None):
+        """Fire the P/T `transition` by updating the marking of M in place"""
+        transition = self.find(transition)
+        if not self.native_enabled(transition):
+            raise ValueError('transition not enabled for ' + str(transition))
+        if self.firable is not None:
+            if b is None:
+                b = next(iter(self.firable.tokens))
+            self.firable.remove([b])
+        m = self.m.tokens
+        for p, n in dict.items(_values(self.i.tokens, transition)):
+            m._remove(p, n)
+        for p, n in dict.items(_values(self.o.tokens, transition)):
+            m._add(p, n)
+
+    def content_versions(self):
+        """Return the versions of the places the enabling of P/T transitions depends on (None if not versioned)"""
+        versions = tuple(getattr(place.tokens, 'version', None) for place in (self.m, self.i, self.h, self.t, self.e))
+        if None in versions:
+            return None
+        return versions
+
+    def enabled_set_valid(self):
+        return self.enabled_set is not None and self.enabled_versions == self.content_versions()
+
+    def update_enabled_set(self, transition):
+        """Update the enabled set after the firing of `transition`: only the transitions reading
+        (through input/inhibitor arcs) a place in the preset/postset of `transition` are re-checked"""
+        changed = set(_values(self.i.tokens, transition)) | set(_values(self.o.tokens, transition))
+        affected = set()
+        for p in changed:
+            affected.update(_keys(self.i.tokens, p))
+            affected.update(_keys(self.h.tokens, p))
+        for t in affected:
+            if self.pt_enabled(t):
+                self.enabled_set.add(t)
+            else:
+                self.enabled_set.discard(t)
+        # the firing of `move` does not alter the structure: only M may have changed
+        self.enabled_versions = self.content_versions()
+
+    def enabled_pt_transitions(self):
+        """Return the list of the enabled P/T transitions. The enabled set is kept up to date
+        incrementally by `fire`/`fire_pt`, and recomputed only when the emulated net has been
+        changed otherwise (e.g., by the lib write primitives)"""
+        if self.firable is not None and self.firable.is_empty():
+            return []
+        if not self.enabled_set_valid():
+            self.enabled_set = set(t for t in self.t.tokens if self.pt_enabled(t))
+            self.enabled_versions = self.content_versions()
+        return list(self.enabled_set)
+
+    def pt_mode(self, transition, tr='move'):
+        """Return the binding of `tr` that fires the P/T `transition`, or None if it is not enabled.
+        The binding is built directly (`t` is bound to `transition`), so that only the guard of
+        `transition` is evaluated"""
+        move = self.net.transition(tr)
+        binding = Substitution(t=self.find(transition))
+        shared = move.shared() if isinstance(move, UpdateTransition) else {}
+        try:
+            for place, annotation in move.input():
+                if type(annotation) is Variable and annotation.name == 't':
+                    continue
+                if place in shared:
+                    binding = binding + Substitution({annotation._annotation.name : place.tokens})
+                else:
+                    binding = binding + annotation.modes(place.tokens)[0]
+        except (ModeError, DomainError):
+            return None
+        if move.enabled(binding):
+            return binding
+        return None
+
     def fire_pt(self, transition):
-        for mode in self.modes():
-            if mode.dict().get('t') == transition:
-                self.fire(mode)
-                break
+        """Fire the P/T `transition`, if enabled. Return True if it has been fired"""
+        transition = self.find(transition)
+        if self.engine == 'native':
+            if not self.native_enabled(transition):
+                return False
+            self.fire(Substitution(t=transition))
+            return True
+        mode = self.pt_mode(transition)
+        if mode is None:
+            return False
+        self.fire(mode)
+        return True
+
+    def fire_pt_sequence(self, sequence):
+        """Fire the P/T transitions in `sequence`, in order.
+        Return the index of the first transition that was not enabled (None if the whole sequence has been fired)"""
+        for k, transition in enumerate(sequence):
+            if not self.fire_pt(transition):
+                return k
+        return None
+
+    def encode(self, places, transitions, marking={}, inputs=(), outputs=(), inhibitors=()):
+        """Encode P/T elements into the reification places, each place being filled at once:
+        `places` and `transitions` are names, `marking` a {place : tokens} dict, `inputs` and
+        `inhibitors` (place, transition, weight) arcs, `outputs` (transition, place, weight) arcs"""
+        intern = self.intern
+        load_tokens(self.p, {intern(p) : 1 for p in places})
+        load_tokens(self.t, {intern(t) : 1 for t in transitions})
+        load_tokens(self.m, {intern(p) : n for p, n in marking.items()})
+        if self.names is not None:
+            inputs = ((intern(p), intern(t), w) for p, t, w in inputs)
+            outputs = ((intern(t), intern(p), w) for t, p, w in outputs)
+            inhibitors = ((intern(p), intern(t), w) for p, t, w in inhibitors)
+        for place, arcs in ((self.i, inputs), (self.h, inhibitors)):
+            counts = {}
+            for p, t, weight in arcs:
+                counts[(t, p)] = counts.get((t, p), 0) + weight
+            load_tokens(place, counts)
+        counts = {}
+        for t, p, weight in outputs:
+            counts[(t, p)] = counts.get((t, p), 0) + weight
+        load_tokens(self.o, counts)
 
     def load_pt_from_pnml(self, pnml):
-        """Load P/T elements from the `pnml` file path"""
-        pnml = minidom.parse(pnml)
-        for place in pnml.getElementsByTagName('place'):
-            place_name = place.attributes['id'].value
-            tokens = 0
-            marking = place.getElementsByTagName('initialMarking')
-            if len(marking)>0:
-                tokens = int(marking[0].getElementsByTagName('text')[0].firstChild.nodeValue)
-            self.add_place(place_name, tokens)
-        for transition in pnml.getElementsByTagName('transition'):
-            transition_name = transition.attributes['id'].value
-            self.add_transition(transition_name)
-        for arc in pnml.getElementsByTagName('arc'):
-            src = arc.attributes['source'].value
-            trgt = arc.attributes['target'].value
-            arc_weight = arc.getElementsByTagName('inscription')
-            weight = 1
-            if len(arc_weight)>0:
-                weight = int(arc_weight[0].getElementsByTagName('text')[0].firstChild.nodeValue)
-            if T(trgt) in self.t.tokens:
-                arc_type = arc.getElementsByTagName('type')
-                if len(arc_type)>0 and arc_type[0].attributes['value'].value == 'inhibitor':
-                    self.add_inhibitor_arc(trgt, src, weight)
-                else:
-                    self.add_input_arc(trgt, src, weight)
+        """Load P/T elements from `pnml` (a file path or a file-like object), in a single streaming pass"""
+        self.load_pt_events(read_pnml(pnml))
+
+    def load_pt_events(self, events):
+        """Load P/T elements from place/transition/arc `events` (see `read_pnml`), encoded at once (see `encode`)"""
+        places, transitions, marking = [], [], {}
+        arcs = {'input' : [], 'output' : [], 'inhibitor' : []}
+        for event in events:
+            kind = event[0]
+            if kind == 'place':
+                places.append(event[1])
+                marking[event[1]] = marking.get(event[1], 0) + event[2]
+            elif kind == 'transition':
+                transitions.append(event[1])
             else:
-                self.add_output_arc(src, trgt, weight)
+                arcs[kind].append(event[1:])
+        self.encode(places, transitions, marking, arcs['input'], arcs['output'], arcs['inhibitor'])
 
     def draw(self, dot_file=None, render=False, export_format='pdf'):
         """Export an image of the net rendered by using Graphviz"""
@@ -172,29 +820,30 @@ class Emulator:
         dot.attr(rankdir='LR')
         dot.attr('node', shape='circle')
         for p in self.p.tokens:
-            p_name = p.replace(':', '.')
-            dot.node(p_name, str(self.m.tokens(p)), xlabel=p)
+            p_name = self.name_of(p).replace(':', '.')
+            dot.node(p_name, str(self.m.tokens(p)), xlabel=self.name_of(p))
         dot.attr('node', shape='rect')
         for t in self.t.tokens:
-            t_name = t.replace(':', '.')
-            dot.node(t_name, t)
-        for (t,p) in set(list(self.i.tokens)):
-            t_name = t.replace(':', '.')
-            p_name = p.replace(':', '.')
-            dot.edge(p_name, t_name, label=str(self.i.tokens((t,p))))
-        for (t,p) in set(list(self.o.tokens)):
-            t_name = t.replace(':', '.')
-            p_name = p.replace(':', '.')
-            dot.edge(t_name, p_name, label=str(self.o.tokens((t,p))))
-        for (t,p) in set(list(self.h.tokens)):
-            t_name = t.replace(':', '.')
-            p_name = p.replace(':', '.')
-            dot.edge(p_name, t_name, label=str(self.h.tokens((t,p))), arrowhead='odot')
+            t_name = self.name_of(t).replace(':', '.')
+            dot.node(t_name, self.name_of(t))
+        for (t, p, n) in self.pt_arcs(self.i):
+            dot.edge(p.replace(':', '.'), t.replace(':', '.'), label=str(n))
+        for (t, p, n) in self.pt_arcs(self.o):
+            dot.edge(t.replace(':', '.'), p.replace(':', '.'), label=str(n))
+        for (t, p, n) in self.pt_arcs(self.h):
+            dot.edge(p.replace(':', '.'), t.replace(':', '.'), label=str(n), arrowhead='odot')
         if dot_file is None:
             print(dot.source)
         else:
             dot.render(dot_file, view=render)
 
+    def pt_arcs(self, place):
+        """Return the (transition name, place name, weight) of the arcs encoded into the
+        reification `place` (I, O or H)"""
+        tokens = place.tokens
+        pairs = tokens.pairs() if isinstance(tokens, Relation) else dict.items(tokens)
+        return [(self.name_of(t), self.name_of(p), n) for ((t, p), n) in pairs]
+
     def dump(self, pnml_file=None):
         """Generate a pnml dump of the emulator net"""
         if pnml_file is None:
@@ -204,6 +853,52 @@ class Emulator:
             f.write(dumps(self.net))
             f.close()
 
+    def snapshot(self):
+        """Return a compact binary snapshot of the marking of the net (reification and feedback-loop places).
+        Place names and tokens are interned once; the contents are packed into an array of
+        (place id, number of tokens, (token id, count)...) integers"""
+        values = []
+        index = {}
+        packed = array('Q')
+        for place in self.net.place():
+            items = dict.items(place.tokens)
+            if len(items) == 0:
+                continue
+            for v in [place.name] + [token for token, n in items]:
+                if v not in index:
+                    index[v] = len(values)
+                    values.append(v)
+            packed.append(index[place.name])
+            packed.append(len(items))
+            for token, n in items:
+                packed.append(index[token])
+                packed.append(n)
+        return pickle.dumps((values, packed.tobytes()), pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, snapshot):
+        """Restore the marking saved by `snapshot` into the net, in place (the places missing
+        from the snapshot are emptied, the structure of the net is not changed)"""
+        values, data = pickle.loads(snapshot)
+        packed = array('Q')
+        packed.frombytes(data)
+        contents = {}
+        k = 0
+        while k < len(packed):
+            name = values[packed[k]]
+            if not self.net.has_place(name):
+                raise ValueError('Unknown place in snapshot: ' + str(name))
+            contents[name] = (k + 2, k + 2 + 2 * packed[k + 1])
+            k = contents[name][1]
+        for place in self.net.place():
+            tokens = place.tokens.__class__()
+            if place.name in contents:
+                start, end = contents[place.name]
+                for j in range(start, end, 2):
+                    tokens._add(values[packed[j]], packed[j + 1])
+            elif len(place.tokens) == 0:
+                continue
+            place.tokens = tokens
+
     def dump_pt(self, pnml_file=None):
         """Generate a pnml dump of the emulated net"""
         pnml = ET.Element('pnml')
@@ -212,39 +907,39 @@ class Emulator:
         net.set('type', 'P/T net')
         for p in self.p.tokens:
             place = ET.SubElement(net, 'place')
-            place.set('id', p.name)
-            self.text_element(place, p.name)
+            place.set('id', self.name_of(p))
+            self.text_element(place, self.name_of(p))
             marking = ET.SubElement(place, 'initialMarking')
             self.text_element(marking, str(self.m.tokens(p)))
         for t in self.t.tokens:
             transition = ET.SubElement(net, 'transition')
-            transition.set('id', t.name)
-            self.text_element(transition, t.name)
-        for (t,p) in set(list(self.i.tokens)):
+            transition.set('id', self.name_of(t))
+            self.text_element(transition, self.name_of(t))
+        for (t, p, n) in self.pt_arcs(self.i):
             arc = ET.SubElement(net, 'arc')
-            arc.set('id', p.name + ' to ' + t.name)
-            arc.set('source', p.name)
-            arc.set('target', t.name)
+            arc.set('id', p + ' to ' + t)
+            arc.set('source', p)
+            arc.set('target', t)
             inscription = ET.SubElement(arc, 'inscription')
-            self.text_element(inscription, str(self.i.tokens((t,p))))
+            self.text_element(inscription, str(n))
             type = ET.SubElement(arc, 'type')
             type.set('value', 'normal')
-        for (t,p) in set(list(self.o.tokens)):
+        for (t, p, n) in self.pt_arcs(self.o):
             arc = ET.SubElement(net, 'arc')
-            arc.set('id', t.name + ' to ' + p.name)
-            arc.set('source', t.name)
-            arc.set('target', p.name)
+            arc.set('id', t + ' to ' + p)
+            arc.set('source', t)
+            arc.set('target', p)
             inscription = ET.SubElement(arc, 'inscription')
-            self.text_element(inscription, str(self.o.tokens((t,p))))
+            self.text_element(inscription, str(n))
             type = ET.SubElement(arc, 'type')
             type.set('value', 'normal')
-        for (t,p) in set(list(self.h.tokens)):
+        for (t, p, n) in self.pt_arcs(self.h):
             arc = ET.SubElement(net, 'arc')
-            arc.set('id', p.name + ' to ' + t.name)
-            arc.set('source', p.name)
-            arc.set('target', t.name)
+            arc.set('id', p + ' to ' + t)
+            arc.set('source', p)
+            arc.set('target', t)
             inscription = ET.SubElement(arc, 'inscription')
-            self.text_element(inscription, str(self.h.tokens((t,p))))
+            self.text_element(inscription, str(n))
             type = ET.SubElement(arc, 'type')
             type.set('value', 'inhibitor')
         if pnml_file is None:
@@ -271,23 +966,42 @@ class PT:
 
     def __init__(self, net_name, pnml=None):
         self.name = net_name
+        # places/transitions by name (dicts, to keep the insertion order); the elements added
+        # in bulk are mapped to None until they are requested (see `get_place`, `get_places`)
         self.places = {}
         self.transitions = {}
+        self.bulk_places = []
+        self.bulk_transitions = []
         self.marking = {}
+        # lists of the input/output/inhibitor `Arc`s of each transition
         self.i = {}
         self.o = {}
         self.h = {}
+        # frozensets of the arcs of each (kind, transition) returned by `input_arcs`,
+        # `output_arcs` and `inhibitor_arcs`: built when read, dropped when arcs are added
+        self.arc_sets = {}
+        # transitions reading each place (through input/inhibitor arcs)
+        self.readers = {}
+        # incremental set of enabled transitions (None until first requested)
+        self.enabled_set = None
+        # delays of the timed transitions (the others are immediate)
+        self.delays = {}
+        # `TraceWriter` recording the firings (see `start_trace`)
+        self.trace = None
         if pnml is not None:
             self.load_pnml(pnml)
 
     def add_transition(self, transition_name):
         """Add a transition named `transition_name`"""
-        self.transitions.update({transition_name : Transition(transition_name)})
+        self.transitions[transition_name] = Transition(transition_name)
+        self.update_enabled([transition_name])
 
     def add_input_arc(self, place_name, transition_name, weight=1):
         """Add an input arc from the place `place_name` to the transition `transition_name`"""
         if place_name in self.places and transition_name in self.transitions:
             self.add_arc(place_name, transition_name, transition_name, weight, self.i)
+            self.readers.setdefault(place_name, set()).add(transition_name)
+            self.update_enabled([transition_name])
 
     def add_output_arc(self, transition_name, place_name, weight=1):
         """Add an output arc from the transition `transition_name` to the place `place_name`"""
@@ -298,108 +1012,223 @@ class PT:
         """Add an inhibitor arc from the place `place_name` to the transition `transition_name`"""
         if place_name in self.places and transition_name in self.transitions:
             self.add_arc(place_name, transition_name, transition_name, weight, self.h)
+            self.readers.setdefault(place_name, set()).add(transition_name)
+            self.update_enabled([transition_name])
+
+    def add_places(self, place_names, tokens=None):
+        """Add the places named in `place_names`, with the `tokens` at the same positions (0 by default)"""
+        place_names = list(place_names)
+        self.places.update(dict.fromkeys(place_names))
+        self.bulk_places.extend(place_names)
+        if tokens is None:
+            tokens = [0] * len(place_names)
+        for place_name, n in zip(place_names, tokens):
+            self.store_tokens(place_name, n)
+        if self.enabled_set is not None:
+            self.update_enabled(set(t for p in place_names for t in self.readers.get(p, ())))
+
+    def add_transitions(self, transition_names):
+        """Add the transitions named in `transition_names`"""
+        transition_names = list(transition_names)
+        self.transitions.update(dict.fromkeys(transition_names))
+        self.bulk_transitions.extend(transition_names)
+        self.update_enabled(transition_names)
+
+    def add_arcs(self, arcs, kind='input'):
+        """Add the `arcs` of the given `kind`: (place, transition, weight) triples for 'input' and
+        'inhibitor' arcs, (transition, place, weight) triples for 'output' arcs. The arcs of each
+        transition are appended at once; arcs between unknown nodes are ignored"""
+        if kind not in ('input', 'output', 'inhibitor'):
+            raise ValueError('Unknown kind of arcs: ' + str(kind))
+        places, transitions = self.places, self.transitions
+        added = {}
+        for arc in arcs:
+            if kind == 'output':
+                transition_name, place_name = arc[0], arc[1]
+            else:
+                place_name, transition_name = arc[0], arc[1]
+            if place_name in places and transition_name in transitions:
+                added.setdefault(transition_name, []).append(Arc(arc[0], arc[1], arc[2]))
+                if kind != 'output':
+                    self.readers.setdefault(place_name, set()).add(transition_name)
+        arc_map = {'input' : self.i, 'output' : self.o, 'inhibitor' : self.h}[kind]
+        for transition_name, new_arcs in added.items():
+            arc_map.setdefault(transition_name, []).extend(new_arcs)
+            self.arc_sets.pop((kind, transition_name), None)
+        if kind != 'output':
+            self.update_enabled(added)
+
+    @classmethod
+    def from_arrays(cls, net_name, place_names, transition_names, tokens=None, inputs=(), outputs=(), inhibitors=()):
+        """Return a net built at once from parallel arrays: the `place_names` with their `tokens`,
+        the `transition_names`, and the arcs (see `add_arcs`)"""
+        pt = cls(net_name)
+        pt.add_places(place_names, tokens)
+        pt.add_transitions(transition_names)
+        pt.add_arcs(inputs, 'input')
+        pt.add_arcs(outputs, 'output')
+        pt.add_arcs(inhibitors, 'inhibitor')
+        return pt
 
     def add_arc(self, src, trgt, transition_name, weight, arc_map):
-        arcs = []
-        if transition_name in arc_map:
-            arcs = arc_map.get(transition_name)
-        arcs += [Arc(src, trgt, weight)]
-        arc_map.update({transition_name : arcs})
+        arc_map.setdefault(transition_name, []).append(Arc(src, trgt, weight))
+        kind = 'input' if arc_map is self.i else 'output' if arc_map is self.o else 'inhibitor'
+        self.arc_sets.pop((kind, transition_name), None)
+
+    def arc_set(self, kind, arc_map, node_name):
+        """Return the arcs of `node_name` in `arc_map` as a frozenset, cached until a `kind` arc
+        of `node_name` is added. The frozenset is shared by the callers (the public accessors,
+        e.g. `input_arcs`, return a copy)"""
+        arcs = arc_map.get(node_name)
+        if arcs is None:
+            return frozenset()
+        result = self.arc_sets.get((kind, node_name))
+        if result is None:
+            result = self.arc_sets[(kind, node_name)] = frozenset(arcs)
+        return result
 
     def input_arcs(self, node_name):
         """Returns the input arcs of the transition named `node_name`"""
-        if node_name in self.transitions and node_name in self.i:
-            return set(self.i.get(node_name))
-        return set()
+        return set(self.arc_set('input', self.i, node_name))
 
     def output_arcs(self, node_name):
         """Returns the output arcs of the node named `node_name`"""
-        if node_name in self.transitions and node_name in self.o:
-            return set(self.o.get(node_name))
-        return set()
+        return set(self.arc_set('output', self.o, node_name))
 
     def inhibitor_arcs(self, node_name):
         """Returns the inhibitor arcs of the node named `node_name`"""
-        if node_name in self.transitions and node_name in self.h:
-            return set(self.h.get(node_name))
-        return set()
+        return set(self.arc_set('inhibitor', self.h, node_name))
 
     def add_place(self, place_name, tokens=0):
         """Add a place with specified `place_name` and `tokens` (0 by default)"""
-        self.places.update({place_name : Place(place_name)})
+        self.places[place_name] = Place(place_name)
         self.set_tokens(place_name, tokens)
 
     def set_tokens(self, place_name, tokens):
         """Set #`tokens` tokens into the place named `place_name`"""
         if place_name in self.places:
-            if tokens>0:
-                self.marking.update({place_name : tokens})
-            if tokens==0 and place_name in self.marking:
-                del self.marking[place_name]
+            self.store_tokens(place_name, tokens)
+            self.update_enabled(self.readers.get(place_name, ()))
+
+    def store_tokens(self, place_name, tokens):
+        if tokens>0:
+            self.marking.update({place_name : tokens})
+        if tokens==0 and place_name in self.marking:
+            del self.marking[place_name]
 
     def get_tokens(self, place_name):
         """Return the number of tokens in place named `place_name`"""
-        if place_name in self.places and place_name in self.marking:
-            return self.marking.get(place_name)
-        return 0
+        # only the places of the net are marked (see `set_tokens`)
+        return self.marking.get(place_name, 0)
 
     def get_place(self, place_name):
         """Return a specific place named `place_name`"""
-        if place_name in self.places:
-            return self.places.get(place_name)
-        return None
+        place = self.places.get(place_name)
+        if place is None and place_name in self.places:
+            # added in bulk: built once, when first requested
+            place = self.places[place_name] = Place(place_name)
+        return place
 
     def enabled(self, transition_name):
         """Return True if the `transition_name` transition is enabled in the current marking"""
         if transition_name not in self.transitions:
             return False
-        for input_arc in self.input_arcs(transition_name):
-            if self.get_tokens(input_arc.src) < input_arc.weight:
+        marking = self.marking
+        for input_arc in self.i.get(transition_name, ()):
+            if marking.get(input_arc.src, 0) < input_arc.weight:
                     return False
-        for inhibitor_arc in self.inhibitor_arcs(transition_name):
-            if self.get_tokens(inhibitor_arc.src) >= inhibitor_arc.weight:
+        for inhibitor_arc in self.h.get(transition_name, ()):
+            if marking.get(inhibitor_arc.src, 0) >= inhibitor_arc.weight:
                     return False
         return True
 
     def fire(self, transition_name):
         """Fire the transition `transition_name`, if enabled"""
         if self.enabled(transition_name):
-            for i in self.input_arcs(transition_name):
-                self.set_tokens(i.src, self.get_tokens(i.src)-i.weight)
-            for o in self.output_arcs(transition_name):
-                self.set_tokens(o.dst, self.get_tokens(o.dst)+o.weight)
+            inputs = self.i.get(transition_name, ())
+            outputs = self.o.get(transition_name, ())
+            for i in inputs:
+                self.store_tokens(i.src, self.get_tokens(i.src)-i.weight)
+            for o in outputs:
+                self.store_tokens(o.dst, self.get_tokens(o.dst)+o.weight)
+            if self.enabled_set is None and self.trace is None:
+                return
+            changed = set(i.src for i in inputs)
+            changed.update(o.dst for o in outputs)
+            affected = set()
+            for p in changed:
+                affected.update(self.readers.get(p, ()))
+            self.update_enabled(affected)
+            if self.trace is not None:
+                self.trace.record(transition_name, None, ((p, None, self.get_tokens(p)) for p in changed))
+
+    def start_trace(self, file, every=1000):
+        """Record the next firings into `file` (see `TraceWriter`), starting from the current marking"""
+        self.stop_trace()
+        self.trace = TraceWriter(file, self.marking, every)
+
+    def stop_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def enabled_transitions(self):
+        """Return the set of transitions enabled in the current marking.
+        The set is computed once, then it is kept up to date by re-checking only the transitions
+        reading a place changed by `fire`, `set_tokens` or by the addition of arcs"""
+        if self.enabled_set is None:
+            self.enabled_set = set(t for t in self.transitions if self.enabled(t))
+        return set(self.enabled_set)
+
+    def update_enabled(self, transitions):
+        if self.enabled_set is None:
+            return
+        for t in transitions:
+            if self.enabled(t):
+                self.enabled_set.add(t)
+            else:
+                self.enabled_set.discard(t)
+
+    def set_delay(self, transition_name, delay):
+        """Set the `delay` (e.g., `Exponential(rate)` or `Deterministic(time)`) of the transition
+        `transition_name` (None makes it immediate)"""
+        if delay is None:
+            self.delays.pop(transition_name, None)
+        elif transition_name in self.transitions:
+            self.delays[transition_name] = delay
+
+    def get_delay(self, transition_name):
+        """Return the delay of the transition `transition_name` (None if immediate)"""
+        return self.delays.get(transition_name)
 
     def get_marking(self):
         return self.marking
 
+    def to_matrix(self, sparse=False):
+        """Return an array backend of the net (`MatrixPT`, requires numpy), either `sparse` (CSR) or dense"""
+        return MatrixPT(self, sparse)
+
     def load_pnml(self, pnml):
-        """Load PT elements from the `pnml` file path"""
-        pnml = minidom.parse(pnml)
-        for place in pnml.getElementsByTagName('place'):
-            place_name = place.attributes['id'].value
-            tokens = 0
-            marking = place.getElementsByTagName('initialMarking')
-            if len(marking)>0:
-                tokens = int(marking[0].getElementsByTagName('text')[0].firstChild.nodeValue)
-            self.add_place(place_name, tokens)
-        for transition in pnml.getElementsByTagName('transition'):
-            transition_name = transition.attributes['id'].value
-            self.add_transition(transition_name)
-        for arc in pnml.getElementsByTagName('arc'):
-            src = arc.attributes['source'].value
-            trgt = arc.attributes['target'].value
-            arc_weight = arc.getElementsByTagName('inscription')
-            weight = 1
-            if len(arc_weight)>0:
-                weight = int(arc_weight[0].getElementsByTagName('text')[0].firstChild.nodeValue)
-            if trgt in self.transitions:
-                arc_type = arc.getElementsByTagName('type')
-                if len(arc_type)>0 and arc_type[0].attributes['value'].value == 'inhibitor':
-                    self.add_inhibitor_arc(src, trgt, weight)
-                else:
-                    self.add_input_arc(src, trgt, weight)
+        """Load PT elements from `pnml` (a file path or a file-like object), in a single streaming pass"""
+        self.load_events(read_pnml(pnml))
+
+    def load_events(self, events):
+        """Load PT elements from place/transition/arc `events` (see `read_pnml`), added in bulk"""
+        places, tokens, transitions = [], [], []
+        arcs = {'input' : [], 'output' : [], 'inhibitor' : []}
+        for event in events:
+            kind = event[0]
+            if kind == 'place':
+                places.append(event[1])
+                tokens.append(event[2])
+            elif kind == 'transition':
+                transitions.append(event[1])
             else:
-                self.add_output_arc(src, trgt, weight)
+                arcs[kind].append(event[1:])
+        self.add_places(places, tokens)
+        self.add_transitions(transitions)
+        for kind in ('input', 'output', 'inhibitor'):
+            self.add_arcs(arcs[kind], kind)
 
     def export_dot(self, dot_file=None):
         dot = Digraph(comment=self.name)
@@ -431,15 +1260,28 @@ class PT:
         self.i.clear()
         self.o.clear()
         self.h.clear()
+        self.arc_sets.clear()
+        self.readers.clear()
+        self.delays.clear()
 
     def get_name(self):
         return self.name
 
     def get_places(self):
-        return self.places
+        """Return the dict of the places by name"""
+        return self.build(self.places, self.bulk_places, Place)
 
     def get_transitions(self):
-        return self.transitions
+        """Return the dict of the transitions by name"""
+        return self.build(self.transitions, self.bulk_transitions, Transition)
+
+    def build(self, elements, bulk, cls):
+        """Build the `cls` objects of the elements added in `bulk` (once), and return `elements`"""
+        for name in bulk:
+            if elements.get(name, False) is None:
+                elements[name] = cls(name)
+        bulk.clear()
+        return elements
 
     def get_input_arcs(self):
         return self.i
@@ -463,35 +1305,22 @@ class PT:
 
 class Arc:
 
+    # no per-instance dict: an arc is three references
+    __slots__ = ('src', 'dst', '_weight')
+
     def __init__(self, src_node_name, dst_node_name, w=1):
         self.src = src_node_name
         self.dst = dst_node_name
         self.weight = w
 
-    @property
-    def src(self):
-        return self.__src
-
-    @src.setter
-    def src(self, src_node_name):
-        self.__src = src_node_name
-
-    @property
-    def dst(self):
-        return self.__dst
-
-    @dst.setter
-    def dst(self, dst_node_name):
-        self.__dst = dst_node_name
-
     @property
     def weight(self):
-        return self.__weight
+        return self._weight
 
     @weight.setter
     def weight(self, w):
         if w > 0:
-            self.__weight = w
+            self._weight = w
 
     def __repr__(self):
         return 'Arc(' + self.src + ', ' + self.dst + ', ' + str(self.weight) + ')'
@@ -0,0 +1,122 @@
+from hashlib import sha256
+import io
+import os
+import pickle
+import tempfile
+
+from .base import PT, Emulator, load_tokens
+from .pnml import read_pnml
+
+# reification places stored by `NetCache.load_emulator`
+ENCODED_PLACES = ('P', 'T', 'M', 'I', 'O', 'H')
+
+class NetCache:
+    """An on-disk cache of parsed PNML files, keyed by the SHA-256 of their content.
+    An entry stores either the place/transition/arc events of the P/T net (`load_pt`), or the
+    contents of the reification places encoding it (`load_emulator`), as pickled plain data:
+    a warm load neither parses XML nor encodes the net.
+    Entries are evicted in least-recently-used order when the directory grows beyond `max_size` bytes."""
+
+    def __init__(self, directory, max_size=256 << 20):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, pnml):
+        """Return the content of `pnml` (a file path or a binary file-like object)"""
+        if hasattr(pnml, 'read'):
+            return pnml.read()
+        with open(pnml, 'rb') as pnml_file:
+            return pnml_file.read()
+
+    def path(self, digest, kind):
+        return os.path.join(self.directory, digest + '.' + kind)
+
+    def get(self, digest, kind):
+        """Return the cached entry (None on a miss), marking it as recently used.
+        An entry evicted concurrently, truncated, or written by an older version is a miss"""
+        path = self.path(digest, kind)
+        try:
+            with open(path, 'rb') as entry:
+                data = pickle.load(entry)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            return None
+        return data
+
+    def put(self, digest, kind, data):
+        """Store an entry (atomically, so that concurrent jobs never read a partial file)"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as entry:
+            pickle.dump(data, entry, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(digest, kind))
+        self.evict()
+
+    def events(self, pnml):
+        """Return the (possibly cached) list of place/transition/arc events of `pnml` (see `read_pnml`)"""
+        content = self.read(pnml)
+        digest = sha256(content).hexdigest()
+        events = self.get(digest, 'pt')
+        if events is None:
+            events = list(read_pnml(io.BytesIO(content)))
+            self.put(digest, 'pt', events)
+        return digest, events
+
+    def load_pt(self, pnml, name=None):
+        """Return the `PT` net of `pnml` (named `name`, or after the file)"""
+        if name is None:
+            name = os.path.basename(pnml) if isinstance(pnml, str) else 'pnml'
+        pt = PT(name)
+        pt.load_events(self.events(pnml)[1])
+        return pt
+
+    def load_emulator(self, pnml, concur=True, engine='snakes'):
+        """Return an `Emulator` of the P/T net of `pnml`: its reification places are filled
+        with the cached contents, without encoding the net"""
+        content = self.read(pnml)
+        digest = sha256(content).hexdigest()
+        encoded = self.get(digest, 'emulator')
+        emulator = Emulator(concur=concur, engine=engine)
+        places = [emulator.net.place(p) for p in ENCODED_PLACES]
+        if encoded is None:
+            emulator.load_pt_events(self.events(io.BytesIO(content))[1])
+            self.put(digest, 'emulator', [list(dict.items(place.tokens)) for place in places])
+        else:
+            for place, items in zip(places, encoded):
+                load_tokens(place, dict(items))
+        return emulator
+
+    def entries(self):
+        """Return the (last use, size, path) of the entries, least recently used first"""
+        result = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+        result.sort()
+        return result
+
+    def size(self):
+        return sum(size for (used, size, path) in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in `max_size` bytes"""
+        entries = self.entries()
+        total = sum(size for (used, size, path) in entries)
+        for (used, size, path) in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for (used, size, path) in self.entries():
+            os.remove(path)
@@ -0,0 +1,158 @@
+from collections import deque
+
+from .statespace import CompactNet, ReachabilityGraph
+
+# the omega of the omega-markings: it absorbs any addition or subtraction of tokens
+OMEGA = float('inf')
+
+class KarpMiller:
+    """Karp-Miller construction of the coverability graph of a P/T net (either a `PT` or the net
+    encoded by the `M`, `I`, `O`, `H` places of an `Emulator`).
+    States are omega-markings (tuples of token counts, where `OMEGA` stands for an unbounded count).
+    A path from an ancestor to a greater marking is only accelerated if none of its transitions is
+    inhibited by a growing place (so that it can be fired again). A transition inhibited by a place
+    holding omega tokens is considered enabled: with inhibitor arcs the graph may over-approximate
+    the unbounded places, and its construction should be bounded by `max_states`."""
+
+    def __init__(self, net):
+        self.net = CompactNet.of(net)
+
+    def initial(self):
+        return tuple(self.net.marking)
+
+    def enabled(self, marking, t):
+        """Return True if the transition with index `t` is enabled in the omega-marking `marking`"""
+        for p, w in self.net.pre[t]:
+            if marking[p] < w:
+                return False
+        for p, w in self.net.inh[t]:
+            if marking[p] >= w and marking[p] != OMEGA:
+                return False
+        return True
+
+    def successors(self, marking):
+        """Return the list of (transition index, omega-marking) pairs reachable from `marking` in one step
+        (before acceleration)"""
+        result = []
+        for t in range(0, len(self.net.transitions)):
+            if self.enabled(marking, t):
+                succ = list(marking)
+                self.net.fire(succ, t)
+                result.append((t, succ))
+        return result
+
+    def decode(self, marking):
+        """Return the omega-marking as a dict (omitting empty places)"""
+        return {self.net.places[k] : n for k, n in enumerate(marking) if n > 0}
+
+    def explore(self, max_states=None):
+        """Build and return the `CoverabilityGraph`. When the graph grows beyond `max_states`
+        states the construction stops (the graph is not complete, but the places already holding
+        omega tokens are reported as unbounded anyway)."""
+        graph = CoverabilityGraph(self)
+        root = graph.add_state(self.initial())
+        # each node of the Karp-Miller tree (built breadth-first, to keep the paths to the root short):
+        # (graph state, parent node, support bitmask, size, transition from the parent)
+        nodes = [(root, None, support(graph.states[root]), size(graph.states[root]), None)]
+        frontier = deque([0])
+        while len(frontier) > 0:
+            node = frontier.popleft()
+            k = nodes[node][0]
+            for t, succ in self.successors(graph.states[k]):
+                self.accelerate(succ, t, nodes, node, graph.states)
+                succ = tuple(succ)
+                j = graph.index.get(succ)
+                if j is None:
+                    if max_states is not None and len(graph.states) >= max_states:
+                        graph.complete = False
+                        continue
+                    j = graph.add_state(succ)
+                    nodes.append((j, node, support(succ), size(succ), t))
+                    frontier.append(len(nodes) - 1)
+                graph.add_edge(k, self.net.transitions[t], j)
+        return graph
+
+    def accelerate(self, marking, t, nodes, node, states):
+        """Put OMEGA into every place of `marking` (a list, reached from `node` by firing `t`) that
+        strictly grows with respect to an ancestor it covers, walking the ancestors up to the root"""
+        mask = support(marking)
+        total = size(marking)
+        # places inhibiting a transition of the path from the ancestor to `marking`
+        blocked = set(p for p, w in self.net.inh[t])
+        while node is not None:
+            k, parent, ancestor_mask, ancestor_total, t = nodes[node]
+            ancestor = states[k]
+            # a strictly covered ancestor is smaller, and its support is included in the support of `marking`
+            if ancestor_total < total and ancestor_mask & ~mask == 0 and covers(marking, ancestor):
+                growing = [p for p in range(0, len(marking)) if marking[p] > ancestor[p]]
+                if not any(p in blocked for p in growing):
+                    for p in growing:
+                        marking[p] = OMEGA
+            if t is not None:
+                blocked.update(p for p, w in self.net.inh[t])
+            node = parent
+
+def support(marking):
+    """Return the bitmask of the places holding some tokens"""
+    mask = 0
+    for k in range(0, len(marking)):
+        if marking[k] > 0:
+            mask |= 1 << k
+    return mask
+
+def size(marking):
+    """Return the (number of omega places, number of tokens in the other places) pair of `marking`:
+    the size of a marking is lexicographically smaller than the size of any marking strictly covering it"""
+    omegas = 0
+    tokens = 0
+    for n in marking:
+        if n == OMEGA:
+            omegas += 1
+        else:
+            tokens += n
+    return (omegas, tokens)
+
+def covers(marking, other):
+    """Return True if `marking` is greater than or equal to `other` in every place"""
+    for p in range(0, len(marking)):
+        if marking[p] < other[p]:
+            return False
+    return True
+
+class CoverabilityGraph(ReachabilityGraph):
+    """A coverability graph: a reachability graph whose states are omega-markings"""
+
+    def bounds(self):
+        """Return the maximum number of tokens of each place (`OMEGA` if unbounded)"""
+        places = self.explorer.net.places
+        result = {p : 0 for p in places}
+        for marking in self.states:
+            for k in range(0, len(places)):
+                if marking[k] > result[places[k]]:
+                    result[places[k]] = marking[k]
+        return result
+
+    def unbounded_places(self):
+        """Return the names of the places that can hold an unbounded number of tokens"""
+        return [p for p, n in self.bounds().items() if n == OMEGA]
+
+    def bounded_places(self):
+        """Return the names of the bounded places (meaningful only if the graph is complete)"""
+        return [p for p, n in self.bounds().items() if n != OMEGA]
+
+    def is_bounded(self):
+        return self.complete and len(self.unbounded_places()) == 0
+
+    def coverable(self, marking):
+        """Return True if some reachable marking covers `marking` (a dict of place name : tokens)"""
+        index = self.explorer.net.place_index
+        if any(p not in index for p in marking):
+            return False
+        target = [0] * len(index)
+        for p, n in marking.items():
+            target[index[p]] = n
+        return any(covers(state, target) for state in self.states)
+
+def coverability_graph(net, max_states=None):
+    """Return the Karp-Miller coverability graph of either a `PT` or the P/T net encoded by an `Emulator`"""
+    return KarpMiller(net).explore(max_states)
@@ -0,0 +1,297 @@
+from snakes.data import MultiSet
+from itertools import count
+
+# versions are drawn from a single clock, so that two different contents never share a version
+_clock = count(1)
+
+class VersionedMultiSet(MultiSet):
+    """A MultiSet carrying a `version` number that changes whenever its content changes
+    (a copy keeps the version of the original, since it has the same content)"""
+
+    def __init__(self, values=[]):
+        self.version = next(_clock)
+        MultiSet.__init__(self, values)
+
+    def __setitem__(self, key, times):
+        MultiSet.__setitem__(self, key, times)
+        self.version = next(_clock)
+
+    def __delitem__(self, key):
+        MultiSet.__delitem__(self, key)
+        self.version = next(_clock)
+
+    def clear(self):
+        MultiSet.clear(self)
+        self.version = next(_clock)
+
+    def update(self, other):
+        for key, times in dict.items(other):
+            self[key] = times
+
+    def load(self, counts):
+        """Add the tokens of the {token : count} dict `counts` at once (a single version change)"""
+        self.__mutable__()
+        if dict.__len__(self) == 0:
+            dict.update(self, {token : times for token, times in counts.items() if times > 0})
+        else:
+            for token, times in counts.items():
+                if times > 0:
+                    dict.__setitem__(self, token, dict.get(self, token, 0) + times)
+        self.version = next(_clock)
+
+    def __le__(self, other):
+        # by counts: MultiSet compares the whole sets of keys first
+        for key, times in dict.items(self):
+            if other(key) < times:
+                return False
+        return True
+
+    def __ge__(self, other):
+        # also used by `m <= self` for a plain MultiSet `m` (e.g., when checking a Variable arc)
+        if not isinstance(other, MultiSet):
+            return NotImplemented
+        for key, times in dict.items(other):
+            if self(key) < times:
+                return False
+        return True
+
+    def copy(self):
+        """Return a copy of the multiset (sharing the same version)"""
+        result = self.__class__()
+        dict.update(result, self)
+        result.version = self.version
+        return result
+
+class Relation(VersionedMultiSet):
+    """A MultiSet of (key, value) pairs (e.g., {('t0', 'p0') * 2, ('t0', 'p1')})
+    indexed both by key and by value.
+    It is used as the content of the I/O/H reification places, so that the pairs
+    sharing a key (or a value) are retrieved without scanning the whole relation."""
+
+    def __init__(self, values=[]):
+        self._by_key = {}
+        self._by_value = {}
+        # (version, {(kind, key) : result}) of the memoized lookups (see `lookup`)
+        self._memo = None
+        VersionedMultiSet.__init__(self, values)
+
+    def _pair(self, token):
+        """Return the (key, value) pair of a token"""
+        return token
+
+    def token(self, pair):
+        """Return the token storing the (key, value) `pair`"""
+        return pair
+
+    # the indexes map a key (a value) to the set of its tokens, which are the very objects
+    # stored in the multiset: indexing a pair allocates no new object
+
+    def _link(self, token):
+        key, value = self._pair(token)
+        self._by_key.setdefault(key, set()).add(token)
+        self._by_value.setdefault(value, set()).add(token)
+
+    def _unlink(self, token):
+        key, value = self._pair(token)
+        tokens = self._by_key.get(key)
+        tokens.discard(token)
+        if len(tokens) == 0:
+            del self._by_key[key]
+        tokens = self._by_value.get(value)
+        tokens.discard(token)
+        if len(tokens) == 0:
+            del self._by_value[value]
+
+    def __setitem__(self, pair, times):
+        if not dict.__contains__(self, pair):
+            self._link(pair)
+        VersionedMultiSet.__setitem__(self, pair, times)
+
+    def __delitem__(self, pair):
+        VersionedMultiSet.__delitem__(self, pair)
+        self._unlink(pair)
+
+    def clear(self):
+        VersionedMultiSet.clear(self)
+        self._by_key = {}
+        self._by_value = {}
+
+    def load(self, counts):
+        # indexes the new tokens inline (see `_link`)
+        by_key, by_value, pair = self._by_key, self._by_value, self._pair
+        for token, times in counts.items():
+            if times > 0 and not dict.__contains__(self, token):
+                key, value = pair(token)
+                tokens = by_key.get(key)
+                if tokens is None:
+                    by_key[key] = {token}
+                else:
+                    tokens.add(token)
+                tokens = by_value.get(value)
+                if tokens is None:
+                    by_value[value] = {token}
+                else:
+                    tokens.add(token)
+        VersionedMultiSet.load(self, counts)
+
+    def copy(self):
+        """Return a copy of the relation (indexes included). The memoized lookups are shared:
+        they are valid as long as the version is the same"""
+        result = VersionedMultiSet.copy(self)
+        result._by_key = {k: set(v) for k, v in self._by_key.items()}
+        result._by_value = {v: set(k) for v, k in self._by_value.items()}
+        result._memo = self._memo
+        return result
+
+    def values_of(self, key):
+        """Return a MultiSet of the values associated with `key` (multiplicity is preserved)"""
+        result = MultiSet([])
+        for token in self._by_key.get(key, ()):
+            result._add(self._pair(token)[1], dict.__getitem__(self, token))
+        return result
+
+    def keys_of(self, value):
+        """Return a MultiSet of the keys associated with `value` (multiplicity is preserved)"""
+        result = MultiSet([])
+        for token in self._by_value.get(value, ()):
+            result._add(self._pair(token)[0], dict.__getitem__(self, token))
+        return result
+
+    def lookup(self, kind, key):
+        """Return the MultiSet of the values (`kind` is 'values') or of the keys ('keys')
+        associated with `key`. Results are memoized until the relation changes (at most one
+        per key and value), and shared by the callers: they must not be changed"""
+        memo = self._memo
+        if memo is None or memo[0] != self.version:
+            memo = self._memo = (self.version, {})
+        result = memo[1].get((kind, key))
+        if result is None:
+            result = self.values_of(key) if kind == 'values' else self.keys_of(key)
+            memo[1][(kind, key)] = result
+        return result
+
+    def with_key(self, key):
+        """Return a MultiSet of the pairs having the given `key`"""
+        result = MultiSet([])
+        for token in self._by_key.get(key, ()):
+            result._add(token, dict.__getitem__(self, token))
+        return result
+
+    def with_value(self, value):
+        """Return a MultiSet of the pairs having the given `value`"""
+        result = MultiSet([])
+        for token in self._by_value.get(value, ()):
+            result._add(token, dict.__getitem__(self, token))
+        return result
+
+    def pairs(self):
+        """Iterate over the distinct (key, value) pairs together with their multiplicity"""
+        for token, times in dict.items(self):
+            yield (self._pair(token), times)
+
+# bits of the value id in a packed (key id, value id) token
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+class PackedRelation(Relation):
+    """A Relation between integer ids whose (key, value) pairs are packed into single ints
+    (`key << ID_BITS | value`), used by the interned encoding (see `InternTable`).
+    Its tokens are packed ints, but a (key, value) tuple is accepted wherever a token is
+    (e.g., `I((t, p))`, or adding `repeat((t, p), n)`)"""
+
+    def _pair(self, token):
+        return (token >> ID_BITS, token & ID_MASK)
+
+    def _packed(self, token):
+        if type(token) is tuple:
+            return (token[0] << ID_BITS) | token[1]
+        return token
+
+    def token(self, pair):
+        return self._packed(pair)
+
+    def __call__(self, token):
+        return dict.get(self, self._packed(token), 0)
+
+    def get(self, token, default=None):
+        return dict.get(self, self._packed(token), default)
+
+    def __contains__(self, token):
+        return dict.__contains__(self, self._packed(token))
+
+    def __getitem__(self, token):
+        return dict.__getitem__(self, self._packed(token))
+
+    def __setitem__(self, token, times):
+        Relation.__setitem__(self, self._packed(token), times)
+
+    def __delitem__(self, token):
+        Relation.__delitem__(self, self._packed(token))
+
+    def load(self, counts):
+        Relation.load(self, {self._packed(token) : times for token, times in counts.items()})
+
+class InternTable:
+    """The names of the P/T elements of an interned encoding (see `Emulator`), mapped to
+    small integer ids (0, 1, 2, ...) in order of appearance. Ids are never reused"""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, element):
+        """Return the id of the element named `element` (added if new; an id is returned as is)"""
+        if type(element) is int:
+            return element
+        k = self.ids.get(element)
+        if k is None:
+            k = len(self.names)
+            self.ids[element] = k
+            self.names.append(element)
+        return k
+
+    def find(self, element):
+        """Return the id of the element named `element` (`element` itself if unknown, or an id)"""
+        if type(element) is int:
+            return element
+        return self.ids.get(element, element)
+
+    def name_of(self, k):
+        """Return the name of the element with id `k`"""
+        return self.names[k]
+
+    def scratch(self):
+        """Return an `InternScratch` over the table"""
+        return InternScratch(self)
+
+class InternScratch:
+    """Ids given to new names without changing an `InternTable` (e.g., while a set of changes
+    may still fail): `commit` adds the new names to the table, with the same ids"""
+
+    def __init__(self, table):
+        self.table = table
+        self.new = {}
+
+    def intern(self, element):
+        """Return the id of the element named `element` (see `InternTable.intern`)"""
+        if type(element) is int:
+            return element
+        k = self.table.ids.get(element)
+        if k is None:
+            k = self.new.get(element)
+            if k is None:
+                k = len(self.table.names) + len(self.new)
+                self.new[element] = k
+        return k
+
+    def clear(self):
+        """Forget the new names (their ids are given again to the next new names)"""
+        self.new = {}
+
+    def commit(self):
+        for element in self.new:
+            self.table.intern(element)
+        self.new = {}
@@ -1,38 +1,69 @@
 from snakes.data import MultiSet
+from .data import VersionedMultiSet, Relation
+
+def repeat(e, n):
+    """ Given an element `e` and a multiplicity `n`,
+    it returns the MultiSet holding `e` `n` times, without building a list of `n` elements.
+    e.g., repeat('p0', 3) = {'p0' * 3}"""
+    result = MultiSet([])
+    if n > 0:
+        result._add(e, n)
+    return result
+
+def _clear(m, e):
+    """ Remove all the occurrences of `e` from `m`, in place """
+    if m(e) > 0:
+        m._remove(e, m(e))
+
+def _pairs(m):
+    """ Iterate over the distinct elements of `m` together with their multiplicity """
+    if isinstance(m, MultiSet):
+        return dict.items(m)
+    return ((e, 1) for e in m)
+
+# `_keys`/`_values` are the lookups read by the net expressions and the emulator: on a
+# Relation they return the memoized result (see `Relation.lookup`), which must not be changed
+
+def _keys(m, v):
+    if isinstance(m, Relation):
+        return m.lookup('keys', v)
+    result = MultiSet([])
+    for pair, n in _pairs(m):
+        if pair[1] == v:
+            result._add(pair[0], n)
+    return result
+
+def _values(m, k):
+    if isinstance(m, Relation):
+        return m.lookup('values', k)
+    result = MultiSet([])
+    for pair, n in _pairs(m):
+        if pair[0] == k:
+            result._add(pair[1], n)
+    return result
 
 def keys(m, v):
     """ Given a MultiSet `m` of key-value pairs (e.g., {('t0', 'p1'), ('t0', 'p2')})
     and a value `v` (e.g., 'p1'),
     it returns a multiset containing the keys associated with the value `v`.
     e.g., pre_pl({('t0', 'p1'), ('t0', 'p2')}, 'p1') = {'t0'}"""
-    result = MultiSet([])
-    for pair in m:
-        if pair[1] == v:
-            result.add(pair[0])
-    return result
+    result = _keys(m, v)
+    return result.copy() if isinstance(m, Relation) else result
 
 def values(m, k):
     """ Given a MultiSet `m` of key-value pairs (e.g., {('t0', 'p1'), ('t0', 'p2')})
     and an key `k` (e.g., 't0'),
     it returns a multiset containing the values associated with the key `k`.
     e.g., pre_tr({('t0', 'p1'), ('t0', 'p2')}, 't0') = {'p1', 'p2'}"""
-    result = MultiSet([])
-    for pair in m:
-        if pair[0] == k:
-            result.add(pair[1])
-    return result
+    result = _values(m, k)
+    return result.copy() if isinstance(m, Relation) else result
 
 def value(m, key):
     """ Given a MultiSet `m` of (key, value) pairs (e.g., {('t0', 'p0'), ('t0', 'p1')}),
     it returns a MultiSet of the values associated with the given `key`.
     e.g., value({('t0', 'p0') * 2, ('t0', 'p1')}, 't0') = {'p0' * 2, 'p1'}"""
-    #print('value( ' + str(m) + ', ' + str(key) + ' )')
-    result = MultiSet([])
-    for pair in m:
-            if pair[0] == key:
-                result = result + MultiSet([pair[1]])
-    #print('  result = ' + str(result))
-    return result
+    result = _values(m, key)
+    return result.copy() if isinstance(m, Relation) else result
 
 def projection(m1, m2):
     """ Given two MultiSets `m1`, `m2` (e.g., {'p0', 'p1'}, {'p0' * 2}),
@@ -40,17 +71,26 @@ def projection(m1, m2):
     e.g., projection({'p0', 'p1'}, {'p0' * 2}) = {'p0'}"""
     #print('projection( ' + str(m1) + ', ' + str(m2) + ' )')
     result = MultiSet([])
-    for e in m1:
+    for e, n in _pairs(m1):
         if m2(e)>0:
-            result.add([e])
+            result._add(e, n)
     #print('  result = ' + str(result))
     return result
 
+def included(m1, m2):
+    """ Given two MultiSets `m1`, `m2` (e.g., {'p0' * 2}, {'p0' * 2, 'p1'}),
+    it returns True if each element of `m1` appears in `m2` with at least the same multiplicity
+    (like `m1 <= m2`, in time linear in the distinct elements of `m1` only). """
+    for e, n in _pairs(m1):
+        if m2(e) < n:
+            return False
+    return True
+
 def inhibits(m1, m2):
     """ Given two MultiSets `m1`, `m2` (e.g., {'p0' * 2, 'p1', 'p2'}, {'p0', 'p2'}),
     it returns False if there exists an element in m2 with >= multiplicity. """
-    for e in m1:
-        if m2(e) >= m1(e):
+    for e, n in _pairs(m1):
+        if m2(e) >= n:
             return True
     return False
 
@@ -58,23 +98,22 @@ def intersection(m1, m2):
     """ Given two MultiSets `m1`, `m2` (e.g., {'p0' * 2, 'p1', 'p2'}, {'p0', 'p2'}),
     it returns the intersection. e.g., intersection({'p0' *2, 'p1', 'p2'}, {'p0', 'p2'}) = {'p0', 'p2'}"""
     result = MultiSet([])
-    for e in set(m1):
-        n1 = m1(e)
+    for e, n1 in _pairs(m1):
         n2 = m2(e)
         if n1>0 and n2>0:
             mult = n1
             if n2 < n1:
                 mult = n2
-            result.add([e] * mult)
+            result._add(e, mult)
     return result
 
 def setMultiplicity(m, e, n):
     """ Given a MultiSet `m` an element `e` and a multiplicity `n`,
     it returns a new MultiSet `m'`, s.t. `m'(e)=n`"""
     result = m.copy()
-    if m(e) > 0:
-        result.remove(e, m(e))
-    result.add(e, n)
+    _clear(result, e)
+    if n > 0:
+        result._add(e, n)
     return result
 
 def filterByValue(m, v):
@@ -82,10 +121,12 @@ def filterByValue(m, v):
     and a value `v` (e.g., 'p1'),
     it returns a multiset containing the pairs with the given value `v`.
     e.g., filterByValue({('t0', 'p1'), ('t0', 'p2')}, 'p1') = {('t0', 'p1') * 2}"""
+    if isinstance(m, Relation):
+        return m.with_value(v)
     result = MultiSet([])
-    for pair in m:
+    for pair, n in _pairs(m):
         if pair[1] == v:
-            result.add([pair])
+            result._add(pair, n)
     return result
 
 def filterByKey(m, k):
@@ -93,8 +134,144 @@ def filterByKey(m, k):
     and a key `k` (e.g., 't0'),
     it returns a multiset containing the pairs with the given key `k`.
     e.g., filterByKey({('t0', 'p1'), ('t0', 'p2')}, 't0') = {('t0', 'p2')}"""
+    if isinstance(m, Relation):
+        return m.with_key(k)
     result = MultiSet([])
-    for pair in m:
+    for pair, n in _pairs(m):
         if pair[0] == k:
-            result.add([pair])
+            result._add(pair, n)
+    return result
+
+# (operation, reification place) of the arc changes
+ARC_CHANGES = {
+    'addInputArc' : ('add', 'I'), 'removeInputArc' : ('remove', 'I'), 'setInputArcMult' : ('set', 'I'),
+    'addOutputArc' : ('add', 'O'), 'removeOutputArc' : ('remove', 'O'), 'setOutputArcMult' : ('set', 'O'),
+    'addInhibitorArc' : ('add', 'H'), 'removeInhibitorArc' : ('remove', 'H'), 'setInhibitorArcMult' : ('set', 'H')}
+
+def changedPlaces(change):
+    """ Given a change (see `applyChanges`), it returns the names of the reification places it modifies. """
+    op = change[0]
+    if op == 'addPlace':
+        return ('P',)
+    if op == 'addTransition':
+        return ('T',)
+    if op == 'setTokens':
+        return ('M',)
+    if op == 'removePlace':
+        return ('P', 'I', 'O', 'H', 'M')
+    if op == 'removeTransition':
+        return ('T', 'I', 'O', 'H')
+    if op not in ARC_CHANGES:
+        raise ValueError('Unknown change: ' + repr(change))
+    return (ARC_CHANGES[op][1],)
+
+def _tokens(m, index, e):
+    """ Return the tokens of the pairs of `m` whose key (`index` 0) or value (`index` 1) is `e` """
+    if isinstance(m, Relation):
+        return list(dict.keys(m.with_key(e) if index == 0 else m.with_value(e)))
+    return [pair for pair in dict.keys(m) if pair[index] == e]
+
+def changedCounts(m, place, changes):
+    """ Given the content `m` of the reification place named `place` and a list of `changes`
+    (see `applyChanges`), it returns the new {token : count} of the tokens changed by the changes
+    concerning `place` (0 for a removed token), without changing `m`.
+    e.g., changedCounts({('t0', 'p0')}, 'I', [('addInputArc', 'p1', 't0', 2)]) = {('t0', 'p1') : 2} """
+    counts = {}
+    # pairs added by the changes (not indexed by `m`)
+    added = {}
+    def count(e):
+        return counts[e] if e in counts else dict.get(m, e, 0)
+    def remove(e, n):
+        if n > count(e):
+            raise ValueError('not enough occurrences')
+        counts[e] = count(e) - n
+    def clear(index, e):
+        for token in _tokens(m, index, e):
+            counts[token] = 0
+        for token, pair in added.items():
+            if pair[index] == e:
+                counts[token] = 0
+    for change in changes:
+        if place not in changedPlaces(change):
+            continue
+        op = change[0]
+        if op in ('addPlace', 'addTransition'):
+            counts[change[1]] = count(change[1]) + 1
+        elif op == 'setTokens':
+            counts[change[1]] = max(change[2], 0)
+        elif op == 'removePlace':
+            if place == 'P':
+                remove(change[1], 1)
+            elif place == 'M':
+                counts[change[1]] = 0
+            else:
+                clear(1, change[1])
+        elif op == 'removeTransition':
+            if place == 'T':
+                remove(change[1], 1)
+            else:
+                clear(0, change[1])
+        else:
+            operation = ARC_CHANGES[op][0]
+            pair, n = (change[2], change[1]), change[3]
+            token = m.token(pair) if isinstance(m, Relation) else pair
+            if operation == 'remove':
+                remove(token, n)
+                continue
+            if operation == 'set':
+                counts[token] = 0
+            if n > 0:
+                counts[token] = count(token) + n
+                added[token] = pair
+    return counts
+
+def withCounts(m, counts):
+    """ Given a MultiSet `m` and a {token : count} dict `counts`, it returns a copy of `m` where the
+    tokens in `counts` occur `count` times, filled at once (see `VersionedMultiSet.load`).
+    e.g., withCounts({'p0', 'p1' * 2}, {'p1' : 0, 'p2' : 1}) = {'p0', 'p2'} """
+    content = dict(dict.items(m))
+    content.update(counts)
+    result = m.__class__()
+    content = {e : n for e, n in content.items() if n > 0}
+    if isinstance(result, VersionedMultiSet):
+        result.load(content)
+    else:
+        result.update(content)
+    return result
+
+def applyChanges(m, place, changes):
+    """ Given the content `m` of the reification place named `place` ('P', 'T', 'M', 'I', 'O' or 'H')
+    and a list of `changes` named after the write primitives of the core lib
+    (e.g., [('addPlace', 'p3'), ('addInputArc', 'p3', 't0', 2), ('setTokens', 'p3', 1), ('removeTransition', 't1')]),
+    it returns the content of `place` once the changes have been applied in order
+    (`m` itself if nothing changes, a single new MultiSet otherwise, see `changedCounts`). """
+    counts = changedCounts(m, place, changes)
+    if len(counts) == 0:
+        return m
+    return withCounts(m, counts)
+
+def internElement(names, e):
+    """ Given the `InternTable` `names` of an interned encoding and a P/T element `e` (a name or an id),
+    it returns the id of `e` (a new element gets a new id). e.g., internElement(names, 'p0') = 0 """
+    return names.intern(e)
+
+def elementNames(names, m):
+    """ Given the `InternTable` `names` of an interned encoding and a MultiSet `m` of P/T element ids,
+    it returns the MultiSet of their names. e.g., elementNames(names, {0 * 2, 1}) = {'p0' * 2, 't0'} """
+    result = MultiSet([])
+    for e, n in _pairs(m):
+        result._add(names.name_of(e), n)
+    return result
+
+def internChanges(names, changes):
+    """ Given the `InternTable` `names` of an interned encoding and a list of `changes` (see `applyChanges`),
+    it returns the changes with the P/T elements replaced by their ids.
+    e.g., internChanges(names, [('addInputArc', 'p0', 't0', 2)]) = [('addInputArc', 0, 1, 2)] """
+    result = []
+    for change in changes:
+        op = change[0]
+        if op in ARC_CHANGES:
+            result.append((op, names.intern(change[1]), names.intern(change[2])) + tuple(change[3:]))
+        else:
+            result.append((op, names.intern(change[1])) + tuple(change[2:]))
     return result
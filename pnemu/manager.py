@@ -7,7 +7,8 @@ from graphviz import Digraph
 from enum import Enum
 
 from .functions import keys, values, intersection
-from .base import Emulator
+from .base import Emulator, RelationPlace, CopyFlush, Update, UpdateTransition, compile_net
+from .base import MOVE_GUARD, MOVE_MARKING, PLAIN_MOVE_GUARD, PLAIN_MOVE_MARKING
 from .primitives import *
 
 class MAPE(Enum):
@@ -22,6 +23,10 @@ class AdaptiveNetBuilder:
 
     def __init__(self, emulator=Emulator()):
         self.net = emulator.get_net().copy()
+        # False for the plain encoding of the neco-compiler (see `Emulator`)
+        self.in_place = isinstance(self.net.place('I'), RelationPlace)
+        # name/id table of an interned encoding (see `Emulator`)
+        self.names = emulator.names
         self.primitives = dict(READ_LIB, **WRITE_LIB)
         self.observe = {}
         self.loop_counter = 1
@@ -30,12 +35,14 @@ class AdaptiveNetBuilder:
         for p in loop.get_net().place():
             self.net.add_place(p.copy())
         for t in loop.get_net().transition():
-            self.net.add_transition(Transition(t.name, t.guard))
+            self.net.add_transition((UpdateTransition if self.in_place else Transition)(t.name, t.guard))
             for i in t.input():
                 self.net.add_input(i[0].name, t.name, i[1])
             for o in t.output():
                 self.net.add_output(o[0].name, t.name, o[1])
         if len(observable_events) > 0:
+            if self.names is not None:
+                observable_events = [self.names.intern(e) for e in observable_events]
             events = tuple(observable_events)
             if self.observe.get(events) is None:
                 self.net.place('observable').add(MultiSet(observable_events))
@@ -51,26 +58,32 @@ class AdaptiveNetBuilder:
     def create_moveTransition(self, counter):
         move_name = 'move' + str(counter)
         observable_name = 'observable' + str(counter)
-        self.net.add_transition(Transition(move_name, Expression('value(i, t) <= MultiSet(m) and (len(value(h, t))==0 or not inhibits(value(h, t), m)) and e(t)>0')))
-        self.net.add_input('O', move_name, Flush('o'))
-        self.net.add_output('O', move_name, Flush('o'))
-        self.net.add_input('I', move_name, Flush('i'))
-        self.net.add_output('I', move_name, Flush('i'))
-        self.net.add_input('H', move_name, Flush('h'))
-        self.net.add_output('H', move_name, Flush('h'))
+        copy_flush, update, transition = (CopyFlush, Update, UpdateTransition) if self.in_place else (Flush, Flush, Transition)
+        guard, marking = (MOVE_GUARD, MOVE_MARKING) if self.in_place else (PLAIN_MOVE_GUARD, PLAIN_MOVE_MARKING)
+        self.net.add_transition(transition(move_name, Expression(guard + ' and e(t)>0')))
+        self.net.add_input('O', move_name, copy_flush('o'))
+        self.net.add_output('O', move_name, copy_flush('o'))
+        self.net.add_input('I', move_name, copy_flush('i'))
+        self.net.add_output('I', move_name, copy_flush('i'))
+        self.net.add_input('H', move_name, copy_flush('h'))
+        self.net.add_output('H', move_name, copy_flush('h'))
         self.net.add_input('T', move_name, Variable('t'))
         self.net.add_output('T', move_name, Variable('t'))
-        self.net.add_input('M', move_name, Flush('m'))
-        self.net.add_output('M', move_name, Flush('MultiSet(m) - value(i, t) + value(o, t)'))
-        self.net.add_input(observable_name, move_name, Flush('e'))
-        self.net.add_output(observable_name, move_name, Flush('e'))
+        self.net.add_input('M', move_name, copy_flush('m'))
+        self.net.add_output('M', move_name, update(marking))
+        self.net.add_input(observable_name, move_name, copy_flush('e'))
+        self.net.add_output(observable_name, move_name, copy_flush('e'))
 
     def add_functions(functions=None):
         if functions is not None:
             self.net.globals.declare("from " + functions + " import *")
 
-    def build(self):
+    def build(self, compiled=False):
+        """Return the adaptive net, with the lib:: transitions unfolded
+        (and its guards and output expressions compiled, see `compile_net`)"""
         self.unfold_net()
+        if compiled:
+            compile_net(self.net)
         return self.net
 
     def unfold_net(self):
@@ -88,22 +101,20 @@ class AdaptiveNetBuilder:
                     self.net.add_place(self.reification.get_place(p))
                 else:
                     self.net.add_place(p)
-        for i in entry.input_arcs:
+        input_arcs, output_arcs = entry.arcs(self.in_place)
+        for i in input_arcs:
             self.net.add_input(i[0], transition.name, i[2])
-        for o in entry.output_arcs:
+        for o in output_arcs:
             self.net.add_output(o[0], transition.name, o[2])
 
-        call_args = function_in(transition.name)
-        call_outVars = function_out(transition.name)
-        signature_args = function_in(entry.signature)
-        outExprs = function_out(entry.signature)
-
-        if len(signature_args) != len(call_args):
-            raise SyntaxError('Wrong function call. Used: ' + transition.name + '. Expected: ' + entry.signature)
-
-        for i in range(0, len(outExprs)):
-            for k in range(0, len(signature_args)):
-                outExprs[i] = outExprs[i].replace(signature_args[k], call_args[k])
+        name, call_args, call_outVars = parse_call(transition.name)
+        interned = self.names is not None
+        outExprs = entry.instantiate(call_args, interned)
+        signature_args = entry.arguments
+        # names of the user annotations to replace with the call arguments/output expressions
+        mapping = {}
+        for var, expr in list(zip(signature_args, entry.call_arguments(call_args, interned))) + list(zip(call_outVars, outExprs)):
+            mapping[var] = parse_expression(expr)
 
         for (place, annotation) in transition.output():
             if type(annotation) is Variable and annotation.name in call_outVars:
@@ -126,33 +137,13 @@ class AdaptiveNetBuilder:
                     self.net.remove_output(place.name, transition.name)
                     self.net.add_output(place.name, transition.name, annotation)
             elif type(annotation) is Expression:
-                expr = str(annotation)
-                replaced = False
-                for var in annotation.vars():
-                    if var in signature_args:
-                        replaced = True
-                        expr = expr.replace(var, call_args[signature_args.index(var)])
-                    if var in call_outVars:
-                        replaced = True
-                        expr = expr.replace(var, outExprs[call_outVars.index(var)])
-                if replaced:
+                if any(var in mapping for var in annotation.vars()):
                     self.net.remove_output(place.name, transition.name)
-                    self.net.add_output(place.name, transition.name, Expression(expr))
-            elif type(annotation) is Flush:
-                expr = str(annotation)[:-1]
-                if expr.startswith('(') and expr.endswith(')'):
-                    epxr = expr[1:-1]
-                replaced = False
-                for var in annotation.vars():
-                    if var in signature_args:
-                        replaced = True
-                        expr = expr.replace(var, call_args[signature_args.index(var)])
-                    if var in call_outVars:
-                        replaced = True
-                        expr = expr.replace(var, outExprs[call_outVars.index(var)])
-                if replaced:
+                    self.net.add_output(place.name, transition.name, Expression(substitute(parse_expression(str(annotation)), mapping)))
+            elif isinstance(annotation, Flush):
+                if any(var in mapping for var in annotation.vars()):
                     self.net.remove_output(place.name, transition.name)
-                    self.net.add_output(place.name, transition.name, Flush(expr))
+                    self.net.add_output(place.name, transition.name, annotation.__class__(substitute(parse_expression(annotation._expr), mapping)))
 
 
 class FeedbackLoop:
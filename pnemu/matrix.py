@@ -0,0 +1,139 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class CSR:
+    """A minimal compressed sparse row matrix (rows are transitions, columns are places)"""
+
+    def __init__(self, rows, n_rows):
+        """Build the matrix from `rows`, a list (of length `n_rows`) of {column : weight} dicts"""
+        self.indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        indices = []
+        data = []
+        for r in range(0, n_rows):
+            row = rows[r]
+            indices += list(row.keys())
+            data += list(row.values())
+            self.indptr[r + 1] = len(indices)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.data = np.array(data, dtype=np.int64)
+        self.row_of = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(self.indptr))
+        self.n_rows = n_rows
+
+    def row(self, r):
+        """Return the (columns, weights) arrays of the row `r`"""
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def violations(self, fails):
+        """Given a boolean array `fails` (one entry per non-zero element),
+        return the number of failing elements of each row"""
+        return np.bincount(self.row_of[fails], minlength=self.n_rows)
+
+class MatrixPT:
+    """An array backend of a P/T net: pre, post and inhibitor matrices (either dense or CSR)
+    and a marking vector. Places and transitions are indexed following the insertion order of the `PT` net."""
+
+    def __init__(self, pt_net, sparse=False):
+        if np is None:
+            raise ImportError('MatrixPT requires numpy (pip install numpy)')
+        self.name = pt_net.get_name()
+        self.sparse = sparse
+        self.places = list(pt_net.get_places())
+        self.transitions = list(pt_net.get_transitions())
+        self.place_index = {p : k for k, p in enumerate(self.places)}
+        self.transition_index = {t : k for k, t in enumerate(self.transitions)}
+        pre = [{} for t in self.transitions]
+        post = [{} for t in self.transitions]
+        inh = [{} for t in self.transitions]
+        for t, arcs in pt_net.get_input_arcs().items():
+            row = pre[self.transition_index[t]]
+            for arc in arcs:
+                p = self.place_index[arc.src]
+                row[p] = row.get(p, 0) + arc.weight
+        for t, arcs in pt_net.get_output_arcs().items():
+            row = post[self.transition_index[t]]
+            for arc in arcs:
+                p = self.place_index[arc.dst]
+                row[p] = row.get(p, 0) + arc.weight
+        for t, arcs in pt_net.get_inhibitor_arcs().items():
+            row = inh[self.transition_index[t]]
+            for arc in arcs:
+                p = self.place_index[arc.src]
+                row[p] = min(row.get(p, arc.weight), arc.weight)
+        self.marking = np.zeros(len(self.places), dtype=np.int64)
+        for p, tokens in pt_net.get_marking().items():
+            self.marking[self.place_index[p]] = tokens
+        if sparse:
+            self.pre = CSR(pre, len(self.transitions))
+            self.post = CSR(post, len(self.transitions))
+            self.inh = CSR(inh, len(self.transitions))
+        else:
+            self.pre = self.dense(pre)
+            self.post = self.dense(post)
+            self.inh = self.dense(inh)
+            # inhibitor bounds: a missing inhibitor arc never inhibits
+            self.inh_bound = np.where(self.inh > 0, self.inh, np.iinfo(np.int64).max)
+            self.incidence = self.post - self.pre
+
+    def dense(self, rows):
+        matrix = np.zeros((len(self.transitions), len(self.places)), dtype=np.int64)
+        for t in range(0, len(rows)):
+            for p, w in rows[t].items():
+                matrix[t, p] = w
+        return matrix
+
+    def enabled_vector(self):
+        """Return a boolean vector telling which transitions are enabled in the current marking"""
+        m = self.marking
+        if self.sparse:
+            fails = self.pre.violations(m[self.pre.indices] < self.pre.data)
+            fails += self.inh.violations(m[self.inh.indices] >= self.inh.data)
+            return fails == 0
+        return np.all((m >= self.pre) & (m < self.inh_bound), axis=1)
+
+    def enabled_transitions(self):
+        """Return the names of the transitions enabled in the current marking"""
+        return [self.transitions[k] for k in np.flatnonzero(self.enabled_vector())]
+
+    def enabled(self, transition_name):
+        """Return True if the `transition_name` transition is enabled in the current marking"""
+        t = self.transition_index.get(transition_name)
+        if t is None:
+            return False
+        m = self.marking
+        if self.sparse:
+            places, weights = self.pre.row(t)
+            if np.any(m[places] < weights):
+                return False
+            places, weights = self.inh.row(t)
+            return not np.any(m[places] >= weights)
+        return bool(np.all(m >= self.pre[t]) and np.all(m < self.inh_bound[t]))
+
+    def fire(self, transition_name):
+        """Fire the transition `transition_name`, if enabled"""
+        if self.enabled(transition_name):
+            t = self.transition_index.get(transition_name)
+            if self.sparse:
+                places, weights = self.pre.row(t)
+                self.marking[places] -= weights
+                places, weights = self.post.row(t)
+                self.marking[places] += weights
+            else:
+                self.marking += self.incidence[t]
+
+    def get_tokens(self, place_name):
+        """Return the number of tokens in place named `place_name`"""
+        if place_name in self.place_index:
+            return int(self.marking[self.place_index[place_name]])
+        return 0
+
+    def set_tokens(self, place_name, tokens):
+        """Set #`tokens` tokens into the place named `place_name`"""
+        if place_name in self.place_index:
+            self.marking[self.place_index[place_name]] = tokens
+
+    def get_marking(self):
+        """Return the marking as a dict (omitting empty places), as in `PT.get_marking`"""
+        return {self.places[k] : int(self.marking[k]) for k in np.flatnonzero(self.marking)}
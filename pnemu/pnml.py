@@ -0,0 +1,80 @@
+import xml.etree.ElementTree as ET
+
+def local_name(tag):
+    """Return the tag without its namespace (e.g., '{http://www.pnml.org/...}place' is 'place')"""
+    return tag[tag.rfind('}') + 1:]
+
+def child(element, name):
+    """Return the first child of `element` named `name` (any namespace), or None"""
+    for c in element:
+        if local_name(c.tag) == name:
+            return c
+    return None
+
+def text_value(element, name, default):
+    """Return the integer held by the <name><text>...</text></name> child of `element`"""
+    c = child(element, name)
+    if c is not None:
+        text = child(c, 'text')
+        if text is not None and text.text is not None:
+            return int(text.text.strip())
+    return default
+
+def read_pnml(source):
+    """Read the P/T net in the PNML `source` (a file path or a binary file-like object) in a
+    single pass, without building the whole document tree: elements are dropped as soon as
+    they have been read. Iterate over the events
+        ('place', id, tokens)
+        ('transition', id)
+        ('input' | 'inhibitor', place id, transition id, weight)
+        ('output', transition id, place id, weight)
+    The arcs whose source or target has not been read yet are reported at the end
+    (arcs between unknown nodes are ignored)."""
+    places = set()
+    transitions = set()
+    pending = []
+    stack = []
+    # local names of the (few, repeated) tags
+    names = {}
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            continue
+        stack.pop()
+        tag = names.get(element.tag)
+        if tag is None:
+            tag = names[element.tag] = local_name(element.tag)
+        if tag == 'place':
+            place = element.get('id')
+            places.add(place)
+            yield ('place', place, text_value(element, 'initialMarking', 0))
+        elif tag == 'transition':
+            transition = element.get('id')
+            transitions.add(transition)
+            yield ('transition', transition)
+        elif tag == 'arc':
+            type_element = child(element, 'type')
+            inhibitor = type_element is not None and type_element.get('value') == 'inhibitor'
+            arc = (element.get('source'), element.get('target'), text_value(element, 'inscription', 1), inhibitor)
+            event = arc_event(arc, places, transitions)
+            if event is None:
+                pending.append(arc)
+            else:
+                yield event
+        else:
+            continue
+        # drop the element (and its subtree) from the document being built
+        if len(stack) > 0:
+            stack[-1].remove(element)
+    for arc in pending:
+        event = arc_event(arc, places, transitions)
+        if event is not None:
+            yield event
+
+def arc_event(arc, places, transitions):
+    src, target, weight, inhibitor = arc
+    if src in places and target in transitions:
+        return ('inhibitor' if inhibitor else 'input', src, target, weight)
+    if src in transitions and target in places:
+        return ('output', src, target, weight)
+    return None
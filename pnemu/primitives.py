@@ -1,19 +1,77 @@
 from snakes.nets import *
+import ast
+import copy
+from .base import CopyFlush, Update
 
 LIB_PREFIX = 'lib.'
 FLUSH = 'flush'
 ASSIGNMENT = '->'
 ARG_SEPARATOR = ','
 RESULT_SEPARATOR = ';'
+# conversion of the signature arguments in the interned encoding (see `Emulator`): the read
+# primitives look the names up (an unknown name is left as is), the write primitives give ids
+# to the new names through `SCRATCH`, interned once the transition has fired (see `UpdateTransition`)
+INTERNED_ARGS = {'p_' : 'NAMES.find(%s)', 't_' : 'NAMES.find(%s)', 'e_' : 'NAMES.find(%s)'}
+INTERNED_WRITE_ARGS = {
+    'p_' : 'internElement(SCRATCH, %s)', 't_' : 'internElement(SCRATCH, %s)', 'e_' : 'internElement(SCRATCH, %s)',
+    'c_' : 'internChanges(SCRATCH, %s)'}
 
 class LibEntry:
 
-    def __init__(self, signature, places, input_arcs, output_arcs, guard=None):
+    def __init__(self, signature, places, input_arcs, output_arcs, guard=None, elements=False, plain_output_arcs=None):
         self.signature = signature
         self.places = places
         self.input_arcs = input_arcs
         self.output_arcs = output_arcs
+        # output arcs of the plain encoding, if not the plain version of `output_arcs` (see `arcs`)
+        self.plain_output_arcs = plain_output_arcs
         self.guard = guard
+        # True if the outputs are multisets of P/T elements (given by name in the interned encoding)
+        self.elements = elements
+        # signature parsed on first use (see `instantiate`)
+        self.arguments = None
+        self.outputs = None
+        self.instances = {}
+
+    def call_arguments(self, args, interned=False):
+        """Return the expressions bound to the signature arguments by the call arguments `args`.
+        In the interned encoding, the P/T elements and the changes are converted into ids
+        (e.g., '"p2"' is bound to 'NAMES.find("p2")', or to 'internElement(SCRATCH, "p2")' by a write primitive)"""
+        if self.arguments is None:
+            name, arguments, outputs = parse_call(self.signature)
+            self.arguments = arguments
+            self.outputs = [parse_expression(o) for o in outputs]
+        if len(args) != len(self.arguments):
+            raise SyntaxError('Wrong function call. Used: ' + function_name(self.signature) + '(' + ', '.join(args) + '). Expected: ' + self.signature)
+        if not interned:
+            return list(args)
+        conversions = INTERNED_WRITE_ARGS if function_name(self.signature) in WRITE_LIB else INTERNED_ARGS
+        return [conversions[a] % v if a in conversions else v for a, v in zip(self.arguments, args)]
+
+    def arcs(self, in_place=True):
+        """Return the (input arcs, output arcs) of the entry: as given, for an emulator updating
+        its places in place, or with plain `Flush` arcs for the plain encoding of the neco-compiler
+        (where the multisets are built from token lists instead of `repeat`)"""
+        if in_place:
+            return self.input_arcs, self.output_arcs
+        if self.plain_output_arcs is not None:
+            return [plain_arc(a) for a in self.input_arcs], self.plain_output_arcs
+        return [plain_arc(a) for a in self.input_arcs], [plain_arc(a) for a in self.output_arcs]
+
+    def instantiate(self, args, interned=False):
+        """Return the output expressions of the signature (see `function_out`), with the signature
+        arguments replaced by the expressions `args` (e.g., ('p', '"p2"')). Substitutions are made
+        on the parsed expressions, and cached per argument tuple"""
+        key = (tuple(args), interned)
+        result = self.instances.get(key)
+        if result is None:
+            call_args = self.call_arguments(args, interned)
+            mapping = {a : parse_expression(v) for a, v in zip(self.arguments, call_args)}
+            result = [substitute(o, mapping) for o in self.outputs]
+            if interned and self.elements:
+                result = ['elementNames(NAMES, ' + o + ')' for o in result]
+            self.instances[key] = result
+        return result
 
         @property
         def signature(self):
@@ -70,6 +128,14 @@ def function_name(call_str):
     e.g., function_name('lib.getMarking(p) -> n') = 'lib.getMarking' """
     return call_str[:call_str.find('(')]
 
+def plain_arc(arc):
+    """Return the (place, transition, annotation) `arc` with a plain `Flush` in place of a
+    `CopyFlush` or of an `Update` (see `LibEntry.arcs`)"""
+    place, transition, annotation = arc
+    if isinstance(annotation, Flush) and type(annotation) is not Flush:
+        return (place, transition, Flush(annotation._expr))
+    return arc
+
 def function_in(strFunct):
     """Return the list of input variables, given a function signature.
     e.g., function_in('lib.name(a, b, foo("str")) -> n') = ['a', 'b', 'foo("str")'] """
@@ -94,6 +160,42 @@ def function_out(strFunct):
         return result
 
 
+def parse_expression(expr):
+    """Return the AST of the Python expression `expr`"""
+    return ast.parse(expr.strip(), mode='eval').body
+
+class ArgumentSubstitution(ast.NodeTransformer):
+    """Replace the names in `mapping` with (copies of) the AST expressions they are mapped to"""
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def visit_Name(self, node):
+        replacement = self.mapping.get(node.id)
+        if replacement is None:
+            return node
+        return copy.deepcopy(replacement)
+
+def substitute(tree, mapping):
+    """Return the source of the AST expression `tree` (left unchanged), with the names in `mapping`
+    replaced by their AST expressions. Unlike a textual replacement, only whole names are replaced.
+    e.g., substitute(parse_expression('M(p_) + p_x'), {'p_' : parse_expression('"p2"')}) = "M('p2') + p_x" """
+    return ast.unparse(ArgumentSubstitution(mapping).visit(copy.deepcopy(tree)))
+
+def parse_call(call_str):
+    """Return the (function name, input expressions, output variables/expressions) of a
+    function call or signature, parsed as Python expressions.
+    e.g., parse_call('lib.name(a, foo("s, t")) -> n; m') = ('lib.name', ['a', "foo('s, t')"], ['n', 'm']) """
+    call = call_str
+    outputs = []
+    if ASSIGNMENT in call_str:
+        call, result = call_str.split(ASSIGNMENT, 1)
+        outputs = [ast.unparse(parse_expression(v)) for v in result.split(RESULT_SEPARATOR) if v.strip() != '']
+    tree = parse_expression(call[:call.rfind(')')+1])
+    if not isinstance(tree, ast.Call):
+        raise SyntaxError('Not a function call: ' + call_str)
+    return (function_name(call_str), [ast.unparse(a) for a in tree.args], outputs)
+
 # CORE LIB (read) usage
 # `lib.getTokens(p) -> n` given a PTPlace as input var `p`, it returns a natural number (>= 0) into var `n`
 # `lib.getMarking() -> m` returns a multiset of PTPlace into var `m` (multiplicity represents the number of tokens)
@@ -118,92 +220,100 @@ signature = LIB_PREFIX + "getTokens(p_) -> M(p_)"
 entry = LibEntry(
     signature,
     [Place('M')],
-    [('M', signature, Flush('M'))],
-    [('M', signature, Flush('M'))])
+    [('M', signature, CopyFlush('M'))],
+    [('M', signature, CopyFlush('M'))])
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "getMarking() -> M"
 entry = LibEntry(
     signature,
     [Place('M')],
-    [('M', signature, Flush('M'))],
-    [('M', signature, Flush('M'))])
+    [('M', signature, CopyFlush('M'))],
+    [('M', signature, CopyFlush('M'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "getPlaces() -> P"
 entry = LibEntry(
     signature,
     [Place('P')],
-    [('P', signature, Flush('P'))],
-    [('P', signature, Flush('P'))])
+    [('P', signature, CopyFlush('P'))],
+    [('P', signature, CopyFlush('P'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "getPlacesStartingWith(s_) -> filter(P,s_)"
 entry = LibEntry(
     signature,
     [Place('P')],
-    [('P', signature, Flush('P'))],
-    [('P', signature, Flush('P'))])
+    [('P', signature, CopyFlush('P'))],
+    [('P', signature, CopyFlush('P'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "getTransitions() -> T"
 entry = LibEntry(
     signature,
     [Place('T')],
-    [('T', signature, Flush('T'))],
-    [('T', signature, Flush('T'))])
+    [('T', signature, CopyFlush('T'))],
+    [('T', signature, CopyFlush('T'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "getTransitionsStartingWith(s_) -> filter(T,s_)"
 entry = LibEntry(
     signature,
     [Place('T')],
-    [('T', signature, Flush('T'))],
-    [('T', signature, Flush('T'))])
+    [('T', signature, CopyFlush('T'))],
+    [('T', signature, CopyFlush('T'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "exists(e_) -> P(e_)>0 or T(e_)>0"
 entry = LibEntry(
     signature,
     [Place('P'), Place('T')],
-    [('P', signature, Flush('P')), ('T', signature, Flush('T'))],
-    [('P', signature, Flush('P')), ('T', signature, Flush('T'))])
+    [('P', signature, CopyFlush('P')), ('T', signature, CopyFlush('T'))],
+    [('P', signature, CopyFlush('P')), ('T', signature, CopyFlush('T'))])
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "pre(e_) -> values(I, e_) + keys(O, e_)"
 entry = LibEntry(
     signature,
     [Place('I'), Place('O')],
-    [('I', signature, Flush('I')), ('O', signature, Flush('O'))],
-    [('I', signature, Flush('I')), ('O', signature, Flush('O'))])
+    [('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O'))],
+    [('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "post(e_) -> values(O, e_) + keys(I, e_)"
 entry = LibEntry(
     signature,
     [Place('I'), Place('O')],
-    [('I', signature, Flush('I')), ('O', signature, Flush('O'))],
-    [('I', signature, Flush('I')), ('O', signature, Flush('O'))])
+    [('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O'))],
+    [('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "inh(e_) -> values(H, e_) + keys(H, e_)"
 entry = LibEntry(
     signature,
     [Place('H')],
-    [('H', signature, Flush('H'))],
-    [('H', signature, Flush('H'))])
+    [('H', signature, CopyFlush('H'))],
+    [('H', signature, CopyFlush('H'))],
+    elements=True)
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "hMult(p_,t_) -> H((t_, p_))"
 entry = LibEntry(
     signature,
     [Place('H')],
-    [('H', signature, Flush('H'))],
-    [('H', signature, Flush('H'))])
+    [('H', signature, CopyFlush('H'))],
+    [('H', signature, CopyFlush('H'))])
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "iMult(p_,t_) -> I((t_, p_))"
 entry = LibEntry(
     signature,
     [Place('I')],
-    [('I', signature, Flush('I'))],
-    [('I', signature, Flush('I'))])
+    [('I', signature, CopyFlush('I'))],
+    [('I', signature, CopyFlush('I'))])
 READ_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "oMult(t_,p_) -> O((t_, p_))"
 entry = LibEntry(
     signature,
     [Place('O')],
-    [('O', signature, Flush('O'))],
-    [('O', signature, Flush('O'))])
+    [('O', signature, CopyFlush('O'))],
+    [('O', signature, CopyFlush('O'))])
 READ_LIB.update({function_name(signature) : entry})
 
 # CORE LIB (write) usage
@@ -221,6 +331,7 @@ READ_LIB.update({function_name(signature) : entry})
 # `lib.setInputArcMult(p, t, n)`given a PTPlace (`p` var), a PTTransition (`t` var) and a number (`n` var), it sets the multiplicity of the input arc (p, t) to n, in `I` of the reification
 # `lib.setOutputArcMult(p, t, n)`given a PTPlace (`p` var), a PTTransition (`t` var) and a number (`n` var), it sets the multiplicity of the input arc (p, t) to n, in `O` of the reification
 # `lib.setInhibitorArcMult(p, t, n)`given a PTPlace (`p` var), a PTTransition (`t` var) and a number (`n` var), it sets the multiplicity of the input arc (p, t) to n, in `H` of the reification
+# `lib.applyChanges(c)` given a tuple of changes (`c` var) named after the primitives above (e.g., (('addPlace', p), ('addInputArc', p, t, n))), it applies all of them in a single firing (each reification place is rebuilt at most once)
 
 # ASSUMPTION
 # the user uses lowercase letters for variables (e.g., p, t, h)
@@ -245,83 +356,101 @@ signature = LIB_PREFIX + "setTokens(p_, n_)"
 entry = LibEntry(
     signature,
     [Place('M')],
-    [('M', signature, Flush('M'))],
-    [('M', signature, Flush('setMultiplicity(MultiSet(M), p_, n_)'))])
+    [('M', signature, CopyFlush('M'))],
+    [('M', signature, Update('M - repeat(p_, M(p_)) + repeat(p_, n_)'))],
+    plain_output_arcs=[('M', signature, Flush('setMultiplicity(MultiSet(M), p_, n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "addInputArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('I')],
-    [('I', signature, Flush('I'))],
-    [('I', signature, Flush('MultiSet(I) + MultiSet([(t_, p_)] * n_)'))])
+    [('I', signature, CopyFlush('I'))],
+    [('I', signature, Update('I + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('I', signature, Flush('MultiSet(I) + MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "addOutputArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('O')],
-    [('O', signature, Flush('O'))],
-    [('O', signature, Flush('MultiSet(O) + MultiSet([(t_, p_)] * n_)'))])
+    [('O', signature, CopyFlush('O'))],
+    [('O', signature, Update('O + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('O', signature, Flush('MultiSet(O) + MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "addInhibitorArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('H')],
-    [('H', signature, Flush('H'))],
-    [('H', signature, Flush('MultiSet(H) + MultiSet([(t_, p_)] * n_)'))])
+    [('H', signature, CopyFlush('H'))],
+    [('H', signature, Update('H + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('H', signature, Flush('MultiSet(H) + MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "removePlace(p_)"
 entry = LibEntry(
     signature,
     [Place('P'), Place('I'), Place('O'), Place('H'), Place('M')],
-    [('P', signature, Flush('P')), ('I', signature, Flush('I')), ('O', signature, Flush('O')), ('H', signature, Flush('H')), ('M', signature, Flush('M'))],
-    [('P', signature, Flush('P - MultiSet([p_])')), ('I', signature, Flush('I - filterByValue(I, p_)')), ('O', signature, Flush('O - filterByValue(O, p_)')), ('H', signature, Flush('H - filterByValue(H, p_)')), ('M', signature, Flush('M - MultiSet([p_] * M(p_))'))])
+    [('P', signature, CopyFlush('P')), ('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O')), ('H', signature, CopyFlush('H')), ('M', signature, CopyFlush('M'))],
+    [('P', signature, Update('P - MultiSet([p_])')), ('I', signature, Update('I - filterByValue(I, p_)')), ('O', signature, Update('O - filterByValue(O, p_)')), ('H', signature, Update('H - filterByValue(H, p_)')), ('M', signature, Update('M - repeat(p_, M(p_))'))],
+    plain_output_arcs=[('P', signature, Flush('P - MultiSet([p_])')), ('I', signature, Flush('I - filterByValue(I, p_)')), ('O', signature, Flush('O - filterByValue(O, p_)')), ('H', signature, Flush('H - filterByValue(H, p_)')), ('M', signature, Flush('M - MultiSet([p_] * M(p_))'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "removeTransition(t_)"
 entry = LibEntry(
     signature,
     [Place('T'), Place('I'), Place('O'), Place('H')],
-    [('T', signature, Flush('T')), ('I', signature, Flush('I')), ('O', signature, Flush('O')), ('H', signature, Flush('H'))],
-    [('T', signature, Flush('T - MultiSet([t_])')), ('I', signature, Flush('I - filterByKey(I, t_)')), ('O', signature, Flush('O - filterByKey(O, t_)')), ('H', signature, Flush('H - filterByKey(H, t_)'))])
+    [('T', signature, CopyFlush('T')), ('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O')), ('H', signature, CopyFlush('H'))],
+    [('T', signature, Update('T - MultiSet([t_])')), ('I', signature, Update('I - filterByKey(I, t_)')), ('O', signature, Update('O - filterByKey(O, t_)')), ('H', signature, Update('H - filterByKey(H, t_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "removeInputArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('I')],
-    [('I', signature, Flush('I'))],
-    [('I', signature, Flush('MultiSet(I) - MultiSet([(t_, p_)] * n_)'))])
+    [('I', signature, CopyFlush('I'))],
+    [('I', signature, Update('I - repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('I', signature, Flush('MultiSet(I) - MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "removeOutputArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('O')],
-    [('O', signature, Flush('O'))],
-    [('O', signature, Flush('MultiSet(O) - MultiSet([(t_, p_)] * n_)'))])
+    [('O', signature, CopyFlush('O'))],
+    [('O', signature, Update('O - repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('O', signature, Flush('MultiSet(O) - MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "removeInhibitorArc(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('H')],
-    [('H', signature, Flush('H'))],
-    [('H', signature, Flush('MultiSet(H) - MultiSet([(t_, p_)] * n_)'))])
+    [('H', signature, CopyFlush('H'))],
+    [('H', signature, Update('H - repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('H', signature, Flush('MultiSet(H) - MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "setInputArcMult(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('I')],
-    [('I', signature, Flush('I'))],
-    [('I', signature, Flush('MultiSet(I) - MultiSet([(t_, p_)] * I((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
+    [('I', signature, CopyFlush('I'))],
+    [('I', signature, Update('I - repeat((t_, p_), I((t_, p_))) + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('I', signature, Flush('MultiSet(I) - MultiSet([(t_, p_)] * I((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "setOutputArcMult(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('O')],
-    [('O', signature, Flush('O'))],
-    [('O', signature, Flush('MultiSet(O) - MultiSet([(t_, p_)] * O((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
+    [('O', signature, CopyFlush('O'))],
+    [('O', signature, Update('O - repeat((t_, p_), O((t_, p_))) + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('O', signature, Flush('MultiSet(O) - MultiSet([(t_, p_)] * O((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
 signature = LIB_PREFIX + "setInhibitorArcMult(p_, t_, n_)"
 entry = LibEntry(
     signature,
     [Place('H')],
-    [('H', signature, Flush('H'))],
-    [('H', signature, Flush('MultiSet(H) - MultiSet([(t_, p_)] * H((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
+    [('H', signature, CopyFlush('H'))],
+    [('H', signature, Update('H - repeat((t_, p_), H((t_, p_))) + repeat((t_, p_), n_)'))],
+    plain_output_arcs=[('H', signature, Flush('MultiSet(H) - MultiSet([(t_, p_)] * H((t_, p_))) + MultiSet([(t_, p_)] * n_)'))])
+WRITE_LIB.update({function_name(signature) : entry})
+signature = LIB_PREFIX + "applyChanges(c_)"
+entry = LibEntry(
+    signature,
+    [Place('P'), Place('T'), Place('M'), Place('I'), Place('O'), Place('H')],
+    [('P', signature, CopyFlush('P')), ('T', signature, CopyFlush('T')), ('M', signature, CopyFlush('M')), ('I', signature, CopyFlush('I')), ('O', signature, CopyFlush('O')), ('H', signature, CopyFlush('H'))],
+    [('P', signature, CopyFlush('applyChanges(P, "P", c_)')), ('T', signature, CopyFlush('applyChanges(T, "T", c_)')), ('M', signature, CopyFlush('applyChanges(M, "M", c_)')), ('I', signature, CopyFlush('applyChanges(I, "I", c_)')), ('O', signature, CopyFlush('applyChanges(O, "O", c_)')), ('H', signature, CopyFlush('applyChanges(H, "H", c_)'))])
 WRITE_LIB.update({function_name(signature) : entry})
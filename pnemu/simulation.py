@@ -0,0 +1,121 @@
+from hashlib import sha256
+from snakes.nets import Variable
+import multiprocessing
+import os
+import random
+
+from .base import Emulator
+
+def uniform(rng, choices):
+    """The default policy: pick one of the enabled `choices` uniformly at random"""
+    return rng.choice(choices)
+
+def run_seed(seed, index):
+    """Return the seed of the random stream of run number `index`: it only depends on the
+    simulation `seed` and on `index`, so a run is reproducible whatever the worker executing it"""
+    digest = sha256((repr(seed) + ':' + str(index)).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+class Run:
+    """The outcome of a simulation run: the fired (transition name, bound variables) labels,
+    the final marking (a dict of place name : {token : count}, omitting empty places),
+    and whether the run stopped in a deadlock"""
+
+    def __init__(self, index, seed, steps, marking, deadlock):
+        self.index = index
+        self.seed = seed
+        self.steps = steps
+        self.marking = marking
+        self.deadlock = deadlock
+
+    def __repr__(self):
+        return 'Run(' + str(self.index) + ', steps=' + str(len(self.steps)) + ', deadlock=' + str(self.deadlock) + ')'
+
+class Simulator:
+    """Random runs of either an `Emulator` (the `move` transition goes through the emulator engine)
+    or a High-Level Petri net (e.g., the adaptive net built by `AdaptiveNetBuilder`).
+    Every run starts from the marking the net has when the simulator is created."""
+
+    def __init__(self, net):
+        self.emulator = net if isinstance(net, Emulator) else None
+        self.net = net.get_net() if self.emulator is not None else net
+        self.initial = self.net.get_marking()
+        self.transitions = []
+        for t in self.net.transition():
+            bound = [a.name for (p, a) in t.input() if type(a) is Variable]
+            self.transitions.append((t, bound))
+
+    def reset(self):
+        self.net.set_marking(self.initial)
+
+    def choices(self):
+        """Return the list of (label, transition, mode) firable in the current marking,
+        sorted by label (so that a random pick does not depend on the enumeration order)"""
+        result = []
+        for (t, bound) in self.transitions:
+            modes = self.emulator.modes(t.name) if self.emulator is not None else t.modes()
+            for mode in modes:
+                result.append(((t.name, tuple((v, mode(v)) for v in bound)), t, mode))
+        result.sort(key=lambda choice: repr(choice[0]))
+        return result
+
+    def fire(self, t, mode):
+        if self.emulator is not None:
+            self.emulator.fire(mode, t.name)
+        else:
+            t.fire(mode)
+
+    def run(self, index, seed, max_steps, policy=uniform):
+        """Run at most `max_steps` steps (from the initial marking) with the random stream of
+        run number `index` of the simulation `seed`, and return the `Run`"""
+        rng = random.Random(run_seed(seed, index))
+        self.reset()
+        steps = []
+        deadlock = False
+        while len(steps) < max_steps:
+            choices = self.choices()
+            if len(choices) == 0:
+                deadlock = True
+                break
+            label, t, mode = policy(rng, choices)
+            self.fire(t, mode)
+            steps.append(label)
+        marking = {p.name : dict(dict.items(p.tokens)) for p in self.net.place() if not p.is_empty()}
+        return Run(index, seed, steps, marking, deadlock)
+
+# state of a worker process (see `simulate`)
+worker = None
+
+def init_worker(net, max_steps, policy, seed):
+    global worker
+    worker = (Simulator(net), max_steps, policy, seed)
+
+def run_worker(index):
+    simulator, max_steps, policy, seed = worker
+    return simulator.run(index, seed, max_steps, policy)
+
+def simulate(net, n_runs, max_steps, policy=uniform, seed=0, workers=None):
+    """Perform `n_runs` random runs of at most `max_steps` steps of `net` (an `Emulator`, or
+    a High-Level Petri net) and return an iterator over their `Run`, in order of completion.
+    At each step, `policy(rng, choices)` picks one of the (label, transition, mode) `choices`.
+    Runs are spread over `workers` processes (all the CPUs by default, in-process if 1):
+    each run has its own random stream, derived from `seed` and from its index, so the
+    outcome of a run does not depend on the number of workers.
+    The workers inherit `net` and `policy` with the `fork` start method; otherwise they must be picklable."""
+    workers = workers if workers is not None else os.cpu_count()
+    if workers <= 1:
+        simulator = Simulator(net)
+        try:
+            for index in range(0, n_runs):
+                yield simulator.run(index, seed, max_steps, policy)
+        finally:
+            simulator.reset()
+        return
+    if 'fork' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('fork')
+    else:
+        ctx = multiprocessing.get_context()
+    chunksize = max(1, n_runs // (workers * 8))
+    with ctx.Pool(workers, init_worker, (net, max_steps, policy, seed)) as pool:
+        for result in pool.imap_unordered(run_worker, range(0, n_runs), chunksize):
+            yield result
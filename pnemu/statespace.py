@@ -0,0 +1,627 @@
+from array import array
+from collections import deque
+import functools
+from graphviz import Digraph
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import traceback
+import zlib
+
+from snakes.nets import PetriNet, Variable, Marking, Test
+from .functions import _values
+
+class CompactNet:
+    """Index-based view of a P/T net: places and transitions are numbered from 0,
+    and the arcs of each transition are stored as tuples of (place index, weight)"""
+
+    def __init__(self, places, transitions, pre, post, inh, marking):
+        self.places = places
+        self.transitions = transitions
+        self.pre = pre
+        self.post = post
+        self.inh = inh
+        self.marking = marking
+        self.place_index = {p : k for k, p in enumerate(places)}
+        self.transition_index = {t : k for k, t in enumerate(transitions)}
+
+    @classmethod
+    def of(cls, net):
+        """Return the CompactNet of either a `PT` or an `Emulator`"""
+        if hasattr(net, 'get_input_arcs'):
+            return cls.from_pt(net)
+        return cls.from_emulator(net)
+
+    @classmethod
+    def from_pt(cls, pt):
+        places = list(pt.get_places())
+        transitions = list(pt.get_transitions())
+        index = {p : k for k, p in enumerate(places)}
+        pre = [cls.arcs(index, [(arc.src, arc.weight) for arc in pt.arc_set('input', pt.i, t)]) for t in transitions]
+        post = [cls.arcs(index, [(arc.dst, arc.weight) for arc in pt.arc_set('output', pt.o, t)]) for t in transitions]
+        inh = [cls.arcs(index, [(arc.src, arc.weight) for arc in pt.arc_set('inhibitor', pt.h, t)], min) for t in transitions]
+        marking = [pt.get_tokens(p) for p in places]
+        return cls(places, transitions, pre, post, inh, marking)
+
+    @classmethod
+    def from_emulator(cls, emulator):
+        """Build the CompactNet of the P/T net encoded into the reification places of `emulator`
+        (observable transitions are left out, since `move` cannot fire them)"""
+        places = list(emulator.p.tokens.keys())
+        index = {p : k for k, p in enumerate(places)}
+        transitions = [t for t in emulator.t.tokens.keys() if emulator.e.tokens(t) == 0]
+        pre = [cls.arcs(index, dict.items(_values(emulator.i.tokens, t))) for t in transitions]
+        post = [cls.arcs(index, dict.items(_values(emulator.o.tokens, t))) for t in transitions]
+        inh = [cls.arcs(index, dict.items(_values(emulator.h.tokens, t))) for t in transitions]
+        marking = [emulator.m.tokens(p) for p in places]
+        return cls(places, transitions, pre, post, inh, marking)
+
+    @staticmethod
+    def arcs(index, pairs, merge=None):
+        """Given (place name, weight) `pairs`, return a tuple of (place index, weight)
+        (weights of parallel arcs are summed, or combined with `merge`)"""
+        weights = {}
+        for p, w in pairs:
+            k = index[p]
+            if k in weights:
+                weights[k] = w + weights[k] if merge is None else merge(w, weights[k])
+            else:
+                weights[k] = w
+        return tuple(weights.items())
+
+    def enabled(self, marking, t):
+        """Return True if the transition with index `t` is enabled in `marking` (a sequence of token counts)"""
+        for p, w in self.pre[t]:
+            if marking[p] < w:
+                return False
+        for p, w in self.inh[t]:
+            if marking[p] >= w:
+                return False
+        return True
+
+    def fire(self, marking, t):
+        """Update `marking` (a mutable sequence of token counts) by firing the transition with index `t`"""
+        for p, w in self.pre[t]:
+            marking[p] -= w
+        for p, w in self.post[t]:
+            marking[p] += w
+
+class PTExplorer:
+    """Successor generator of a P/T net (either a `PT` or the net encoded by an `Emulator`).
+    States are markings packed into `bytes` (an array of unsigned integers of the given `typecode`)"""
+
+    def __init__(self, net, typecode='I'):
+        self.net = CompactNet.of(net)
+        self.typecode = typecode
+
+    def initial(self):
+        return array(self.typecode, self.net.marking).tobytes()
+
+    def successors(self, state):
+        """Return the list of (transition name, state) pairs reachable from `state` in one step"""
+        marking = array(self.typecode)
+        marking.frombytes(state)
+        result = []
+        for t in range(0, len(self.net.transitions)):
+            if self.net.enabled(marking, t):
+                succ = array(self.typecode, marking)
+                self.net.fire(succ, t)
+                result.append((self.net.transitions[t], succ.tobytes()))
+        return result
+
+    def decode(self, state):
+        """Return the marking (omitting empty places) encoded by `state`"""
+        marking = array(self.typecode)
+        marking.frombytes(state)
+        return {self.net.places[k] : n for k, n in enumerate(marking) if n > 0}
+
+    def portable(self, state):
+        """Return a process-independent (picklable) form of `state`"""
+        return state
+
+    def local(self, portable):
+        """Return the state of this explorer corresponding to the `portable` form"""
+        return portable
+
+    def key(self, portable):
+        """Return deterministic bytes identifying the `portable` state (used to partition states among processes)"""
+        return portable
+
+    def explore(self, order='bfs', max_states=None, max_depth=None):
+        return search(self, order, max_states, max_depth)
+
+class NetExplorer:
+    """Successor generator of a High-Level Petri net (e.g., the adaptive net built by `AdaptiveNetBuilder`).
+    The content of each place (P, T, M, I, O, H, observable*, feedback-loop places) is interned once:
+    a state is a tuple of content ids (one per place) and a successor shares with its parent the ids
+    of all the places not touched by the fired transition.
+    With `reduction=True` only the transitions of a stubborn set are fired in each state
+    (see `stubborn`): deadlocks are preserved, as well as the reachable contents of the
+    `visible` places (when explored by `search`, that fully expands the states closing a cycle)."""
+
+    def __init__(self, net, reduction=False, visible=()):
+        self.net = net
+        self.places = list(net.place())
+        self.position = {p.name : k for k, p in enumerate(self.places)}
+        self.contents = []
+        self.content_index = {}
+        # id of the content currently held by each place of `net` (None if unknown)
+        self.loaded = [None] * len(self.places)
+        self.types = [type(p.tokens) for p in self.places]
+        self.transitions = []
+        for t in net.transition():
+            positions = set(self.position[p.name] for (p, a) in t.input())
+            positions.update(self.position[p.name] for (p, a) in t.output())
+            bound = [a.name for (p, a) in t.input() if type(a) is Variable]
+            self.transitions.append((t, tuple(sorted(positions)), bound))
+        self.reduction = reduction
+        self.visible = set((p, None) for p in visible)
+        self.footprints = [footprint(t) for (t, positions, bound) in self.transitions]
+        # True if the last call to `successors` returned a reduced set of successors
+        self.reduced = False
+
+    def intern(self, tokens):
+        """Return the id of the content `tokens` (a copy is stored the first time it is seen)"""
+        # the container type is part of the key, so that a place is always reloaded with its own type
+        key = (type(tokens), frozenset(dict.items(tokens)))
+        k = self.content_index.get(key)
+        if k is None:
+            k = len(self.contents)
+            self.content_index[key] = k
+            self.contents.append(tokens.copy())
+        return k
+
+    def load(self, state):
+        """Set the marking of `net` to `state` (only the places whose content differs are rewritten)"""
+        for k in range(0, len(state)):
+            if self.loaded[k] != state[k]:
+                self.places[k].tokens = self.contents[state[k]].copy()
+                self.loaded[k] = state[k]
+
+    def initial(self):
+        state = tuple(self.intern(p.tokens) for p in self.places)
+        self.loaded = list(state)
+        return state
+
+    def successors(self, state, full=False):
+        """Return the list of (label, state) pairs reachable from `state` in one step
+        (only through a stubborn set, if the reduction is enabled and `full` is False).
+        A label is a pair (transition name, values of the variables bound on its input arcs)"""
+        self.load(state)
+        modes = [t.modes() for (t, positions, bound) in self.transitions]
+        self.reduced = False
+        if self.reduction and not full:
+            modes = self.stubborn(modes)
+        result = []
+        for k in range(0, len(self.transitions)):
+            t, positions, bound = self.transitions[k]
+            for mode in modes[k]:
+                self.load(state)
+                t.fire(mode)
+                succ = list(state)
+                for j in positions:
+                    tokens = self.places[j].tokens
+                    if dict.__eq__(tokens, self.contents[state[j]]):
+                        self.loaded[j] = state[j]
+                    else:
+                        succ[j] = self.intern(tokens)
+                        self.loaded[j] = succ[j]
+                label = (t.name, tuple((v, mode(v)) for v in bound))
+                result.append((label, tuple(succ)))
+        return result
+
+    def actions(self, modes):
+        """Return the actions of the loaded marking, as (transition number, modes, reads, writes, needs) tuples,
+        where the writers of the `needs` resources are a necessary enabling set of a disabled action.
+        Resources (read or written) are (place name, None) pairs, except for the `M` place accessed
+        by a move transition, which is refined into a ('M', P/T place) resource per P/T place:
+        the move transition is split into an action per P/T transition `t` in `T`, plus a disabled
+        action standing for the P/T transitions not (yet) in `T`."""
+        result = []
+        for k in range(0, len(self.transitions)):
+            t = self.transitions[k][0]
+            reads, writes = self.footprints[k]
+            if not MOVE.match(t.name) or not self.net.has_place('M'):
+                result.append((k, modes[k], reads, writes, reads | writes))
+                continue
+            reads = reads - {('M', None)}
+            writes = writes - {('M', None)}
+            i, o, h = [self.net.place(name).tokens for name in ('I', 'O', 'H')]
+            for tr in sorted(set(self.net.place('T').tokens), key=repr):
+                inh = set(('M', p) for p in _values(h, tr))
+                touched = set(('M', p) for p in _values(i, tr)) | set(('M', p) for p in _values(o, tr))
+                result.append((k, [m for m in modes[k] if m('t') == tr], reads | inh, writes | touched, reads | inh | writes | touched))
+            # a P/T transition not in `T` needs to be added first
+            result.append((k, [], reads, writes | {('M', None)}, {('T', None)}))
+        return result
+
+    def stubborn(self, modes):
+        """Given the modes of each transition in the loaded marking, return the modes of the
+        transitions in the smallest (strong) stubborn set found: it contains an enabled action,
+        every action depending on one of its enabled actions, and a necessary enabling set
+        (the writers of the resources it accesses) of each of its disabled actions."""
+        actions = self.actions(modes)
+        enabled = [a for a in range(0, len(actions)) if len(actions[a][1]) > 0]
+        best = None
+        if len(enabled) > 1:
+            for seed in enabled:
+                found = self.closure(actions, seed)
+                size = sum(len(actions[a][1]) for a in found)
+                if best is None or size < best[0]:
+                    best = (size, found)
+        if best is None or sum(len(m) for m in modes) == best[0]:
+            return modes
+        found = best[1]
+        if any(overlaps(actions[a][3], self.visible) for a in found if len(actions[a][1]) > 0):
+            return modes
+        self.reduced = True
+        result = [[] for m in modes]
+        for a in sorted(found):
+            result[actions[a][0]] += actions[a][1]
+        return result
+
+    def closure(self, actions, seed):
+        found = {seed}
+        work = [seed]
+        while len(work) > 0:
+            a = work.pop()
+            k, modes, reads, writes, needs = actions[a]
+            if len(modes) > 0:
+                # any action depending on an enabled one
+                deps = [b for b in range(0, len(actions)) if overlaps(writes, actions[b][2] | actions[b][3])
+                        or overlaps(actions[b][3], reads | writes)]
+            else:
+                deps = [b for b in range(0, len(actions)) if overlaps(actions[b][3], needs)]
+            for b in deps:
+                if b not in found:
+                    found.add(b)
+                    work.append(b)
+        return found
+
+    def decode(self, state):
+        """Return the `Marking` (omitting empty places) encoded by `state`"""
+        return Marking((self.places[k].name, self.contents[state[k]].copy())
+                       for k in range(0, len(state)) if self.contents[state[k]].size() > 0)
+
+    def portable(self, state):
+        """Return a process-independent (picklable) form of `state`: for each place,
+        the (token, count) pairs of its content sorted by representation"""
+        return tuple(tuple(sorted(dict.items(self.contents[k]), key=repr)) for k in state)
+
+    def local(self, portable):
+        """Return the state of this explorer corresponding to the `portable` form"""
+        state = []
+        for k in range(0, len(portable)):
+            k_id = self.content_index.get((self.types[k], frozenset(portable[k])))
+            if k_id is None:
+                tokens = self.types[k]()
+                for (token, n) in portable[k]:
+                    tokens._add(token, n)
+                k_id = self.intern(tokens)
+            state.append(k_id)
+        return tuple(state)
+
+    def key(self, portable):
+        """Return deterministic bytes identifying the `portable` state (used to partition states among processes)"""
+        return repr(portable).encode('utf-8')
+
+    def explore(self, order='bfs', max_states=None, max_depth=None):
+        graph = search(self, order, max_states, max_depth)
+        # leave the net in its initial marking
+        self.load(graph.states[0])
+        return graph
+
+MOVE = re.compile('move[0-9]*$')
+
+def footprint(transition):
+    """Return the (read, written) resources of `transition`, as sets of (place name, None) pairs.
+    An input place is only read when the transition puts back what it takes (the same annotation
+    on both the input and the output arc, as for the places of the `lib.*` core-lib entries)."""
+    outputs = {p.name : a for (p, a) in transition.output()}
+    reads = set()
+    writes = set()
+    for (p, a) in transition.input():
+        o = outputs.get(p.name)
+        if isinstance(a, Test) or (type(o) is type(a) and str(o) == str(a)):
+            reads.add((p.name, None))
+        else:
+            writes.add((p.name, None))
+    writes.update((name, None) for name in outputs if (name, None) not in reads)
+    return reads, writes
+
+def overlaps(resources, others):
+    """Return True if a resource in `resources` is also in `others` (None matches any P/T place)"""
+    for (p, sub) in resources:
+        for (q, other) in others:
+            if p == q and (sub is None or other is None or sub == other):
+                return True
+    return False
+
+class ReachabilityGraph:
+    """A reachability graph: states are numbered from 0 (0 is the initial state) and stored once
+    in a hash table; edges are stored as three parallel arrays (source, label, target)"""
+
+    def __init__(self, explorer):
+        self.explorer = explorer
+        self.index = {}
+        self.states = []
+        self.labels = []
+        self.label_index = {}
+        self.src = array('I')
+        self.label = array('I')
+        self.dst = array('I')
+        # False if the exploration has been truncated by a state or depth limit
+        self.complete = True
+
+    def __len__(self):
+        return len(self.states)
+
+    def add_state(self, state):
+        k = len(self.states)
+        self.index[state] = k
+        self.states.append(state)
+        return k
+
+    def add_edge(self, src, label, dst):
+        k = self.label_index.get(label)
+        if k is None:
+            k = len(self.labels)
+            self.label_index[label] = k
+            self.labels.append(label)
+        self.src.append(src)
+        self.label.append(k)
+        self.dst.append(dst)
+
+    def state_id(self, state):
+        """Return the number of `state` (None if it has not been reached)"""
+        return self.index.get(state)
+
+    def marking(self, k):
+        """Return the (decoded) marking of state number `k`"""
+        return self.explorer.decode(self.states[k])
+
+    def num_edges(self):
+        return len(self.src)
+
+    def edges(self):
+        """Iterate over the (source, label, target) edges"""
+        for k in range(0, len(self.src)):
+            yield (self.src[k], self.labels[self.label[k]], self.dst[k])
+
+    def successors(self, k):
+        """Return the list of (label, target) edges leaving state number `k`"""
+        return [(self.labels[self.label[e]], self.dst[e]) for e in range(0, len(self.src)) if self.src[e] == k]
+
+    def deadlocks(self):
+        """Return the states without successors (meaningful only if the graph is complete)"""
+        sources = set(self.src)
+        return [k for k in range(0, len(self.states)) if k not in sources]
+
+    def export_dot(self, dot_file=None):
+        dot = Digraph(comment='Reachability graph')
+        for k in range(0, len(self.states)):
+            dot.node(str(k), str(self.marking(k)))
+        for (src, label, dst) in self.edges():
+            dot.edge(str(src), str(dst), label=str(label))
+        if dot_file is None:
+            print(dot.source)
+        else:
+            dot.render(dot_file, view=False)
+
+def search(explorer, order='bfs', max_states=None, max_depth=None):
+    """Explore the state space generated by `explorer` (any object providing `initial()` and
+    `successors(state)`), in breadth-first (`bfs`) or depth-first (`dfs`) `order`.
+    The exploration stops adding states after `max_states` states and does not expand states
+    at depth `max_depth`. Return the `ReachabilityGraph`."""
+    if order not in ('bfs', 'dfs'):
+        raise ValueError('Unknown search order: ' + str(order) + '. Expected bfs or dfs')
+    graph = ReachabilityGraph(explorer)
+    graph.add_state(explorer.initial())
+    frontier = deque([(0, 0)])
+    pop = frontier.popleft if order == 'bfs' else frontier.pop
+    while len(frontier) > 0:
+        k, depth = pop()
+        if max_depth is not None and depth >= max_depth:
+            graph.complete = False
+            continue
+        successors = explorer.successors(graph.states[k])
+        # cycle proviso: a reduced state reaching an already visited state is fully expanded
+        if getattr(explorer, 'reduced', False) and any(succ in graph.index for (label, succ) in successors):
+            successors = explorer.successors(graph.states[k], full=True)
+        for label, succ in successors:
+            j = graph.index.get(succ)
+            if j is None:
+                if max_states is not None and len(graph.states) >= max_states:
+                    graph.complete = False
+                    continue
+                j = graph.add_state(succ)
+                frontier.append((j, depth + 1))
+            graph.add_edge(k, label, j)
+    return graph
+
+def explorer_for(net, typecode='I', reduction=False, visible=()):
+    """Return the explorer of either a P/T net (a `PT` or the net encoded by an `Emulator`),
+    or a High-Level Petri net (e.g., the adaptive net built by `AdaptiveNetBuilder`).
+    The partial-order `reduction` is only available for High-Level Petri nets."""
+    if isinstance(net, PetriNet):
+        return NetExplorer(net, reduction, visible)
+    if reduction:
+        raise ValueError('Partial-order reduction requires a High-Level Petri net')
+    return PTExplorer(net, typecode)
+
+def reachability_graph(net, order='bfs', max_states=None, max_depth=None, typecode='I', reduction=False, visible=()):
+    """Return the reachability graph of either a P/T net (a `PT` or the net encoded by an `Emulator`),
+    or a High-Level Petri net (e.g., the adaptive net built by `AdaptiveNetBuilder`).
+    With `reduction=True` the graph is reduced by stubborn sets (see `NetExplorer`)."""
+    return explorer_for(net, typecode, reduction, visible).explore(order, max_states, max_depth)
+
+# Parallel exploration
+
+def owner(key, workers):
+    """Return the index of the worker owning the state identified by `key`"""
+    return zlib.crc32(key) % workers
+
+class PartialGraph:
+    """The part of a reachability graph owned by one worker: its states (in portable form)
+    with their BFS level, and the edges entering them. The source of an edge is a
+    (worker, local state number) pair, the target is a local state number."""
+
+    def __init__(self, worker, states, levels, edges):
+        self.worker = worker
+        self.states = states
+        self.levels = levels
+        self.edges = edges
+
+def explore_partition(factory, worker, workers, conn, queues):
+    """Worker process: own the states hashed to `worker`, expand the new ones and send their
+    successors straight to their owners, one batch per worker and level through the `queues`
+    of the workers (the master only gets the number of new and received states)"""
+    try:
+        explorer = factory()
+        index = {}
+        states = []
+        levels = []
+        edges = []
+        inbox = []
+        while True:
+            batch = conn.recv()
+            if batch is None:
+                conn.send(PartialGraph(worker, [explorer.portable(s) for s in states], levels, edges))
+                break
+            level, expand, seed = batch
+            new = []
+            for (p, src, label) in inbox + seed:
+                state = explorer.local(p)
+                k = index.get(state)
+                if k is None:
+                    k = len(states)
+                    index[state] = k
+                    states.append(state)
+                    levels.append(level)
+                    new.append(k)
+                if src is not None:
+                    edges.append((src, label, k))
+            outboxes = [[] for w in range(0, workers)]
+            if expand:
+                for k in new:
+                    for label, succ in explorer.successors(states[k]):
+                        p = explorer.portable(succ)
+                        outboxes[owner(explorer.key(p), workers)].append((p, (worker, k), label))
+            for dst in range(0, workers):
+                if dst != worker:
+                    queues[dst].put(outboxes[dst])
+            # the batches of a level are all received before the master starts the next one
+            inbox = outboxes[worker]
+            for w in range(1, workers):
+                inbox += queues[worker].get()
+            conn.send((len(new), len(inbox)))
+    except Exception:
+        conn.send(RuntimeError('worker ' + str(worker) + ' failed:\n' + traceback.format_exc()))
+    finally:
+        conn.close()
+
+class ParallelExplorer:
+    """Breadth-first exploration over a pool of worker processes.
+    States are hash-partitioned among the workers: each worker owns the visited set of its
+    partition, and the frontier is exchanged between the workers in batches, one BFS level at
+    a time, while the master only starts the levels and counts the states.
+    `factory` is a callable returning the explorer of the net (e.g., `lambda: NetExplorer(build_net())`):
+    with the `fork` start method it is inherited by the workers, otherwise it must be picklable."""
+
+    def __init__(self, factory, workers=None):
+        self.factory = factory
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.partials = None
+
+    def context(self):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('fork')
+        return multiprocessing.get_context()
+
+    def explore(self, max_states=None, max_depth=None):
+        """Explore the state space and return the merged `ReachabilityGraph`.
+        The state count does not depend on the number of workers. `max_states` is checked
+        at the end of each BFS level, so the last level may exceed it."""
+        ctx = self.context()
+        # the batches sent to each worker by the others
+        queues = [ctx.Queue() for w in range(0, self.workers)]
+        conns = []
+        processes = []
+        for w in range(0, self.workers):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=explore_partition, args=(self.factory, w, self.workers, child, queues))
+            process.daemon = True
+            process.start()
+            child.close()
+            conns.append(parent)
+            processes.append(process)
+        try:
+            explorer = self.factory()
+            initial = explorer.portable(explorer.initial())
+            seeds = [[] for w in range(0, self.workers)]
+            seeds[owner(explorer.key(initial), self.workers)].append((initial, None, None))
+            level = 0
+            total = 0
+            pending = 1
+            complete = True
+            while pending > 0:
+                expand = (max_depth is None or level < max_depth) and (max_states is None or total < max_states)
+                for w in range(0, self.workers):
+                    conns[w].send((level, expand, seeds[w] if level == 0 else []))
+                found = 0
+                pending = 0
+                for n, received in self.gather(conns):
+                    found += n
+                    pending += received
+                total += found
+                if not expand and found > 0:
+                    complete = False
+                level += 1
+            for conn in conns:
+                conn.send(None)
+            self.partials = self.gather(conns)
+        finally:
+            for process in processes:
+                process.join(1)
+                if process.is_alive():
+                    process.terminate()
+            for queue in queues:
+                queue.close()
+        graph = merge(self.partials, explorer)
+        graph.complete = complete
+        return graph
+
+    def gather(self, conns):
+        """Return the messages of the workers, in order. The error of a failing worker is raised
+        as soon as it arrives (the other workers may be waiting for its batches)"""
+        messages = {}
+        while len(messages) < len(conns):
+            for conn in multiprocessing.connection.wait([c for c in conns if c not in messages]):
+                messages[conn] = self.receive(conn)
+        return [messages[conn] for conn in conns]
+
+    def receive(self, conn):
+        message = conn.recv()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+def merge(partials, explorer):
+    """Merge the `partials` graphs into a single `ReachabilityGraph` of `explorer`.
+    States are numbered by BFS level, then by worker and local number (0 is the initial state)."""
+    graph = ReachabilityGraph(explorer)
+    order = sorted((partial.levels[k], partial.worker, k) for partial in partials for k in range(0, len(partial.states)))
+    numbers = {}
+    by_worker = {partial.worker : partial for partial in partials}
+    for (level, w, k) in order:
+        numbers[(w, k)] = graph.add_state(explorer.local(by_worker[w].states[k]))
+    for partial in sorted(partials, key=lambda partial: partial.worker):
+        for (src, label, k) in partial.edges:
+            graph.add_edge(numbers[src], label, numbers[(partial.worker, k)])
+    return graph
+
+def parallel_reachability_graph(net, workers=None, max_states=None, max_depth=None, typecode='I'):
+    """Return the reachability graph of `net` (see `explorer_for`), explored by `workers` processes"""
+    # a partial of a module-level function can be pickled by the spawn start method (a lambda cannot)
+    return ParallelExplorer(functools.partial(explorer_for, net, typecode), workers).explore(max_states, max_depth)
@@ -0,0 +1,252 @@
+from heapq import heappush, heappop
+import random
+
+from .base import Emulator
+from .functions import _values, _keys
+
+class Exponential:
+    """An exponentially distributed delay with the given `rate`"""
+
+    def __init__(self, rate):
+        if rate <= 0:
+            raise ValueError('The rate must be positive: ' + str(rate))
+        self.rate = rate
+
+    def sample(self, rng):
+        return rng.expovariate(self.rate)
+
+    def __repr__(self):
+        return 'Exponential(' + str(self.rate) + ')'
+
+class Deterministic:
+    """A constant delay"""
+
+    def __init__(self, delay):
+        if delay < 0:
+            raise ValueError('The delay must not be negative: ' + str(delay))
+        self.delay = delay
+
+    def sample(self, rng):
+        return self.delay
+
+    def __repr__(self):
+        return 'Deterministic(' + str(self.delay) + ')'
+
+class PTModel:
+    """Access to a `PT` net for the `TimedSimulator`"""
+
+    def __init__(self, pt):
+        self.pt = pt
+
+    def places(self):
+        return list(self.pt.get_places())
+
+    def transitions(self):
+        return list(self.pt.get_transitions())
+
+    def enabled(self, t):
+        return self.pt.enabled(t)
+
+    def fire(self, t):
+        self.pt.fire(t)
+
+    def places_of(self, t):
+        """Return the places whose tokens are changed by the firing of `t`"""
+        pt = self.pt
+        return set(arc.src for arc in pt.arc_set('input', pt.i, t)) | set(arc.dst for arc in pt.arc_set('output', pt.o, t))
+
+    def affected(self, places):
+        """Return the transitions whose enabling depends on `places`"""
+        result = set()
+        for p in places:
+            result.update(self.pt.readers.get(p, ()))
+        return result
+
+    def tokens(self, p):
+        return self.pt.get_tokens(p)
+
+    def delay(self, t):
+        return self.pt.get_delay(t)
+
+    def version(self):
+        # changes to a PT are not tracked: `TimedSimulator.reschedule` must be called explicitly
+        return None
+
+class EmulatorModel:
+    """Access to the P/T net emulated by an `Emulator` (transitions fire through `move`) for the `TimedSimulator`"""
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def places(self):
+        return list(self.emulator.p.tokens)
+
+    def transitions(self):
+        return list(self.emulator.t.tokens)
+
+    def enabled(self, t):
+        return self.emulator.native_enabled(t)
+
+    def fire(self, t):
+        self.emulator.fire_pt(t)
+
+    def places_of(self, t):
+        return set(_values(self.emulator.i.tokens, t)) | set(_values(self.emulator.o.tokens, t))
+
+    def affected(self, places):
+        result = set()
+        for p in places:
+            result.update(_keys(self.emulator.i.tokens, p))
+            result.update(_keys(self.emulator.h.tokens, p))
+        return result
+
+    def tokens(self, p):
+        return self.emulator.m.tokens(p)
+
+    def delay(self, t):
+        return self.emulator.get_delay(t)
+
+    def version(self):
+        return self.emulator.content_versions()
+
+class TimedStatistics:
+    """Statistics of a timed simulation: the simulated `time`, the number of firings of each
+    transition and the time-integral of the tokens of each place"""
+
+    def __init__(self):
+        self.time = 0.0
+        self.steps = 0
+        self.firings = {}
+        self.areas = {}
+
+    def throughput(self, transition):
+        """Return the number of firings of `transition` per time unit"""
+        if self.time == 0:
+            return 0.0
+        return self.firings.get(transition, 0) / self.time
+
+    def mean_tokens(self, place):
+        """Return the time-averaged number of tokens in `place`"""
+        if self.time == 0:
+            return 0.0
+        return self.areas.get(place, 0.0) / self.time
+
+    def latency(self, place, transition):
+        """Return the mean time spent by a token in `place`, drained by `transition` (Little's law)"""
+        throughput = self.throughput(transition)
+        if throughput == 0:
+            return float('inf')
+        return self.mean_tokens(place) / throughput
+
+class TimedSimulator:
+    """Event-driven (GSPN-style) simulation of a `PT` or of the P/T net emulated by an `Emulator`.
+    Transitions with a delay (see `PT.set_delay`) are timed, the others are immediate and fire
+    first (one at random, among the enabled ones). Each enabled timed transition has a scheduled
+    firing time in a heap; a firing only re-checks the transitions reading the places it changed
+    (next-reaction method): newly enabled transitions are scheduled, disabled ones are dropped,
+    the fired one is rescheduled if still enabled, and the others keep their firing time."""
+
+    def __init__(self, net, seed=None):
+        self.model = EmulatorModel(net) if isinstance(net, Emulator) else PTModel(net)
+        self.rng = random.Random(seed)
+        self.stats = TimedStatistics()
+        self.heap = []
+        self.scheduled = {}
+        # delay each scheduled firing time was sampled from
+        self.sampled = {}
+        self.immediate = set()
+        self.counter = 0
+        self.last = {}
+        self.reschedule()
+
+    def reschedule(self):
+        """Bring the scheduled firings up to date after a change of the net not performed by
+        the simulator (e.g., an adaptation): the transitions that became enabled, or whose delay
+        changed, are scheduled; the disabled ones are dropped; the others keep their firing time"""
+        # in a fixed order: the samples are drawn from the seeded `rng` (see `next_event`)
+        for t in sorted(set(self.model.transitions()) | set(self.scheduled) | self.immediate):
+            self.update(t)
+        self.versions = self.model.version()
+
+    def update(self, t, fired=False):
+        delay = self.model.delay(t)
+        if not self.model.enabled(t):
+            self.scheduled.pop(t, None)
+            self.sampled.pop(t, None)
+            self.immediate.discard(t)
+        elif delay is None:
+            self.scheduled.pop(t, None)
+            self.sampled.pop(t, None)
+            self.immediate.add(t)
+        elif fired or t not in self.scheduled or self.sampled.get(t) is not delay:
+            self.immediate.discard(t)
+            self.counter += 1
+            entry = (self.stats.time + delay.sample(self.rng), self.counter, t)
+            self.scheduled[t] = entry
+            self.sampled[t] = delay
+            heappush(self.heap, entry)
+
+    def next_event(self):
+        """Return the (time, transition) of the next firing, or None if no transition is enabled"""
+        if len(self.immediate) > 0:
+            return (self.stats.time, self.rng.choice(sorted(self.immediate)))
+        while len(self.heap) > 0:
+            entry = self.heap[0]
+            if self.scheduled.get(entry[2]) is entry:
+                return (entry[0], entry[2])
+            # stale entry (rescheduled or disabled transition)
+            heappop(self.heap)
+        return None
+
+    def accumulate(self, place, time):
+        """Add the tokens of `place` from its last change up to `time` to its area"""
+        area = self.stats.areas.get(place, 0.0)
+        self.stats.areas[place] = area + self.model.tokens(place) * (time - self.last.get(place, 0.0))
+        self.last[place] = time
+
+    def step(self, event=None):
+        """Fire the next transition (or the (time, transition) `event` returned by `next_event`).
+        Return its (time, transition), or None in a deadlock"""
+        if event is None:
+            event = self.next_event()
+        if event is None:
+            return None
+        time, t = event
+        places = self.model.places_of(t)
+        for p in places:
+            self.accumulate(p, time)
+        self.stats.time = time
+        self.model.fire(t)
+        self.stats.steps += 1
+        self.stats.firings[t] = self.stats.firings.get(t, 0) + 1
+        for u in sorted(self.model.affected(places) | {t}):
+            self.update(u, u == t)
+        self.versions = self.model.version()
+        return event
+
+    def run(self, until=None, max_steps=None, hook=None):
+        """Simulate up to time `until` and/or `max_steps` firings (or a deadlock), and return
+        the `TimedStatistics`. After each firing `hook(simulator, time, transition)` is called:
+        it may adapt the net (an `Emulator` is rescheduled automatically when changed, a `PT`
+        when `hook` returns True)"""
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            event = self.next_event()
+            if event is None or (until is not None and event[0] > until):
+                break
+            self.step(event)
+            steps += 1
+            if hook is not None:
+                self.flush(self.stats.time)
+                changed = hook(self, event[0], event[1])
+                if changed or self.model.version() != self.versions:
+                    self.reschedule()
+        if until is not None and (max_steps is None or steps < max_steps):
+            self.stats.time = max(self.stats.time, until)
+        self.flush(self.stats.time)
+        return self.stats
+
+    def flush(self, time):
+        """Bring the areas of all the places with tokens (or accumulated ones) up to `time`"""
+        for p in set(self.last) | set(self.model.places()):
+            self.accumulate(p, time)
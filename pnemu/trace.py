@@ -0,0 +1,216 @@
+import io
+import pickle
+import struct
+
+# record tags
+NAME = 'n'
+CHECKPOINT = 'c'
+STEP = 's'
+INDEX = 'x'
+
+FOOTER = struct.Struct('>Q')
+MAGIC = b'PNEMU-TRACE\x01'
+
+def contents(tokens):
+    """Return the content of a place as stored into a trace: a number of tokens (P/T places),
+    or a {token : count} dict (High-Level places)"""
+    if isinstance(tokens, int):
+        return tokens
+    return dict(dict.items(tokens))
+
+def apply_delta(marking, delta):
+    """Apply the `delta` of a step record to `marking` (a dict of place : content), in place"""
+    for p, change in delta.items():
+        if isinstance(change, dict):
+            tokens = marking.setdefault(p, {})
+            for token, n in change.items():
+                if n == 0:
+                    tokens.pop(token, None)
+                else:
+                    tokens[token] = n
+            if len(tokens) == 0:
+                del marking[p]
+        elif change == 0:
+            marking.pop(p, None)
+        else:
+            marking[p] = change
+
+class TraceWriter:
+    """Stream the firings of a net into a compact binary file (a sequence of pickled records).
+    Each step stores the id of the fired transition (names are stored once), its binding and
+    the marking delta (the new content of the changed places, or of the changed tokens of a
+    High-Level place); every `every` steps a full checkpoint of the marking is stored, so
+    that a `TraceReader` can seek to any step by replaying at most `every` deltas.
+    Writes are buffered; `close` appends the index of the checkpoints."""
+
+    def __init__(self, file, marking, every=1000, buffer_size=1 << 20):
+        """Start a trace into `file` (a path, or a writable binary file object) from `marking`
+        (a dict of place : content, see `contents`)"""
+        self.owned = not hasattr(file, 'write')
+        if self.owned:
+            self.file = open(file, 'wb', buffering=buffer_size)
+        elif isinstance(file, io.RawIOBase):
+            self.file = io.BufferedWriter(file, buffer_size)
+        else:
+            self.file = file
+        self.every = every
+        self.names = []
+        self.ids = {}
+        self.checkpoints = []
+        self.steps = 0
+        self.marking = {p : contents(tokens) for p, tokens in marking.items()}
+        self.file.write(MAGIC)
+        self.checkpoint()
+
+    def write(self, record):
+        pickle.dump(record, self.file, pickle.HIGHEST_PROTOCOL)
+
+    def checkpoint(self):
+        self.checkpoints.append(self.file.tell())
+        self.write((CHECKPOINT, self.steps, self.marking))
+
+    def transition_id(self, name):
+        k = self.ids.get(name)
+        if k is None:
+            k = len(self.names)
+            self.ids[name] = k
+            self.names.append(name)
+            self.write((NAME, k, name))
+        return k
+
+    def record(self, transition, binding, changes):
+        """Record the firing of `transition` with `binding`; `changes` is an iterable of the
+        (place, token, count) possibly changed by the firing: the new number of tokens of a
+        P/T place (token is None), or the new count of a token of a High-Level place (only the
+        actual differences are stored)"""
+        delta = {}
+        for p, token, n in changes:
+            if token is None:
+                if n != self.marking.get(p, 0):
+                    delta[p] = n
+            elif n != self.marking.get(p, {}).get(token, 0):
+                delta.setdefault(p, {})[token] = n
+        self.write((STEP, self.transition_id(transition), binding, delta))
+        apply_delta(self.marking, delta)
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.checkpoint()
+
+    def close(self):
+        offset = self.file.tell()
+        self.write((INDEX, self.every, self.steps, self.checkpoints, self.names))
+        self.file.write(FOOTER.pack(offset))
+        self.file.flush()
+        if self.owned:
+            self.file.close()
+
+class TraceReader:
+    """Read a trace written by a `TraceWriter` (from a path, or a seekable binary file object)"""
+
+    def __init__(self, file):
+        self.owned = not hasattr(file, 'read')
+        self.file = open(file, 'rb') if self.owned else file
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a pnemu trace')
+        if not self.load_index():
+            self.scan()
+
+    def load_index(self):
+        self.file.seek(0, io.SEEK_END)
+        end = self.file.tell()
+        if end < len(MAGIC) + FOOTER.size:
+            return False
+        self.file.seek(end - FOOTER.size)
+        offset = FOOTER.unpack(self.file.read(FOOTER.size))[0]
+        if offset < len(MAGIC) or offset >= end:
+            return False
+        self.file.seek(offset)
+        try:
+            record = pickle.load(self.file)
+        except Exception:
+            return False
+        if not isinstance(record, tuple) or record[0] != INDEX:
+            return False
+        tag, self.every, self.steps, self.checkpoints, self.names = record
+        return True
+
+    def scan(self):
+        """Rebuild the index of a trace that has not been closed (e.g., after a crash)"""
+        self.file.seek(len(MAGIC))
+        self.checkpoints = []
+        self.names = []
+        self.steps = 0
+        self.every = None
+        while True:
+            offset = self.file.tell()
+            try:
+                record = pickle.load(self.file)
+            except Exception:
+                break
+            if record[0] == CHECKPOINT:
+                self.checkpoints.append(offset)
+            elif record[0] == NAME:
+                self.names.append(record[2])
+            elif record[0] == STEP:
+                self.steps += 1
+            else:
+                break
+        if len(self.checkpoints) > 1:
+            self.file.seek(self.checkpoints[1])
+            self.every = pickle.load(self.file)[1]
+        else:
+            self.every = max(self.steps, 1)
+
+    def __len__(self):
+        return self.steps
+
+    def records(self, checkpoint):
+        """Iterate over the records following the checkpoint number `checkpoint` (included)"""
+        self.file.seek(self.checkpoints[checkpoint])
+        while True:
+            try:
+                record = pickle.load(self.file)
+            except (EOFError, pickle.UnpicklingError):
+                # end of a trace that has not been closed
+                return
+            if record[0] == INDEX:
+                return
+            yield record
+
+    def marking(self, step):
+        """Return the marking (a dict of place : content) after `step` steps (0 is the initial marking)"""
+        if step < 0 or step > self.steps:
+            raise IndexError('step out of range: ' + str(step))
+        checkpoint = min(step // self.every, len(self.checkpoints) - 1)
+        marking = None
+        current = None
+        for record in self.records(checkpoint):
+            if record[0] == CHECKPOINT:
+                current = record[1]
+                marking = record[2]
+            elif record[0] == STEP:
+                apply_delta(marking, record[3])
+                current += 1
+            if current == step:
+                return marking
+
+    def replay(self, start=0):
+        """Iterate over the (step number, transition name, binding, marking after the step) of the
+        steps from `start` (the marking is updated in place: copy it to keep it)"""
+        if start >= self.steps:
+            return
+        marking = self.marking(start)
+        checkpoint = min(start // self.every, len(self.checkpoints) - 1)
+        current = None
+        for record in self.records(checkpoint):
+            if record[0] == CHECKPOINT:
+                current = record[1]
+            elif record[0] == STEP:
+                if current >= start:
+                    apply_delta(marking, record[3])
+                    yield (current + 1, self.names[record[1]], record[2], marking)
+                current += 1
+
+    def close(self):
+        if self.owned:
+            self.file.close()
@@ -21,10 +21,11 @@ setup(
         'Topic :: Software Development :: Libraries',
         'License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
+    python_requires='>=3.9',
     keywords='PetriNets reflection simulation evolution edaptation',
     packages=find_packages(exclude=['contrib', 'docs', 'examples', 'tests']),
     install_requires=[
@@ -32,7 +33,8 @@ setup(
         'graphviz',
     ],
     extras_require={
-        'test': ['pytest']
+        'test': ['pytest'],
+        'numpy': ['numpy'],
     },
     project_urls={
         'Bug Reports': 'https://github.com/SELab-unimi/pyrpn/issues',
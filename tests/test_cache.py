@@ -0,0 +1,68 @@
+from .context import PT
+from .context import Emulator
+from pnemu.cache import NetCache
+
+import os
+import shutil
+import tempfile
+import unittest
+
+TEST_PNML_1 = os.path.join(os.path.dirname(__file__), 'resources/test.pnml')
+TEST_PNML_2 = os.path.join(os.path.dirname(__file__), 'resources/test2.pnml')
+
+class CacheTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+        self.cache = NetCache(self.directory)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def test_load_pt(self):
+        expected = PT('load_test', TEST_PNML_1)
+        for k in range(0, 2):
+            pt = self.cache.load_pt(TEST_PNML_1)
+            assert pt.get_name() == 'test.pnml'
+            assert pt.get_marking() == expected.get_marking()
+            assert len(pt.get_arcs()) == len(expected.get_arcs())
+            assert pt.enabled_transitions() == expected.enabled_transitions()
+        assert len(self.cache.entries()) == 1
+        with open(TEST_PNML_2, 'rb') as pnml:
+            assert self.cache.load_pt(pnml, 'test2').get_tokens('P0') == 3
+        assert len(self.cache.entries()) == 2
+
+    def test_load_emulator(self):
+        expected = Emulator(PT('load_test', TEST_PNML_2)).get_marking()
+        cold = self.cache.load_emulator(TEST_PNML_2, engine='native')
+        warm = self.cache.load_emulator(TEST_PNML_2, engine='native')
+        for place in ['P', 'T', 'M', 'I', 'O', 'H']:
+            assert cold.get_marking().get(place) == warm.get_marking().get(place) == expected.get(place)
+        assert warm.fire_pt('T1')
+        assert warm.fire_pt('T0')
+
+    def test_eviction(self):
+        self.cache.load_pt(TEST_PNML_1)
+        size = self.cache.size()
+        os.utime(self.cache.entries()[0][2], (0, 0))
+        self.cache.max_size = size
+        self.cache.load_pt(TEST_PNML_2)
+        # the least recently used entry has been evicted
+        assert len(self.cache.entries()) == 1
+        assert self.cache.size() <= size
+        self.cache.load_pt(TEST_PNML_2)
+        assert len(self.cache.entries()) == 1
+
+    def test_broken_entry(self):
+        digest = self.cache.events(TEST_PNML_1)[0]
+        path = self.cache.path(digest, 'pt')
+        with open(path, 'rb') as entry:
+            content = entry.read()
+        # a truncated entry, and an entry pickled by an older version, are misses
+        for broken in [content[:len(content) // 2], b'\x80\x04cpnemu.pnml\nMissing\n.', b'\x80\x04cmissing\nMissing\n.']:
+            with open(path, 'wb') as entry:
+                entry.write(broken)
+            assert self.cache.get(digest, 'pt') is None
+            assert self.cache.load_pt(TEST_PNML_1).get_marking() == PT('load_test', TEST_PNML_1).get_marking()
+        os.remove(path)
+        assert self.cache.get(digest, 'pt') is None
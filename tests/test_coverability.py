@@ -0,0 +1,53 @@
+from .context import PT
+from .context import Emulator
+from pnemu.coverability import coverability_graph, OMEGA
+from pnemu.statespace import reachability_graph
+
+import os
+import unittest
+
+MS_PNML = os.path.join(os.path.dirname(__file__), 'resources/ms.pnml')
+
+class CoverabilityTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        # an unbounded queue served by a single server
+        self.pt = PT('Queue P/T net')
+        self.pt.add_place('idle', 1)
+        self.pt.add_place('queue')
+        self.pt.add_place('busy')
+        self.pt.add_transition('arrive')
+        self.pt.add_transition('serve')
+        self.pt.add_transition('done')
+        self.pt.add_input_arc('idle', 'arrive')
+        self.pt.add_output_arc('arrive', 'idle')
+        self.pt.add_output_arc('arrive', 'queue')
+        self.pt.add_input_arc('queue', 'serve')
+        self.pt.add_output_arc('serve', 'busy')
+        self.pt.add_inhibitor_arc('busy', 'serve')
+        self.pt.add_input_arc('busy', 'done')
+
+    def teardown_method(self, method):
+        self.pt = None
+
+    def test_unbounded(self):
+        graph = coverability_graph(self.pt)
+        assert graph.complete
+        assert not graph.is_bounded()
+        assert graph.bounds() == {'idle' : 1, 'queue' : OMEGA, 'busy' : 1}
+        assert graph.unbounded_places() == ['queue']
+        assert sorted(graph.bounded_places()) == ['busy', 'idle']
+        assert graph.coverable({'queue' : 100, 'busy' : 1})
+        assert not graph.coverable({'busy' : 2})
+        emulated = coverability_graph(Emulator(self.pt))
+        assert emulated.bounds() == graph.bounds()
+        assert len(emulated) == len(graph)
+
+    def test_bounded(self):
+        pt = PT('ms', MS_PNML)
+        graph = coverability_graph(pt)
+        assert graph.is_bounded()
+        assert len(graph) == len(reachability_graph(pt))
+        graph = coverability_graph(self.pt, max_states=1)
+        assert not graph.complete
+        assert len(graph) == 1
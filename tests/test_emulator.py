@@ -9,12 +9,18 @@ from snakes.nets import MultiSet
 from snakes.nets import MultiArc
 from snakes.nets import Place
 from snakes.nets import Flush
+from snakes.nets import Transition
 from snakes.nets import BlackToken
+from snakes.nets import Substitution
+from pnemu.data import Relation, _clock
+from pnemu.base import ReificationPlace
+from pnemu.primitives import READ_LIB, parse_expression, substitute
 
 import os
 import unittest
 
 STRATEGY_PNML = os.path.join(os.path.dirname(__file__), 'resources/strategy-example.pnml')
+TEST_PNML_2 = os.path.join(os.path.dirname(__file__), 'resources/test2.pnml')
 EXPORT_PNML = os.path.join(os.path.dirname(__file__), 'resources/export-example.pnml')
 
 class EmulatorTestSuite(unittest.TestCase):
@@ -44,6 +50,8 @@ class EmulatorTestSuite(unittest.TestCase):
         assert net.get_marking().get('I') == MultiSet([('t0', 'p0'), ('t0', 'p1'), ('t1', 'p2')])
         assert net.get_marking().get('O') == MultiSet([('t0', 'p2')])
         assert net.get_marking().get('H') == MultiSet([('t0', 'p2')] * 2)
+        assert isinstance(net.place('I').tokens, Relation)
+        assert isinstance(net.copy().place('O').tokens, Relation)
 
     def test_simpleExecution(self):
         net = self.emulator.get_net()
@@ -125,3 +133,314 @@ class EmulatorTestSuite(unittest.TestCase):
         assert net.get_marking().get('result') is None
         net.transition(signature).fire(modes[0])
         assert net.get_marking().get('result') == MultiSet([1])
+
+    def test_unfoldSubstitution(self):
+        entry = READ_LIB['lib.iMult']
+        assert entry.instantiate(['p', '"t1"']) == ["I(('t1', p))"]
+        assert entry.instantiate(['p', '"t1"']) is entry.instantiate(('p', '"t1"'))
+        assert substitute(parse_expression('2 * n + n_ + f(n)'), {'n' : parse_expression('a + 1')}) == '2 * (a + 1) + n_ + f(a + 1)'
+        self.assertRaises(SyntaxError, entry.instantiate, ['p'])
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init')
+        loop.add_place('pArg', ['p2'])
+        loop.add_place('result')
+        signature = 'lib.iMult(p, "t1") -> n'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        loop.add_input_arc('pArg', signature, Variable('p'))
+        loop.add_output_arc(signature, 'result', Expression('n + 1'))
+        net = AdaptiveNetBuilder(self.emulator).add_loop(loop, ['init'], ['t0']).build()
+        net.transition('move1').fire(net.transition('move1').modes()[0])
+        modes = net.transition(signature).modes()
+        assert len(modes) == 1
+        net.transition(signature).fire(modes[0])
+        assert net.get_marking().get('result') == MultiSet([2])
+
+    def test_applyChanges(self):
+        changes = [('addPlace', 'p3'), ('addInputArc', 'p3', 't1', 2), ('setTokens', 'p3', 2),
+            ('setInhibitorArcMult', 'p2', 't0', 1), ('removeOutputArc', 'p2', 't0', 1), ('addOutputArc', 'p3', 't0', 1)]
+        versions = self.emulator.content_versions()
+        self.emulator.apply_changes(changes)
+        assert self.emulator.p.tokens == MultiSet(['p0', 'p1', 'p2', 'p3'])
+        assert self.emulator.m.tokens == MultiSet(['p0'] * 3 + ['p1'] * 3 + ['p3'] * 2)
+        assert self.emulator.i.tokens == MultiSet([('t0', 'p0'), ('t0', 'p1'), ('t1', 'p2'), ('t1', 'p3'), ('t1', 'p3')])
+        assert self.emulator.o.tokens == MultiSet([('t0', 'p3')])
+        assert self.emulator.h.tokens == MultiSet([('t0', 'p2')])
+        assert isinstance(self.emulator.i.tokens, Relation)
+        assert self.emulator.content_versions() != versions
+        self.emulator.apply_changes([('removePlace', 'p3'), ('removeTransition', 't1')])
+        assert self.emulator.i.tokens == MultiSet([('t0', 'p0'), ('t0', 'p1')])
+        assert self.emulator.t.tokens == MultiSet(['t0'])
+        assert self.emulator.m.tokens == MultiSet(['p0'] * 3 + ['p1'] * 3)
+        self.assertRaises(ValueError, self.emulator.apply_changes, [('addPlace', 'p4'), ('removeInputArc', 'p2', 't0', 1)])
+        assert self.emulator.p.tokens == MultiSet(['p0', 'p1', 'p2'])
+        self.assertRaises(ValueError, self.emulator.apply_changes, [('addPlaces', 'p4')])
+        # each place is refilled once, whatever the number of changes
+        start = next(_clock)
+        self.emulator.apply_changes([('setTokens', 'p0', n) for n in range(1, 201)])
+        assert self.emulator.m.tokens('p0') == 200
+        assert next(_clock) - start <= 3
+        self.emulator.apply_changes([('setTokens', 'p0', 3)])
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init')
+        loop.add_place('changes', [(('addInputArc', 'p0', 't0', 1), ('setTokens', 'p2', 5))])
+        signature = 'lib.applyChanges(c)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        loop.add_input_arc('changes', signature, Variable('c'))
+        net = AdaptiveNetBuilder(self.emulator).add_loop(loop, ['init'], ['t0']).build()
+        net.transition('move1').fire(net.transition('move1').modes()[0])
+        modes = net.transition(signature).modes()
+        assert len(modes) == 1
+        net.transition(signature).fire(modes[0])
+        assert net.place('I').tokens == MultiSet([('t0', 'p0'), ('t0', 'p0'), ('t0', 'p1')])
+        assert net.place('M').tokens == MultiSet(['p0'] * 2 + ['p1'] * 2 + ['p2'] * 5)
+
+    def test_countBased(self):
+        pt = PT('queue')
+        pt.add_place('queue', 10 ** 6)
+        pt.add_place('done')
+        pt.add_transition('serve')
+        pt.add_input_arc('queue', 'serve')
+        pt.add_output_arc('serve', 'done', 10 ** 6)
+        emulator = Emulator(pt)
+        for k in range(0, 3):
+            emulator.fire(emulator.modes()[0])
+        assert emulator.m.tokens('queue') == 10 ** 6 - 3
+        assert emulator.m.tokens('done') == 3 * 10 ** 6
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init')
+        signature = 'lib.setTokens("queue", 2 * 10 ** 6)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        net = AdaptiveNetBuilder(emulator).add_loop(loop, ['init'], ['serve']).build()
+        net.transition('move1').fire(net.transition('move1').modes()[0])
+        net.transition(signature).fire(net.transition(signature).modes()[0])
+        assert net.place('M').tokens('queue') == 2 * 10 ** 6
+        assert net.place('M').tokens('done') == 4 * 10 ** 6
+
+    def test_inPlaceUpdate(self):
+        pt = PT('inplace')
+        pt.add_place('a', 1)
+        pt.add_place('b')
+        pt.add_transition('t')
+        pt.add_input_arc('a', 't')
+        pt.add_output_arc('t', 'b', 2)
+        emulator = Emulator(pt)
+        tokens = emulator.m.tokens
+        emulator.fire(emulator.modes()[0])
+        assert emulator.m.tokens is tokens
+        assert tokens('a') == 0 and tokens('b') == 2
+        assert len(emulator.modes()) == 0
+        place = ReificationPlace('x', ['a'])
+        record = place.update([(1, MultiSet(['b', 'b'])), (-1, MultiSet(['a']))])
+        assert place.tokens == MultiSet(['b', 'b'])
+        place.undo(record)
+        assert place.tokens == MultiSet(['a'])
+        self.assertRaises(ValueError, place.update, [(1, MultiSet(['b'])), (-1, MultiSet(['c']))])
+        assert place.tokens == MultiSet(['a'])
+
+    def test_encode(self):
+        pt = PT.from_arrays('bulk', ['p0', 'p1'], ['t0'], [3, 0],
+            inputs=[('p0', 't0', 1)], outputs=[('t0', 'p1', 2)], inhibitors=[('p1', 't0', 4)])
+        emulator = Emulator()
+        emulator.encode(['p0', 'p1'], ['t0'], {'p0' : 3}, [('p0', 't0', 1)], [('t0', 'p1', 2)], [('p1', 't0', 4)])
+        for place in ('P', 'T', 'M', 'I', 'O', 'H'):
+            assert emulator.net.place(place).tokens == Emulator(pt).net.place(place).tokens
+        assert emulator.fire_pt_sequence(['t0', 't0', 't0']) == 2
+
+    def test_interned(self):
+        pt = PT('interned')
+        pt.add_place('a', 2)
+        pt.add_place('b')
+        pt.add_transition('t')
+        pt.add_input_arc('a', 't')
+        pt.add_output_arc('t', 'b', 2)
+        emulator = Emulator(pt, interned=True)
+        assert emulator.m.tokens == MultiSet([emulator.find('a')] * 2)
+        assert emulator.pt_arcs(emulator.o) == [('t', 'b', 2)]
+        assert emulator.fire_pt('t')
+        assert emulator.m.tokens(emulator.find('b')) == 2
+        assert emulator.name_of(emulator.enabled_pt_transitions()[0]) == 't'
+        loop = FeedbackLoop('loop-interned')
+        loop.add_place('init')
+        loop.add_place('out')
+        signature = 'lib.getMarking() -> m'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        loop.add_output_arc(signature, 'out', Variable('m'))
+        loop.add_place('changes', [(('addPlace', 'c'), ('setTokens', 'c', 3))])
+        loop.add_transition('lib.applyChanges(c)')
+        loop.add_input_arc('changes', 'lib.applyChanges(c)', Variable('c'))
+        net = AdaptiveNetBuilder(emulator).add_loop(loop, ['init'], ['t']).build()
+        for name in ('move1', signature, 'lib.applyChanges(c)'):
+            net.transition(name).fire(net.transition(name).modes()[0])
+        assert net.place('out').tokens == MultiSet([MultiSet(['b'] * 4)])
+        adapted = Emulator.from_net(net)
+        assert adapted.m.tokens(adapted.find('c')) == 3
+        # the names of a failing set of changes are not interned
+        emulator = Emulator(pt, interned=True)
+        size = len(emulator.names)
+        self.assertRaises(ValueError, emulator.apply_changes, [('addPlace', 'd'), ('removeInputArc', 'b', 't', 1)])
+        assert len(emulator.names) == size and emulator.find('d') == 'd'
+        emulator.apply_changes([('addPlace', 'd'), ('addInputArc', 'd', 't', 1)])
+        assert ('t', 'd', 1) in emulator.pt_arcs(emulator.i)
+        # nor are the names of the lib primitives until their transition fires
+        emulator = Emulator(pt, interned=True)
+        loop = FeedbackLoop('loop-names')
+        loop.add_place('changes', [(('addPlace', 'newp'), ('removeInputArc', 'b', 't', 1))])
+        loop.add_transition('lib.applyChanges(c)')
+        loop.add_input_arc('changes', 'lib.applyChanges(c)', Variable('c'))
+        loop.add_place('pArg', ['q'])
+        loop.add_place('out')
+        loop.add_transition('lib.getTokens(p) -> n')
+        loop.add_input_arc('pArg', 'lib.getTokens(p) -> n', Variable('p'))
+        loop.add_output_arc('lib.getTokens(p) -> n', 'out', Variable('n'))
+        net = AdaptiveNetBuilder(emulator).add_loop(loop, [], []).build()
+        size = len(emulator.names)
+        assert net.transition('lib.applyChanges(c)').modes() == []
+        assert len(emulator.names) == size and emulator.find('newp') == 'newp'
+        transition = net.transition('lib.getTokens(p) -> n')
+        transition.fire(transition.modes()[0])
+        assert net.place('out').tokens == MultiSet([0]) and emulator.find('q') == 'q'
+        net.place('changes').reset([(('addPlace', 'newp'), ('setTokens', 'newp', 2))])
+        transition = net.transition('lib.applyChanges(c)')
+        transition.fire(transition.modes()[0])
+        assert emulator.find('newp') == size and Emulator.from_net(net).m.tokens(size) == 2
+
+    def test_plainEncoding(self):
+        # the neco-compiler encoding: plain places, transitions and flush arcs
+        emulator = Emulator(self.pt, neco_analysis=True)
+        loop = FeedbackLoop('loop-plain')
+        loop.add_place('init')
+        loop.add_place('pArg', ['p2'])
+        signature = 'lib.removePlace(p)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        loop.add_input_arc('pArg', signature, Variable('p'))
+        net = AdaptiveNetBuilder(emulator).add_loop(loop, ['init'], ['t0']).build()
+        for name in ('move', 'move1'):
+            assert str(net.transition(name).guard).startswith('value(i, t) <= MultiSet(m)')
+            assert dict((p.name, str(a)) for p, a in net.transition(name).output())['M'] == '(MultiSet(m) - value(i, t) + value(o, t))!'
+        for t in net.transition():
+            assert type(t) is Transition
+            for place, label in list(t.input()) + list(t.output()):
+                assert not isinstance(label, Flush) or type(label) is Flush
+                # `repeat` is not declared for the neco-compiler
+                assert 'repeat' not in str(label)
+
+    def test_compiled(self):
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init')
+        loop.add_place('pArg', ['p2'])
+        loop.add_place('tArg', ['t1'])
+        loop.add_place('result')
+        signature = 'lib.iMult(p,v) -> n'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        loop.add_input_arc('pArg', signature, Variable('p'))
+        loop.add_input_arc('tArg', signature, Variable('v'))
+        loop.add_output_arc(signature, 'result', Variable('n'))
+        net = AdaptiveNetBuilder(self.emulator).add_loop(loop, ['init'], ['t0']).build(compiled=True)
+        assert type(net.transition('move1').guard).__name__ == 'CompiledExpression'
+        # the compiled functions do not clobber the names of the net
+        net.globals['compiled'] = 'user value'
+        modes = net.transition('move1').modes()
+        assert len(modes) == 1
+        net.transition('move1').fire(modes[0])
+        assert net.get_marking().get('M') == MultiSet(['p0', 'p0', 'p1', 'p1', 'p2'])
+        modes = net.transition(signature).modes()
+        assert len(modes) == 1
+        net.transition(signature).fire(modes[0])
+        assert net.get_marking().get('result') == MultiSet([1])
+        assert net.globals['compiled'] == 'user value'
+        assert '__unbound__' not in net.globals
+        emulator = Emulator(self.pt).compile()
+        for k in range(0, 4):
+            modes = emulator.modes()
+            assert sorted(mode('t') for mode in modes) == sorted(mode('t') for mode in self.emulator.modes())
+            mode = min(modes, key=lambda mode: mode('t'))
+            emulator.fire(mode)
+            self.emulator.fire_pt(mode('t'))
+        assert emulator.m.tokens == self.emulator.m.tokens
+
+    def test_nativeEngine(self):
+        snakes = Emulator(self.pt)
+        native = Emulator(self.pt, engine='native')
+        for step in range(10):
+            expected = sorted(snakes.enabled_pt_transitions())
+            assert sorted(native.enabled_pt_transitions()) == expected
+            if len(expected) == 0:
+                break
+            snakes.fire_pt(expected[-1])
+            native.fire(Substitution(t=expected[-1]))
+            assert native.get_marking() == snakes.get_marking()
+        assert len(native.modes()) == 0
+        single = Emulator(self.pt, concur=False, engine='native')
+        modes = single.modes()
+        assert len(modes) == 1
+        single.fire(modes[0])
+        assert single.get_marking().get('firable') is None
+        assert len(single.modes()) == 0
+
+    def test_enabledSet(self):
+        for engine in Emulator.ENGINES:
+            emulator = Emulator(self.pt, engine=engine)
+            assert emulator.enabled_pt_transitions() == ['t0']
+            emulator.fire_pt('t0')
+            assert sorted(emulator.enabled_pt_transitions()) == ['t0', 't1']
+            emulator.fire_pt('t0')
+            assert emulator.enabled_pt_transitions() == ['t1']
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init', ['t'])
+        signature = 'lib.removeInputArc("p2", "t1", 1)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Variable('t'))
+        net = AdaptiveNetBuilder(Emulator(self.pt)).add_loop(loop).build()
+        view = Emulator.from_net(net, engine='native')
+        assert view.enabled_pt_transitions() == ['t0']
+        net.transition(signature).fire(net.transition(signature).modes()[0])
+        assert sorted(view.enabled_pt_transitions()) == ['t0', 't1']
+
+    def test_fireSequence(self):
+        for engine in Emulator.ENGINES:
+            emulator = Emulator(self.pt, engine=engine)
+            assert not emulator.fire_pt('t1')
+            assert emulator.fire_pt_sequence(['t0', 't1', 't0']) is None
+            assert emulator.get_marking().get('M') == MultiSet(['p0', 'p1', 'p2'])
+            assert emulator.fire_pt_sequence(['t0', 't0', 't1']) == 1
+            assert emulator.get_marking().get('M') == MultiSet(['p2'] * 2)
+        emulator = Emulator(self.pt, concur=False)
+        assert emulator.fire_pt_sequence(['t0', 't0']) == 1
+
+    def test_loadPNML(self):
+        emulator = Emulator()
+        emulator.load_pt_from_pnml(TEST_PNML_2)
+        expected = Emulator(PT('load_test', TEST_PNML_2))
+        for place in ['P', 'T', 'M', 'I', 'O', 'H']:
+            assert emulator.get_marking().get(place) == expected.get_marking().get(place)
+        assert emulator.fire_pt('T1')
+        assert emulator.fire_pt('T0')
+
+    def test_snapshot(self):
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init', [BlackToken()])
+        loop.add_place('done')
+        signature = 'lib.removeInputArc("p2", "t1", 1)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Value(BlackToken()))
+        loop.add_output_arc(signature, 'done', Value(BlackToken()))
+        net = AdaptiveNetBuilder(Emulator(self.pt)).add_loop(loop).build()
+        emulator = Emulator.from_net(net, engine='native')
+        marking = net.get_marking()
+        snapshot = emulator.snapshot()
+        assert emulator.fire_pt('t0')
+        net.transition(signature).fire(net.transition(signature).modes()[0])
+        assert net.get_marking() != marking
+        emulator.restore(snapshot)
+        assert net.get_marking() == marking
+        assert isinstance(net.place('I').tokens, Relation)
+        assert net.place('I').tokens.values_of('t1') == MultiSet(['p2'])
+        assert sorted(emulator.enabled_pt_transitions()) == ['t0']
+        with self.assertRaises(ValueError):
+            self.emulator.restore(snapshot)
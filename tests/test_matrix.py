@@ -0,0 +1,63 @@
+from .context import PT
+
+import os
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TEST_PNML_1 = os.path.join(os.path.dirname(__file__), 'resources/test.pnml')
+TEST_PNML_2 = os.path.join(os.path.dirname(__file__), 'resources/test2.pnml')
+
+@unittest.skipIf(numpy is None, 'numpy not installed')
+class MatrixTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.pt = PT('Simple P/T net')
+        self.pt.add_place('p0', 3)
+        self.pt.add_place('p1')
+        self.pt.add_place('p2')
+        self.pt.add_transition('t0')
+        self.pt.add_transition('t1')
+        self.pt.add_input_arc('p0', 't0')
+        self.pt.add_output_arc('t0', 'p1', 2)
+        self.pt.add_inhibitor_arc('p2', 't0')
+        self.pt.add_input_arc('p1', 't1', 2)
+        self.pt.add_output_arc('t1', 'p2')
+
+    def teardown_method(self, method):
+        self.pt = None
+
+    def test_enabled(self):
+        for sparse in (False, True):
+            m = self.pt.to_matrix(sparse)
+            assert m.enabled_transitions() == ['t0']
+            m.fire('t0')
+            assert m.get_marking() == {'p0' : 2, 'p1' : 2}
+            assert m.enabled_transitions() == ['t0', 't1']
+            m.fire('t1')
+            assert m.enabled_transitions() == []
+            m.fire('t0')
+            assert m.get_marking() == {'p0' : 2, 'p2' : 1}
+
+    def test_same_behavior(self):
+        for pnml in (TEST_PNML_1, TEST_PNML_2):
+            pt = PT('pt', pnml)
+            dense = pt.to_matrix()
+            sparse = pt.to_matrix(sparse=True)
+            rnd = random.Random(1)
+            for step in range(50):
+                enabled = [t for t in pt.get_transitions() if pt.enabled(t)]
+                assert dense.enabled_transitions() == enabled
+                assert sparse.enabled_transitions() == enabled
+                if len(enabled) == 0:
+                    break
+                t = rnd.choice(enabled)
+                pt.fire(t)
+                dense.fire(t)
+                sparse.fire(t)
+                assert dense.get_marking() == pt.get_marking()
+                assert sparse.get_marking() == pt.get_marking()
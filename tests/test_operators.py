@@ -1,7 +1,8 @@
 from snakes.nets import MultiSet
 
 import unittest
-from pnemu.functions import intersection
+from pnemu.functions import intersection, value, values, keys, filterByKey, filterByValue, repeat, setMultiplicity, projection
+from pnemu.data import Relation, PackedRelation
 
 class OperatorsTestSuite(unittest.TestCase):
 
@@ -22,3 +23,64 @@ class OperatorsTestSuite(unittest.TestCase):
         b = MultiSet(['p1'] * 2)
         result = a - intersection(a, b)
         assert result == MultiSet(['p0'])
+
+    def test_relation(self):
+        pairs = [('t0', 'p0'), ('t0', 'p0'), ('t0', 'p1'), ('t1', 'p1')]
+        r = Relation(pairs)
+        m = MultiSet(pairs)
+        for f in (value, keys, filterByKey, filterByValue):
+            for x in ('t0', 't1', 'p0', 'p1', 'p2'):
+                assert f(r, x) == f(m, x)
+        assert value(r, 't0') == MultiSet(['p0', 'p0', 'p1'])
+        r.remove([('t0', 'p0')], 2)
+        assert value(r, 't0') == MultiSet(['p1'])
+        assert keys(r, 'p0') == MultiSet([])
+        r2 = r.copy() + MultiSet([('t2', 'p0')])
+        assert isinstance(r2, Relation)
+        assert keys(r2, 'p0') == MultiSet(['t2'])
+        assert keys(r, 'p0') == MultiSet([])
+
+    def test_packedRelation(self):
+        r = PackedRelation([(0, 1), (0, 1), (0, 2), (3, 2)])
+        assert r((0, 1)) == 2
+        assert value(r, 0) == MultiSet([1, 1, 2])
+        assert keys(r, 2) == MultiSet([0, 3])
+        r2 = r - filterByValue(r, 2)
+        assert isinstance(r2, PackedRelation)
+        assert sorted(r2.pairs()) == [((0, 1), 2)]
+        r2.remove([(0, 1)], 2)
+        assert value(r2, 0) == MultiSet([])
+        assert r((0, 2)) == 1
+
+    def test_memoization(self):
+        r = Relation([('t0', 'p0'), ('t0', 'p1'), ('t1', 'p1')])
+        pre = r.lookup('values', 't0')
+        assert r.lookup('values', 't0') is pre
+        # the public lookups return copies, which the callers may change
+        copy = value(r, 't0')
+        assert copy == pre and copy is not pre
+        copy.add(['p2'])
+        assert value(r, 't0') == MultiSet(['p0', 'p1'])
+        r.add([('t0', 'p2')])
+        assert r.lookup('values', 't0') is not pre
+        assert value(r, 't0') == MultiSet(['p0', 'p1', 'p2'])
+        assert pre == MultiSet(['p0', 'p1'])
+        assert keys(r, 'p1') == MultiSet(['t0', 't1'])
+        keys(r, 'p1').add(['t2'])
+        assert values(r, 't1') == MultiSet(['p1'])
+        assert keys(r, 'p1') == MultiSet(['t0', 't1'])
+        # a copy keeps the lookups until it changes
+        pre = r.lookup('values', 't0')
+        c = r.copy()
+        assert c.lookup('values', 't0') is pre
+        c.add([('t0', 'p3')])
+        assert c.lookup('values', 't0') == MultiSet(['p0', 'p1', 'p2', 'p3'])
+        assert r.lookup('values', 't0') is pre
+
+    def test_repeat(self):
+        assert repeat('p0', 3) == MultiSet(['p0'] * 3)
+        assert repeat('p0', 0) == MultiSet([])
+        assert setMultiplicity(repeat('p0', 10 ** 9), 'p0', 2) == MultiSet(['p0', 'p0'])
+        assert setMultiplicity(MultiSet(['p1']), 'p0', 0) == MultiSet(['p1'])
+        assert projection(MultiSet(['p0', 'p0', 'p1']), MultiSet(['p0'])) == MultiSet(['p0', 'p0'])
+        assert intersection(repeat('p0', 10 ** 9), repeat('p0', 2)) == MultiSet(['p0', 'p0'])
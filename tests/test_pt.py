@@ -1,6 +1,7 @@
 from .context import PT
 from snakes.nets import Place
 
+import io
 import os
 import unittest
 
@@ -20,6 +21,7 @@ class PTNetTestSuite(unittest.TestCase):
         self.pt.add_place('p0')
         self.assertIsNotNone(self.pt.get_place('p0'))
         assert self.pt.get_place('p0').name == 'p0'
+        assert self.pt.get_place('p0') is self.pt.get_place('p0')
         self.pt.add_place('p1', 5)
         assert self.pt.get_tokens('p0') == 0
         assert self.pt.get_tokens('p1') == 5
@@ -50,6 +52,21 @@ class PTNetTestSuite(unittest.TestCase):
         assert len(self.pt.inhibitor_arcs('t0')) == 1
         self.pt.add_inhibitor_arc('p3', 't0')
         assert len(self.pt.inhibitor_arcs('t0')) == 2
+        # the accessors return sets of slotted objects, copied from a frozenset rebuilt when arcs are added
+        arcs = self.pt.input_arcs('t0')
+        assert type(arcs) is set and self.pt.input_arcs('t0') is not arcs
+        assert self.pt.arc_set('input', self.pt.i, 't0') is self.pt.arc_set('input', self.pt.i, 't0')
+        arcs.discard(next(iter(arcs)))
+        assert len(self.pt.input_arcs('t0')) == 2
+        arcs = self.pt.input_arcs('t0')
+        assert len(self.pt.input_arcs('t1')) == 0
+        arc = [arc for arc in arcs if arc.src == 'p1'][0]
+        assert (arc.src, arc.dst, arc.weight) == ('p1', 't0', 2)
+        self.pt.add_input_arc('p2', 't0')
+        assert len(self.pt.input_arcs('t0')) == 3 and len(arcs) == 2
+        assert not hasattr(arc, '__dict__')
+        arc.weight = 0
+        assert arc.weight == 2
 
     def test_PT_enab(self):
         # without inhibitor arcs
@@ -81,6 +98,23 @@ class PTNetTestSuite(unittest.TestCase):
         assert self.pt.get_tokens('p1') == 2
         assert not self.pt.enabled('t0')
 
+    def test_PT_enabled_set(self):
+        pt = PT('load_test', TEST_PNML_1)
+        for step in range(30):
+            expected = set(t for t in pt.get_transitions() if pt.enabled(t))
+            assert pt.enabled_transitions() == expected
+            if len(expected) == 0:
+                break
+            pt.fire(sorted(expected)[step % len(expected)])
+        pt.add_transition('new')
+        assert 'new' in pt.enabled_transitions()
+        p = list(pt.get_places())[0]
+        pt.add_inhibitor_arc(p, 'new')
+        pt.set_tokens(p, 1)
+        assert 'new' not in pt.enabled_transitions()
+        pt.set_tokens(p, 0)
+        assert 'new' in pt.enabled_transitions()
+
     def test_PT_import(self):
         # example taken from https://mcc.lip6.fr/models.php (ClientsAndServers model)
         pt_from_pnml = PT('load_test', TEST_PNML_1)
@@ -103,6 +137,46 @@ class PTNetTestSuite(unittest.TestCase):
         assert pt_from_pnml2.get_tokens('P0') == 0
         assert pt_from_pnml2.enabled('T0')
 
+    def test_PT_import_stream(self):
+        # arcs may precede the nodes they connect
+        pnml = b'''<?xml version="1.0"?>
+        <pnml xmlns="http://www.pnml.org/version-2009/grammar/pnml">
+          <net id="n" type="http://www.pnml.org/version-2009/grammar/ptnet">
+            <arc id="a0" source="P0" target="T0"><inscription><text>2</text></inscription></arc>
+            <arc id="a1" source="T0" target="P1"/>
+            <arc id="a2" source="P1" target="T0"><type value="inhibitor"/></arc>
+            <place id="P0"><initialMarking><text>3</text></initialMarking></place>
+            <transition id="T0"/>
+            <place id="P1"/>
+          </net>
+        </pnml>'''
+        pt = PT('stream_test', io.BytesIO(pnml))
+        assert pt.get_marking() == {'P0' : 3}
+        assert [(arc.src, arc.weight) for arc in pt.input_arcs('T0')] == [('P0', 2)]
+        assert [(arc.dst, arc.weight) for arc in pt.output_arcs('T0')] == [('P1', 1)]
+        assert [(arc.src, arc.weight) for arc in pt.inhibitor_arcs('T0')] == [('P1', 1)]
+        assert pt.enabled('T0')
+        pt.fire('T0')
+        assert not pt.enabled('T0')
+        with open(TEST_PNML_1, 'rb') as pnml_file:
+            pt_from_file = PT('load_test', pnml_file)
+        assert len(pt_from_file.get_arcs()) == 54
+
+    def test_PT_bulk(self):
+        pt = PT.from_arrays('bulk', ['p0', 'p1'], ['t0', 't1'], [2, 0],
+            inputs=[('p0', 't0', 2), ('p9', 't0', 1)], outputs=[('t0', 'p1', 1)], inhibitors=[('p1', 't1', 1)])
+        assert list(pt.get_places()) == ['p0', 'p1']
+        # the elements added in bulk are built when requested, then kept
+        assert pt.get_places()['p0'] is pt.get_place('p0')
+        assert pt.get_transitions()['t1'].name == 't1'
+        assert pt.get_marking() == {'p0' : 2}
+        assert [(arc.src, arc.dst, arc.weight) for arc in pt.input_arcs('t0')] == [('p0', 't0', 2)]
+        assert pt.enabled_transitions() == {'t0', 't1'}
+        pt.add_arcs([('p1', 't0', 1)])
+        assert len(pt.input_arcs('t0')) == 2
+        assert pt.enabled_transitions() == {'t1'}
+        self.assertRaises(ValueError, pt.add_arcs, [], 'reset')
+
     def test_PT_dot_export(self):
         try:
             os.remove(TEST_DOT)
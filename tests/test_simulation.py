@@ -0,0 +1,59 @@
+from .context import PT
+from .context import Emulator
+from .context import FeedbackLoop
+from .context import AdaptiveNetBuilder
+from pnemu.simulation import simulate
+from snakes.nets import Value, BlackToken
+
+import os
+import unittest
+
+MS_PNML = os.path.join(os.path.dirname(__file__), 'resources/ms.pnml')
+
+class SimulationTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.emulator = Emulator(PT('ms', MS_PNML), engine='native')
+
+    def teardown_method(self, method):
+        self.emulator = None
+
+    def test_reproducible(self):
+        marking = self.emulator.get_marking()
+        runs = sorted(simulate(self.emulator, 20, 15, seed=7, workers=1), key=lambda run: run.index)
+        assert [run.index for run in runs] == list(range(0, 20))
+        assert all(len(run.steps) == 15 or run.deadlock for run in runs)
+        assert all(label[0] == 'move' for run in runs for label in run.steps)
+        assert self.emulator.get_marking() == marking
+        again = sorted(simulate(self.emulator, 20, 15, seed=7, workers=1), key=lambda run: run.index)
+        assert [run.steps for run in runs] == [run.steps for run in again]
+        # the outcome of a run does not depend on the number of workers
+        parallel = sorted(simulate(self.emulator, 20, 15, seed=7, workers=2), key=lambda run: run.index)
+        assert [run.steps for run in runs] == [run.steps for run in parallel]
+        assert [run.marking for run in runs] == [run.marking for run in parallel]
+
+    def test_policy(self):
+        first = lambda rng, choices: choices[0]
+        runs = list(simulate(self.emulator, 3, 10, policy=first, seed=1, workers=1))
+        assert runs[0].steps == runs[1].steps == runs[2].steps
+
+    def test_adaptive_net(self):
+        pt = PT('Simple P/T net')
+        pt.add_place('p0', 1)
+        pt.add_place('p1')
+        pt.add_transition('t0')
+        pt.add_input_arc('p0', 't0')
+        pt.add_output_arc('t0', 'p1')
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init', [BlackToken()])
+        loop.add_place('done')
+        signature = 'lib.removeOutputArc("p1", "t0", 1)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Value(BlackToken()))
+        loop.add_output_arc(signature, 'done', Value(BlackToken()))
+        net = AdaptiveNetBuilder(Emulator(pt)).add_loop(loop).build()
+        runs = list(simulate(net, 10, 5, seed=3, workers=2))
+        assert len(runs) == 10
+        assert all(run.deadlock for run in runs)
+        assert all((signature, ()) in run.steps for run in runs)
+        assert all('done' in run.marking for run in runs)
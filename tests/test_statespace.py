@@ -0,0 +1,138 @@
+from .context import PT
+from .context import Emulator
+from .context import FeedbackLoop
+from .context import AdaptiveNetBuilder
+from pnemu.statespace import reachability_graph, parallel_reachability_graph, explorer_for, ParallelExplorer
+from snakes.nets import StateGraph, Value, BlackToken
+
+import functools
+import multiprocessing
+import os
+import unittest
+
+TEST_PNML_1 = os.path.join(os.path.dirname(__file__), 'resources/test.pnml')
+MS_PNML = os.path.join(os.path.dirname(__file__), 'resources/ms.pnml')
+
+class StateSpaceTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.pt = PT('Simple P/T net')
+        self.pt.add_place('p0', 2)
+        self.pt.add_place('p1')
+        self.pt.add_transition('t0')
+        self.pt.add_transition('t1')
+        self.pt.add_input_arc('p0', 't0')
+        self.pt.add_output_arc('t0', 'p1')
+        self.pt.add_input_arc('p1', 't1')
+        self.pt.add_inhibitor_arc('p0', 't1')
+
+    def teardown_method(self, method):
+        self.pt = None
+
+    def test_reachability(self):
+        graph = reachability_graph(self.pt)
+        assert graph.complete
+        assert len(graph) == 5
+        assert graph.marking(0) == {'p0' : 2}
+        assert sorted(set(label for (src, label, dst) in graph.edges())) == ['t0', 't1']
+        assert [graph.marking(k) for k in graph.deadlocks()] == [{}]
+        assert graph.successors(0) == [('t0', 1)]
+
+    def test_same_graph(self):
+        pt = PT('load_test', TEST_PNML_1)
+        bfs = reachability_graph(pt)
+        dfs = reachability_graph(pt, order='dfs', typecode='H')
+        emulated = reachability_graph(Emulator(PT('load_test', TEST_PNML_1)))
+        assert len(bfs) == len(dfs) == len(emulated) == 27576
+        assert bfs.num_edges() == dfs.num_edges() == emulated.num_edges()
+
+    def test_limits(self):
+        pt = PT('ms', MS_PNML)
+        graph = reachability_graph(pt, max_states=5)
+        assert len(graph) == 5
+        assert not graph.complete
+        graph = reachability_graph(pt, max_depth=1)
+        assert len(graph) == 1 + len(graph.successors(0))
+        assert not graph.complete
+        assert reachability_graph(pt).complete
+
+    def test_adaptive_net(self):
+        self.pt.add_output_arc('t1', 'p0')
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('init', [BlackToken()])
+        loop.add_place('done')
+        signature = 'lib.removeOutputArc("p0", "t1", 1)'
+        loop.add_transition(signature)
+        loop.add_input_arc('init', signature, Value(BlackToken()))
+        loop.add_output_arc(signature, 'done', Value(BlackToken()))
+        net = AdaptiveNetBuilder(Emulator(self.pt)).add_loop(loop).build()
+        marking = net.get_marking()
+        graph = reachability_graph(net)
+        assert graph.complete
+        assert net.get_marking() == marking
+        assert graph.marking(0) == marking
+        states = StateGraph(net)
+        states.build()
+        assert len(graph) == len(states)
+        labels = set(label for (src, label, dst) in graph.edges())
+        assert ('move', (('t', 't1'),)) in labels
+        assert (signature, ()) in labels
+        # most of the place contents are shared among states
+        assert len(graph.explorer.contents) < len(graph) * len(marking)
+        parallel = parallel_reachability_graph(net, workers=2)
+        assert parallel.complete
+        assert len(parallel) == len(graph)
+        assert parallel.num_edges() == graph.num_edges()
+        assert parallel.marking(0) == marking
+
+    def test_parallel(self):
+        pt = PT('ms', MS_PNML)
+        graph = reachability_graph(pt)
+        for workers in [1, 3]:
+            parallel = parallel_reachability_graph(pt, workers=workers)
+            assert parallel.complete
+            assert len(parallel) == len(graph)
+            assert parallel.num_edges() == graph.num_edges()
+            assert parallel.marking(0) == graph.marking(0)
+        parallel = parallel_reachability_graph(pt, workers=2, max_depth=1)
+        assert len(parallel) == 1 + len(parallel.successors(0))
+        assert not parallel.complete
+
+    def test_parallel_spawn(self):
+        # the factory is pickled when the workers cannot be forked
+        class SpawnExplorer(ParallelExplorer):
+            def context(self):
+                return multiprocessing.get_context('spawn')
+        pt = PT('ms', MS_PNML)
+        parallel = SpawnExplorer(functools.partial(explorer_for, pt, 'I'), 2).explore()
+        assert len(parallel) == len(reachability_graph(pt))
+
+    def test_partial_order_reduction(self):
+        self.pt.add_output_arc('t1', 'p0')
+        loop = FeedbackLoop('loop-test')
+        loop.add_place('c0', [BlackToken()])
+        for k in range(1, 4):
+            # read-only steps, independent of the managed system
+            signature = 'lib.getPlaces() -> x' + str(k)
+            loop.add_place('c' + str(k))
+            loop.add_transition(signature)
+            loop.add_input_arc('c' + str(k - 1), signature, Value(BlackToken()))
+            loop.add_output_arc(signature, 'c' + str(k), Value(BlackToken()))
+        signature = 'lib.removeOutputArc("p0", "t1", 1)'
+        loop.add_place('done')
+        loop.add_transition(signature)
+        loop.add_input_arc('c3', signature, Value(BlackToken()))
+        loop.add_output_arc(signature, 'done', Value(BlackToken()))
+        net = AdaptiveNetBuilder(Emulator(self.pt)).add_loop(loop).build()
+        graph = reachability_graph(net)
+        reduced = reachability_graph(net, reduction=True)
+        assert reduced.complete
+        assert len(reduced) < len(graph)
+        assert reduced.marking(0) == graph.marking(0)
+        deadlocks = [graph.marking(k) for k in graph.deadlocks()]
+        assert [reduced.marking(k) for k in reduced.deadlocks()] == deadlocks
+        # everything visible: nothing can be reduced
+        visible = [p.name for p in net.place()]
+        assert len(reachability_graph(net, reduction=True, visible=visible)) == len(graph)
+        with self.assertRaises(ValueError):
+            reachability_graph(self.pt, reduction=True)
@@ -0,0 +1,115 @@
+from .context import PT
+from .context import Emulator
+from pnemu.timed import TimedSimulator, Exponential, Deterministic
+
+import os
+import subprocess
+import sys
+import unittest
+
+# a run of a net whose firings re-check several transitions at once
+SEEDED_RUN = """
+from pnemu import PT
+from pnemu.timed import TimedSimulator, Exponential
+pt = PT('fork')
+pt.add_place('p', 3)
+for k in range(0, 8):
+    t = 't' + str(k)
+    pt.add_place('q' + str(k))
+    pt.add_transition(t)
+    pt.add_input_arc('p', t)
+    pt.add_output_arc(t, 'q' + str(k))
+    pt.add_transition('back' + str(k))
+    pt.add_input_arc('q' + str(k), 'back' + str(k))
+    pt.add_output_arc('back' + str(k), 'p')
+    pt.set_delay(t, Exponential(1.0 + k))
+    pt.set_delay('back' + str(k), Exponential(2.0))
+stats = TimedSimulator(pt, seed=1).run(max_steps=300)
+print(repr(stats.time), sorted(stats.firings.items()))
+"""
+
+class TimedTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        # M/M/1 queue: arrival rate 1, service rate 2
+        self.pt = PT('M/M/1 queue')
+        self.pt.add_place('source', 1)
+        self.pt.add_place('queue')
+        self.pt.add_place('served')
+        self.pt.add_transition('arrive')
+        self.pt.add_transition('serve')
+        self.pt.add_input_arc('source', 'arrive')
+        self.pt.add_output_arc('arrive', 'source')
+        self.pt.add_output_arc('arrive', 'queue')
+        self.pt.add_input_arc('queue', 'serve')
+        self.pt.add_output_arc('serve', 'served')
+        self.pt.set_delay('arrive', Exponential(1.0))
+        self.pt.set_delay('serve', Exponential(2.0))
+
+    def teardown_method(self, method):
+        self.pt = None
+
+    def test_queue(self):
+        stats = TimedSimulator(self.pt, seed=1).run(until=5000)
+        assert stats.time == 5000
+        assert abs(stats.throughput('serve') - 1.0) < 0.1
+        # Little's law: one request in the system, staying one time unit
+        assert abs(stats.mean_tokens('queue') - 1.0) < 0.2
+        assert abs(stats.latency('queue', 'serve') - 1.0) < 0.2
+        assert stats.firings['serve'] == self.pt.get_tokens('served')
+
+    def test_emulator(self):
+        pt_stats = TimedSimulator(self.pt, seed=3).run(max_steps=500)
+        self.setup_method(None)
+        emulator = Emulator(self.pt, engine='native')
+        assert emulator.get_delay('serve').rate == 2.0
+        stats = TimedSimulator(emulator, seed=3).run(max_steps=500)
+        assert stats.time == pt_stats.time
+        assert stats.firings == pt_stats.firings
+
+    def test_immediate(self):
+        self.pt.set_delay('arrive', Deterministic(1.0))
+        self.pt.set_delay('serve', None)
+        simulator = TimedSimulator(self.pt)
+        assert simulator.step() == (1.0, 'arrive')
+        # immediate transitions fire without letting time pass
+        assert simulator.step() == (1.0, 'serve')
+        stats = simulator.run(until=10)
+        assert stats.firings == {'arrive' : 10, 'serve' : 10}
+
+    def test_adaptation(self):
+        emulator = Emulator(self.pt, engine='native')
+        def stop(simulator, time, transition):
+            # remove the arrivals after 100 requests
+            if transition == 'arrive' and simulator.stats.firings['arrive'] == 100:
+                emulator.t.remove(['arrive'])
+        stats = TimedSimulator(emulator, seed=2).run(hook=stop)
+        assert stats.firings == {'arrive' : 100, 'serve' : 100}
+
+    def test_reschedule(self):
+        pt = PT('timers')
+        for name, delay in (('tick', 1.0), ('slow', 10.0)):
+            pt.add_place(name + '_ready', 1)
+            pt.add_transition(name)
+            pt.add_input_arc(name + '_ready', name)
+            pt.add_output_arc(name, name + '_ready')
+            pt.set_delay(name, Deterministic(delay))
+        # a change after every firing keeps the progress of the untouched timers
+        stats = TimedSimulator(pt).run(until=10.5, hook=lambda simulator, time, transition: True)
+        assert stats.firings == {'tick' : 10, 'slow' : 1}
+        # a changed delay is sampled again
+        simulator = TimedSimulator(pt)
+        assert simulator.step() == (1.0, 'tick')
+        pt.set_delay('slow', Deterministic(2.0))
+        simulator.reschedule()
+        assert simulator.scheduled['slow'][0] == 3.0
+        assert simulator.scheduled['tick'][0] == 2.0
+
+    def test_seeded_run(self):
+        # the same seed gives the same run, whatever the hashing of the names
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        outputs = []
+        for hashseed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=hashseed, PYTHONPATH=root)
+            outputs.append(subprocess.check_output([sys.executable, '-c', SEEDED_RUN], env=env, cwd=root))
+        assert outputs[0] == outputs[1]
@@ -0,0 +1,99 @@
+from .context import PT
+from .context import Emulator
+from pnemu.trace import TraceReader
+
+import io
+import os
+import random
+import tempfile
+import unittest
+
+TEST_PNML_1 = os.path.join(os.path.dirname(__file__), 'resources/test.pnml')
+
+class TraceTestSuite(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.pt = PT('load_test', TEST_PNML_1)
+
+    def teardown_method(self, method):
+        self.pt = None
+
+    def random_run(self, steps, fire):
+        rng = random.Random(1)
+        fired = []
+        for k in range(0, steps):
+            enabled = sorted(self.pt.enabled_transitions())
+            if len(enabled) == 0:
+                break
+            t = rng.choice(enabled)
+            fire(t)
+            fired.append(t)
+        return fired
+
+    def test_PT_trace(self):
+        buffer = io.BytesIO()
+        markings = [dict(self.pt.get_marking())]
+        self.pt.start_trace(buffer, every=7)
+        def fire(t):
+            self.pt.fire(t)
+            markings.append(dict(self.pt.get_marking()))
+        fired = self.random_run(100, fire)
+        self.pt.stop_trace()
+        buffer.seek(0)
+        trace = TraceReader(buffer)
+        assert len(trace) == len(fired)
+        assert trace.names == list(dict.fromkeys(fired))
+        for step in [0, 1, 6, 7, 8, 50, len(fired)]:
+            assert trace.marking(step) == markings[step]
+        replayed = [(step, t, dict(m)) for (step, t, binding, m) in trace.replay(20)]
+        assert [t for (step, t, m) in replayed] == fired[20:]
+        assert [m for (step, t, m) in replayed] == markings[21:]
+
+    def test_emulator_trace(self):
+        emulator = Emulator(self.pt, engine='native')
+        with tempfile.TemporaryDirectory() as folder:
+            self.check_emulator_trace(emulator, os.path.join(folder, 'emulator.trace'))
+
+    def test_emulator_trace_snakes(self):
+        emulator = Emulator(self.pt)
+        with tempfile.TemporaryDirectory() as folder:
+            self.check_emulator_trace(emulator, os.path.join(folder, 'emulator.trace'))
+
+    def test_emulator_trace_delta(self):
+        emulator = Emulator(self.pt, engine='native')
+        buffer = io.BytesIO()
+        emulator.start_trace(buffer)
+        t = sorted(self.pt.enabled_transitions())[0]
+        assert emulator.fire_pt(t)
+        emulator.stop_trace()
+        buffer.seek(0)
+        trace = TraceReader(buffer)
+        steps = [record for record in trace.records(0) if record[0] == 's']
+        # only the preset and the postset of `t` are stored
+        pre = set(a.src for a in self.pt.get_input_arcs()[t])
+        post = set(a.dst for a in self.pt.get_output_arcs()[t])
+        assert set(steps[0][3]) <= {'M', 'firable'}
+        assert set(steps[0][3]['M']) <= pre | post
+        trace.close()
+
+    def check_emulator_trace(self, emulator, path):
+        emulator.start_trace(path, every=10)
+        markings = [dict(emulator.m.tokens)]
+        def fire(t):
+            self.pt.fire(t)
+            assert emulator.fire_pt(t)
+            markings.append(dict(emulator.m.tokens))
+        fired = self.random_run(45, fire)
+        # the trace is not closed: the index is rebuilt by scanning the file
+        emulator.trace.file.flush()
+        trace = TraceReader(path)
+        assert len(trace) == len(fired)
+        assert trace.marking(33).get('M', {}) == markings[33]
+        assert [t for (step, t, b, m) in trace.replay()] == ['move'] * len(fired)
+        assert [dict(b)['t'] for (step, t, b, m) in trace.replay()] == fired
+        trace.close()
+        emulator.stop_trace()
+        trace = TraceReader(path)
+        assert trace.marking(len(fired)).get('M', {}) == markings[-1]
+        assert trace.marking(0)['T'] == {t : 1 for t in self.pt.get_transitions()}
+        trace.close()